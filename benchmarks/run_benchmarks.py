@@ -0,0 +1,146 @@
+"""Scaling benchmarks for the scatter and smart save tools.
+
+Runs the tools headless against the in-memory stand-in for Maya in
+benchmarks/standin, so timings measure the tools' own Python and NumPy cost
+rather than Maya's. Run from the repository root:
+
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 100000 1000000
+"""
+import argparse
+import datetime
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "standin"))
+sys.path.insert(0, os.path.join(os.path.dirname(HERE), "src"))
+
+import maya.cmds as cmds
+import maya.standalone
+
+import scatter
+import scatter_output
+import smartsave
+
+log = logging.getLogger(__name__)
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_FILE_COUNTS = [10, 1000, 50000]
+
+
+def build_scatter_scene(point_count, sample_mode):
+    """Builds a ground plane and two prototypes sized for point_count.
+
+    Return:
+        ScatterTool: A tool targeting the plane with both prototypes.
+    """
+    maya.standalone.initialize()
+    tool = scatter.ScatterTool()
+    if sample_mode == "vertices":
+        side = max(1, int(round(point_count ** 0.5)) - 1)
+    else:
+        side = 10
+    cmds.polyPlane(name="ground", width=100.0, height=100.0,
+                   subdivisionsX=side, subdivisionsY=side)
+    tool.set_scatter_targets()
+    cmds.polyCube(name="rock")
+    cmds.polyCube(name="bush")
+    cmds.select(["rock", "bush"])
+    tool.set_scatter_obj()
+    tool.sample_mode = sample_mode
+    tool.point_count = point_count
+    tool.rot_range_y = [0.0, 360.0]
+    tool.scale_range = [0.5, 1.5]
+    return tool
+
+
+def bench_scatter(sizes, output_mode, sample_mode, workers, repeats):
+    results = []
+    for size in sizes:
+        timings = []
+        instances = 0
+        for _ in range(repeats):
+            tool = build_scatter_scene(size, sample_mode)
+            tool.output_mode = output_mode
+            tool.workers = workers
+            tool.profiling = True
+            start = time.time()
+            tool.scatter()
+            timings.append(time.time() - start)
+            instances = tool.last_profile.points
+        best = min(timings)
+        results.append({"points": size,
+                        "output_mode": output_mode,
+                        "sample_mode": sample_mode,
+                        "workers": workers,
+                        "seconds": best,
+                        "points_per_second": size / best if best else None,
+                        "instances": instances,
+                        "profile": tool.last_profile.as_dict()})
+        log.info("scatter %9d points: %.3fs", size, best)
+    return results
+
+
+def bench_next_avail_ver(file_counts, repeats):
+    results = []
+    for count in file_counts:
+        folder = tempfile.mkdtemp(prefix="smartsave_bench_")
+        try:
+            for ver in range(1, count + 1):
+                name = "main_model_v{:03d}.ma".format(ver)
+                open(os.path.join(folder, name), "w").close()
+            maya.standalone.initialize()
+            scene_file = smartsave.SceneFile()
+            scene_file.folder_path = folder
+            timings = []
+            for _ in range(repeats):
+                start = time.time()
+                next_ver = scene_file.next_avail_ver()
+                timings.append(time.time() - start)
+        finally:
+            shutil.rmtree(folder)
+        best = min(timings)
+        results.append({"files": count, "seconds": best,
+                        "next_version": next_ver})
+        log.info("next_avail_ver %6d files: %.3fs", count, best)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=DEFAULT_SIZES)
+    parser.add_argument("--file-counts", type=int, nargs="+",
+                        default=DEFAULT_FILE_COUNTS)
+    parser.add_argument("--output-mode", default="instances",
+                        choices=sorted(scatter_output.OUTPUT_MODES))
+    parser.add_argument("--sample-mode",
+                        choices=["vertices", "surface", "projection"],
+                        default="vertices")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    report = {"timestamp": datetime.datetime.now().isoformat(),
+              "python": platform.python_version(),
+              "platform": platform.platform(),
+              "scatter": bench_scatter(args.sizes, args.output_mode,
+                                       args.sample_mode, args.workers,
+                                       args.repeats),
+              "next_avail_ver": bench_next_avail_ver(args.file_counts,
+                                                     args.repeats)}
+    with open(args.output, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    log.info("Wrote %s", args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Stand-in for PySide2.QtCore."""
+
+
+def Slot(*types, **kwargs):
+    def decorator(func):
+        return func
+    return decorator
+
+
+class Signal(object):
+    def __init__(self, *types):
+        self._slots = []
+
+    def connect(self, slot):
+        self._slots.append(slot)
+
+    def emit(self, *args):
+        for slot in list(self._slots):
+            slot(*args)
+
+
+class _Stub(object):
+    """Accepts any construction and attribute access."""
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        return _Stub()
+
+    def __call__(self, *args, **kwargs):
+        return _Stub()
+
+    def __or__(self, other):
+        return self
+
+    __xor__ = __or__
+
+
+Qt = _Stub()
+QObject = type("QObject", (_Stub,), {})
+QThread = type("QThread", (QObject,), {})
+QTimer = type("QTimer", (QObject,), {})
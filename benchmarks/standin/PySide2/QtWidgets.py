@@ -0,0 +1,8 @@
+"""Stand-in for PySide2.QtWidgets; every widget is an inert stub."""
+from PySide2.QtCore import _Stub
+
+
+def __getattr__(name):
+    widget = type(name, (_Stub,), {})
+    globals()[name] = widget
+    return widget
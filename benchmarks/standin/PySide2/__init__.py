@@ -0,0 +1 @@
+"""Stand-in for PySide2, enough to import the tool modules headless."""
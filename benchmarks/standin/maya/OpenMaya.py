@@ -0,0 +1,18 @@
+"""Stand-in for the parts of the Maya Python API 1.0 used by src/."""
+import logging
+
+log = logging.getLogger("maya.OpenMaya")
+
+
+class MGlobal(object):
+    @staticmethod
+    def displayError(message):
+        log.error(message)
+
+    @staticmethod
+    def displayWarning(message):
+        log.warning(message)
+
+    @staticmethod
+    def displayInfo(message):
+        log.info(message)
@@ -0,0 +1,7 @@
+"""Stand-in for maya.OpenMayaUI; there is no main window outside Maya."""
+
+
+class MQtUtil(object):
+    @staticmethod
+    def mainWindow():
+        return None
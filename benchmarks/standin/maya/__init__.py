@@ -0,0 +1,5 @@
+"""In-memory stand-in for the Maya Python modules used by src/.
+
+Put the benchmarks/standin directory on sys.path ahead of any real Maya
+install to run the tools outside a Maya session.
+"""
@@ -0,0 +1,223 @@
+"""In-memory scene graph shared by the stand-in Maya modules."""
+import itertools
+import pickle
+import re
+import uuid
+
+import numpy as np
+
+IDENTITY = [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0,
+            0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+
+_TRAILING_DIGITS = re.compile(r"\d+$")
+
+
+class Node(object):
+    """A DAG or DG node with a flat attribute dictionary."""
+    def __init__(self, name, node_type, parent=None):
+        self.name = name
+        self.type = node_type
+        self.parent = parent
+        self.children = []
+        self.attrs = {}
+        self.matrix = list(IDENTITY)
+        self.uuid = str(uuid.uuid4()).upper()
+        self.mesh = None
+        self.instance_of = None
+        if node_type == "transform":
+            self.attrs["scale"] = (1.0, 1.0, 1.0)
+
+    @property
+    def full_path(self):
+        path = "|" + self.name
+        if self.parent is not None:
+            path = self.parent.full_path + path
+        return path
+
+
+class MeshGeometry(object):
+    """Points, vertex normals and triangles of a stand-in mesh shape."""
+    def __init__(self, points, normals, triangles):
+        self.points = np.asarray(points, dtype=np.float64)
+        self.normals = np.asarray(normals, dtype=np.float64)
+        self.triangles = np.asarray(triangles, dtype=np.int64).reshape(-1, 3)
+        self.color_sets = {}
+
+
+class Scene(object):
+    """The whole stand-in session: nodes, selection, undo and file state."""
+    def __init__(self):
+        self.reset()
+
+    def reset(self, workspace="."):
+        self.nodes = {}
+        self.selection = []
+        self.undo_enabled = True
+        self.undo_chunks = []
+        self.undo_registered = []
+        self.plugins = set()
+        self.scene_name = ""
+        self.workspace = workspace
+        self.callbacks = {}
+        self._counters = {}
+        self._callback_ids = itertools.count(1)
+        camera = self.create("persp", "transform")
+        camera.matrix[12:15] = [28.0, 21.0, 28.0]
+
+    def unique_name(self, base):
+        """Returns base if free, otherwise base with the next free number."""
+        if base not in self.nodes:
+            return base
+        stem = _TRAILING_DIGITS.sub("", base)
+        number = self._counters.get(stem, 0)
+        while True:
+            number += 1
+            candidate = "{}{}".format(stem, number)
+            if candidate not in self.nodes:
+                self._counters[stem] = number
+                return candidate
+
+    def create(self, name, node_type, parent=None):
+        node = Node(self.unique_name(name), node_type, parent)
+        self.nodes[node.name] = node
+        if parent is not None:
+            parent.children.append(node)
+        return node
+
+    def find(self, name):
+        """Resolves a short name, DAG path, attribute or component name.
+
+        Return:
+            Node: The node, or None if it does not exist.
+        """
+        name = name.split(".")[0].split("|")[-1]
+        return self.nodes.get(name)
+
+    def get(self, name):
+        node = self.find(name)
+        if node is None:
+            raise ValueError("No object matches name: {}".format(name))
+        return node
+
+    def reparent(self, node, parent):
+        if node.parent is not None:
+            node.parent.children.remove(node)
+        node.parent = parent
+        if parent is not None:
+            parent.children.append(node)
+
+    def delete(self, node):
+        self.reparent(node, None)
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            pending.extend(current.children)
+            self.nodes.pop(current.name, None)
+        self.selection = [item for item in self.selection
+                          if self.find(item) is not None]
+
+    def save(self, path):
+        """Pickles the node graph, standing in for a Maya scene file."""
+        with open(path, "wb") as scene_file:
+            pickle.dump((self.nodes, self.selection), scene_file)
+        self.scene_name = str(path)
+
+    def open(self, path):
+        workspace = self.workspace
+        with open(path, "rb") as scene_file:
+            nodes, selection = pickle.load(scene_file)
+        self.reset(workspace)
+        self.nodes, self.selection = nodes, selection
+        self.scene_name = str(path)
+
+    def export(self, path, roots):
+        """Pickles the hierarchies under roots, standing in for exporting
+        the selection to a scene file."""
+        nodes = {}
+        pending = list(roots)
+        while pending:
+            current = pending.pop()
+            nodes[current.name] = current
+            pending.extend(current.children)
+        with open(path, "wb") as scene_file:
+            pickle.dump(([root.name for root in roots], nodes), scene_file)
+
+    def reference(self, path, namespace, reference_node=None):
+        """Adds the roots exported to path under a namespace, or replaces
+        the nodes of an existing reference node with them.
+
+        Return:
+            tuple: The reference node and the new node names.
+        """
+        if reference_node is None:
+            taken = set(name.split(":")[0] for name in self.nodes
+                        if ":" in name)
+            base, number = namespace, 0
+            while namespace in taken:
+                number += 1
+                namespace = "{}{}".format(base, number)
+            reference_node = self.create(namespace + "RN", "reference")
+            reference_node.attrs["namespace"] = namespace
+        else:
+            for name in reference_node.attrs["nodes"]:
+                if name in self.nodes:
+                    self.delete(self.nodes[name])
+        namespace = reference_node.attrs["namespace"]
+        with open(path, "rb") as scene_file:
+            roots, nodes = pickle.load(scene_file)
+        for node in nodes.values():
+            node.name = "{}:{}".format(namespace, node.name)
+            node.attrs["referenceNode"] = reference_node.name
+            self.nodes[node.name] = node
+        for name in roots:
+            nodes[name].parent = None
+        reference_node.attrs["nodes"] = [node.name
+                                         for node in nodes.values()]
+        reference_node.attrs["path"] = str(path)
+        return reference_node, reference_node.attrs["nodes"]
+
+    def shape_of(self, node):
+        if node.mesh is not None:
+            return node
+        if node.instance_of is not None:
+            return self.shape_of(node.instance_of)
+        for child in node.children:
+            if child.mesh is not None:
+                return child
+        return None
+
+    def add_callback(self, node, func, client_data):
+        callback_id = next(self._callback_ids)
+        self.callbacks[callback_id] = (node, func, client_data)
+        return callback_id
+
+    def notify(self, node):
+        """Fires every callback watching node or its shape."""
+        watched = [node] + node.children
+        for callback_node, func, client_data in list(self.callbacks.values()):
+            if callback_node in watched:
+                func(callback_node, client_data)
+
+
+SCENE = Scene()
+
+
+def reset(workspace="."):
+    """Clears the stand-in session."""
+    SCENE.reset(workspace)
+
+
+def create_mesh(name, points, normals, triangles, matrix=None):
+    """Creates a transform with a mesh shape from raw arrays.
+
+    Return:
+        list: The transform and shape names.
+    """
+    transform = SCENE.create(name, "transform")
+    shape = SCENE.create(transform.name + "Shape", "mesh", transform)
+    shape.mesh = MeshGeometry(points, normals, triangles)
+    if matrix is not None:
+        transform.matrix = [float(value) for value in
+                            np.asarray(matrix).ravel()]
+    SCENE.selection = [transform.name]
+    return [transform.name, shape.name]
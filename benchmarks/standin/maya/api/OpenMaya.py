@@ -0,0 +1,112 @@
+"""Stand-in for the parts of the Maya Python API 2.0 used by src/."""
+from maya._scene import SCENE
+
+
+class MSpace(object):
+    kObject = 2
+    kWorld = 4
+
+
+class MUuid(object):
+    def __init__(self, value):
+        self._value = value
+
+    def asString(self):
+        return self._value
+
+
+class MDagPath(object):
+    def __init__(self, node):
+        self._node = node
+
+    def node(self):
+        return self._node
+
+    def extendToShape(self):
+        shape = SCENE.shape_of(self._node)
+        if shape is None:
+            raise RuntimeError("{} has no shape".format(self._node.name))
+        self._transform = self._node if shape is not self._node \
+            else self._node.parent
+        self._node = shape
+        return self
+
+    def inclusiveMatrix(self):
+        transform = self._node
+        if self._node.mesh is not None:
+            transform = getattr(self, "_transform", self._node.parent)
+        return list(transform.matrix)
+
+    def fullPathName(self):
+        return self._node.full_path
+
+    def transform(self):
+        return getattr(self, "_transform", self._node)
+
+
+class MSelectionList(object):
+    def __init__(self):
+        self._items = []
+
+    def add(self, name):
+        self._items.append(SCENE.get(name))
+        return self
+
+    def getDagPath(self, index):
+        return MDagPath(self._items[index])
+
+
+class MFnDependencyNode(object):
+    def __init__(self, node):
+        self._node = node
+
+    def uuid(self):
+        return MUuid(self._node.uuid)
+
+
+class MFnMesh(object):
+    def __init__(self, dag_path):
+        self._mesh = dag_path.node().mesh
+
+    def getPoints(self, space=MSpace.kObject):
+        points = self._mesh.points
+        return [(x, y, z, 1.0) for x, y, z in points.tolist()]
+
+    def getVertexNormals(self, angle_weighted, space=MSpace.kObject):
+        return [tuple(normal) for normal in self._mesh.normals.tolist()]
+
+    @property
+    def numVertices(self):
+        return len(self._mesh.points)
+
+    def getColorSetNames(self):
+        return list(self._mesh.color_sets)
+
+    def getVertexColors(self, color_set=None):
+        return [tuple(color) for color in
+                self._mesh.color_sets[color_set].tolist()]
+
+    def getTriangles(self):
+        triangles = self._mesh.triangles
+        return [], triangles.ravel().tolist()
+
+
+class MMessage(object):
+    @staticmethod
+    def removeCallbacks(callback_ids):
+        for callback_id in callback_ids:
+            SCENE.callbacks.pop(callback_id, None)
+
+
+class MNodeMessage(MMessage):
+    @staticmethod
+    def addNodeDirtyCallback(node, func, client_data=None):
+        return SCENE.add_callback(node, func, client_data)
+
+
+class MDagMessage(MMessage):
+    @staticmethod
+    def addWorldMatrixModifiedCallback(dag_path, func, client_data=None):
+        def notify(node, data):
+            func(node, 0, data)
+        return SCENE.add_callback(dag_path.transform(), notify, client_data)
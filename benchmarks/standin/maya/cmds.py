@@ -0,0 +1,320 @@
+"""Stand-in for the subset of maya.cmds used by the tools in src/."""
+import numpy as np
+
+from maya._scene import SCENE, create_mesh
+
+
+def _flag(kwargs, *names, **default):
+    for name in names:
+        if name in kwargs:
+            return kwargs[name]
+    return default.get("default")
+
+
+def _as_list(items):
+    if items is None:
+        return []
+    if isinstance(items, (list, tuple)):
+        return list(items)
+    return [items]
+
+
+def objExists(name):
+    return SCENE.find(name) is not None
+
+
+def ls(*args, **kwargs):
+    if _flag(kwargs, "sl", "selection", "orderedSelection", "os"):
+        names = list(SCENE.selection)
+    elif args:
+        names = [name for item in args for name in _as_list(item)
+                 if SCENE.find(name) is not None]
+    else:
+        names = list(SCENE.nodes)
+    if _flag(kwargs, "transforms", "tr"):
+        names = [name for name in names if "." not in name
+                 and SCENE.get(name).type == "transform"]
+    if _flag(kwargs, "long", "l"):
+        names = [SCENE.get(name).full_path if "." not in name else name
+                 for name in names]
+    return names
+
+
+def select(*args, **kwargs):
+    if _flag(kwargs, "clear", "cl"):
+        SCENE.selection = []
+        return
+    items = [name for item in args for name in _as_list(item)]
+    if _flag(kwargs, "add", "af"):
+        SCENE.selection += items
+    else:
+        SCENE.selection = items
+
+
+def undoInfo(*args, **kwargs):
+    if _flag(kwargs, "query", "q"):
+        return SCENE.undo_enabled
+    if _flag(kwargs, "openChunk", "ock"):
+        SCENE.undo_chunks.append(_flag(kwargs, "chunkName", "cn"))
+    if _flag(kwargs, "closeChunk", "cck") and SCENE.undo_chunks:
+        SCENE.undo_chunks.pop()
+    state = _flag(kwargs, "stateWithoutFlush", "swf", "state", "st")
+    if state is not None:
+        SCENE.undo_enabled = bool(state)
+
+
+def pluginInfo(*args, **kwargs):
+    return args[0] in SCENE.plugins
+
+
+def loadPlugin(*args, **kwargs):
+    SCENE.plugins.add(args[0])
+
+
+def scatterRegisterUndo(*args, **kwargs):
+    """The scatter_plugin command; records the nodes it would delete on
+    undo."""
+    names = [SCENE.get(name).name for name in args]
+    SCENE.undo_registered.append(names)
+    return names
+
+
+def workspace(*args, **kwargs):
+    return SCENE.workspace
+
+
+def file(*args, **kwargs):
+    if _flag(kwargs, "new", "f"):
+        SCENE.reset(SCENE.workspace)
+    elif _flag(kwargs, "open", "o"):
+        SCENE.open(args[0])
+    elif _flag(kwargs, "reference", "r"):
+        return SCENE.reference(args[0],
+                               _flag(kwargs, "namespace", "ns"))[1]
+    elif _flag(kwargs, "loadReference", "lr"):
+        return SCENE.reference(
+            args[0], None,
+            SCENE.get(_flag(kwargs, "loadReference", "lr")))[1]
+    elif _flag(kwargs, "query", "q"):
+        return SCENE.scene_name
+
+
+def referenceQuery(*args, **kwargs):
+    node = SCENE.get(args[0])
+    if _flag(kwargs, "filename", "f"):
+        if node.type != "reference":
+            node = SCENE.get(node.attrs["referenceNode"])
+        return node.attrs["path"]
+    return node.attrs["referenceNode"]
+
+
+def group(*args, **kwargs):
+    parent_name = _flag(kwargs, "parent", "p")
+    node = SCENE.create(_flag(kwargs, "name", "n", default="group1"),
+                        "transform",
+                        SCENE.get(parent_name) if parent_name else None)
+    if not _flag(kwargs, "empty", "em"):
+        items = [name for item in args for name in _as_list(item)]
+        for item in items or list(SCENE.selection):
+            SCENE.reparent(SCENE.get(item), node)
+    SCENE.selection = [node.name]
+    return node.name
+
+
+def parent(*args, **kwargs):
+    items = [name for item in args[:-1] for name in _as_list(item)]
+    new_parent = SCENE.get(args[-1])
+    for item in items:
+        SCENE.reparent(SCENE.get(item), new_parent)
+    return [SCENE.get(item).name for item in items]
+
+
+def instance(*args, **kwargs):
+    source = SCENE.get(_as_list(args[0])[0] if args else SCENE.selection[0])
+    node = SCENE.create(_flag(kwargs, "name", "n", default=source.name),
+                        "transform")
+    node.matrix = list(source.matrix)
+    node.attrs = dict(source.attrs)
+    node.instance_of = source
+    SCENE.selection = [node.name]
+    return [node.name]
+
+
+def duplicate(*args, **kwargs):
+    source = SCENE.get(_as_list(args[0])[0] if args else SCENE.selection[0])
+    shape = SCENE.shape_of(source)
+    mesh = shape.mesh
+    names = create_mesh(_flag(kwargs, "name", "n", default=source.name),
+                        mesh.points.copy(), mesh.normals.copy(),
+                        mesh.triangles.copy(), source.matrix)
+    return names[:1]
+
+
+def polyReduce(*args, **kwargs):
+    """Keeps the first share of triangles; enough for display timing."""
+    mesh = SCENE.shape_of(SCENE.get(_as_list(args[0])[0])).mesh
+    keep = max(1, int(len(mesh.triangles)
+                      * (1.0 - _flag(kwargs, "percentage", "p",
+                                     default=50.0) / 100.0)))
+    mesh.triangles = mesh.triangles[:keep]
+
+
+def makeIdentity(*args, **kwargs):
+    node = SCENE.get(_as_list(args[0])[0])
+    shape = SCENE.shape_of(node)
+    if _flag(kwargs, "apply", "a") and shape is not None:
+        matrix = np.array(node.matrix).reshape(4, 4)
+        shape.mesh.points = np.dot(shape.mesh.points, matrix[:3, :3]) \
+            + matrix[3, :3]
+    node.matrix = [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0,
+                   0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+
+
+def getPanel(*args, **kwargs):
+    if _flag(kwargs, "typeOf", "to"):
+        return "modelPanel"
+    return "modelPanel4"
+
+
+def modelPanel(*args, **kwargs):
+    return "persp"
+
+
+def delete(*args, **kwargs):
+    if _flag(kwargs, "constructionHistory", "ch"):
+        return
+    for name in [name for item in args for name in _as_list(item)]:
+        node = SCENE.find(name)
+        if node is not None:
+            SCENE.delete(node)
+
+
+def listRelatives(*args, **kwargs):
+    node = SCENE.get(_as_list(args[0])[0])
+    if _flag(kwargs, "parent", "p"):
+        related = [node.parent] if node.parent is not None else []
+    else:
+        related = list(node.children)
+        if _flag(kwargs, "shapes", "s"):
+            related = [child for child in related if child.mesh is not None]
+    if not related:
+        return None
+    if _flag(kwargs, "fullPath", "f"):
+        return [item.full_path for item in related]
+    return [item.name for item in related]
+
+
+def xform(*args, **kwargs):
+    node = SCENE.get(_as_list(args[0])[0] if args else SCENE.selection[0])
+    if _flag(kwargs, "query", "q"):
+        if _flag(kwargs, "boundingBox", "bb"):
+            points = SCENE.shape_of(node).mesh.points
+            if _flag(kwargs, "worldSpace", "ws"):
+                matrix = np.array(node.matrix).reshape(4, 4)
+                points = points.dot(matrix[:3, :3]) + matrix[3, :3]
+            return points.min(axis=0).tolist() + points.max(axis=0).tolist()
+        if _flag(kwargs, "translation", "t"):
+            return list(node.matrix[12:15])
+        return list(node.matrix)
+    translation = _flag(kwargs, "translation", "t")
+    if translation is not None:
+        node.matrix[12:15] = [float(value) for value in translation]
+        SCENE.notify(node)
+    matrix = _flag(kwargs, "matrix", "m")
+    if matrix is not None:
+        node.matrix = [float(value) for value in matrix]
+        SCENE.notify(node)
+
+
+def getAttr(attr, **kwargs):
+    node_name, name = attr.split(".", 1)
+    value = SCENE.get(node_name).attrs[name]
+    if isinstance(value, tuple):
+        return [value]
+    return value
+
+
+def setAttr(attr, *values, **kwargs):
+    node_name, name = attr.split(".", 1)
+    node = SCENE.get(node_name)
+    data_type = kwargs.get("type")
+    if data_type == "vectorArray":
+        node.attrs[name] = np.asarray(values[1:], dtype=np.float64)
+    elif data_type == "doubleArray":
+        node.attrs[name] = np.asarray(values[0], dtype=np.float64)
+    elif len(values) == 1:
+        node.attrs[name] = values[0]
+    else:
+        node.attrs[name] = tuple(values)
+    SCENE.notify(node)
+
+
+def addAttr(*args, **kwargs):
+    node = SCENE.get(_as_list(args[0])[0])
+    node.attrs.setdefault(_flag(kwargs, "longName", "ln"), None)
+
+
+def attributeQuery(name, **kwargs):
+    return name in SCENE.get(kwargs["node"]).attrs
+
+
+def polyListComponentConversion(*args, **kwargs):
+    return [name for item in args for name in _as_list(item)
+            if ".vtx[" in name]
+
+
+def polyPlane(name="pPlane1", width=1.0, height=1.0, subdivisionsX=10,
+              subdivisionsY=10, **kwargs):
+    """Creates a grid mesh in the XZ plane facing +Y.
+
+    Return:
+        list: The transform and shape names.
+    """
+    xs = np.linspace(-width / 2.0, width / 2.0, subdivisionsX + 1)
+    zs = np.linspace(-height / 2.0, height / 2.0, subdivisionsY + 1)
+    grid_x, grid_z = np.meshgrid(xs, zs)
+    points = np.column_stack((grid_x.ravel(), np.zeros(grid_x.size),
+                              grid_z.ravel()))
+    normals = np.tile([0.0, 1.0, 0.0], (len(points), 1))
+    row = subdivisionsX + 1
+    corners = np.arange(subdivisionsY)[:, None] * row \
+        + np.arange(subdivisionsX)[None, :]
+    corners = corners.ravel()
+    triangles = np.concatenate((
+        np.column_stack((corners, corners + row, corners + 1)),
+        np.column_stack((corners + 1, corners + row, corners + row + 1))))
+    return create_mesh(name, points, normals, triangles)
+
+
+def polyCube(name="pCube1", width=1.0, height=1.0, depth=1.0, **kwargs):
+    """Creates an eight vertex box centred on the origin.
+
+    Return:
+        list: The transform and shape names.
+    """
+    half = np.array([width, height, depth]) / 2.0
+    signs = np.array([[x, y, z] for x in (-1, 1) for y in (-1, 1)
+                      for z in (-1, 1)], dtype=np.float64)
+    triangles = [[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5],
+                 [0, 5, 1], [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4],
+                 [1, 5, 7], [1, 7, 3]]
+    normals = signs / np.linalg.norm(signs, axis=1)[:, None]
+    return create_mesh(name, signs * half, normals, triangles)
+
+
+def particle(*args, **kwargs):
+    positions = np.asarray(_flag(kwargs, "position", "p", default=[]),
+                           dtype=np.float64).reshape(-1, 3)
+    transform = SCENE.create(_flag(kwargs, "name", "n", default="particle1"),
+                             "transform")
+    shape = SCENE.create(transform.name + "Shape", "particle", transform)
+    shape.attrs["position"] = positions
+    shape.attrs["isDynamic"] = True
+    return [transform.name, shape.name]
+
+
+def particleInstancer(*args, **kwargs):
+    node = SCENE.create(_flag(kwargs, "name", "n", default="instancer1"),
+                        "instancer")
+    node.attrs.update(kwargs)
+    return node.name
@@ -0,0 +1,6 @@
+"""Stand-in for maya.mel; the tools in src/ no longer evaluate MEL."""
+
+
+def eval(command):
+    raise RuntimeError("MEL is not available in the stand-in: {}".format(
+        command))
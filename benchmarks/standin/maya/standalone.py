@@ -0,0 +1,10 @@
+"""Stand-in for maya.standalone."""
+from maya import _scene
+
+
+def initialize(name="python"):
+    _scene.reset()
+
+
+def uninitialize():
+    _scene.reset()
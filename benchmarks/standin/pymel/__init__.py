@@ -0,0 +1 @@
+"""Stand-in for the parts of PyMEL used by src/."""
@@ -0,0 +1,2 @@
+"""Stand-in for pymel.core."""
+from pymel.core import system
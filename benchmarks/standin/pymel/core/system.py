@@ -0,0 +1,68 @@
+"""Stand-in for pymel.core.system: scene file state and path.py's Path."""
+import fnmatch as _fnmatch
+import os
+
+from maya._scene import SCENE
+
+
+class Path(str):
+    """The subset of PyMEL's path.py Path used by smartsave."""
+    def __div__(self, other):
+        return Path(os.path.join(self, other))
+
+    __truediv__ = __div__
+
+    @property
+    def parent(self):
+        return Path(os.path.dirname(self))
+
+    @property
+    def name(self):
+        return Path(os.path.basename(self))
+
+    def files(self, pattern=None):
+        entries = sorted(os.listdir(self)) if os.path.isdir(self) else []
+        return [self / entry for entry in entries
+                if os.path.isfile(os.path.join(self, entry))
+                and (pattern is None or _fnmatch.fnmatch(entry, pattern))]
+
+    def fnmatch(self, pattern):
+        return _fnmatch.fnmatch(self.name, pattern)
+
+    def exists(self):
+        return os.path.exists(self)
+
+    def makedirs_p(self):
+        if not os.path.isdir(self):
+            os.makedirs(self)
+        return self
+
+
+def sceneName():
+    return Path(SCENE.scene_name)
+
+
+def saveAs(path, **kwargs):
+    """Writes the stand-in scene graph to path.
+
+    Return:
+        Path: The saved path.
+    """
+    path = Path(path)
+    if not os.path.isdir(path.parent):
+        raise RuntimeError("Directory does not exist: {}".format(path.parent))
+    SCENE.save(path)
+    return path
+
+
+def exportSelected(path, **kwargs):
+    """Writes the selected hierarchies to path.
+
+    Return:
+        Path: The exported path.
+    """
+    path = Path(path)
+    if not os.path.isdir(path.parent):
+        raise RuntimeError("Directory does not exist: {}".format(path.parent))
+    SCENE.export(path, [SCENE.get(name) for name in SCENE.selection])
+    return path
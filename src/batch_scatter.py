@@ -0,0 +1,187 @@
+"""Headless batch scatter across many scenes, driven by a JSON job file.
+
+Run with mayapy so each worker can start Maya in standalone mode:
+
+    mayapy batch_scatter.py jobs.json --workers 8 --report report.json
+
+The job file holds shared defaults and a list of jobs. Each job overrides
+any default, names the scene to open and is saved through SceneFile as the
+next free version of its descriptor and task. Jobs may target point files
+through "point_clouds" as well as, or instead of, scene "targets". A job
+with a "cache" path also writes its placements there as a point cache, and
+one with "profile" set adds the run's stage times and host command counts to
+its report entry:
+
+    {
+        "defaults": {"scatter_objs": ["rock", "bush"], "point_count": 5000,
+                     "sample_mode": "surface", "rot_range_y": [0, 360],
+                     "task": "scatter"},
+        "jobs": [
+            {"scene": "/shots/sh010/scenes/sh010_layout_v004.ma",
+             "targets": ["ground", "hill.vtx[0:999]"], "seed": 10},
+            {"scene": "/shots/sh020/scenes/sh020_layout_v002.ma",
+             "targets": ["ground"], "seed": 20, "obj_weights": [3, 1]}
+        ]
+    }
+
+Jobs run in a pool of worker processes, one scene at a time per worker, so
+throughput scales with the number of cores. Each worker computes its
+placements on a single process.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import sys
+import timeit
+
+log = logging.getLogger(__name__)
+
+OUTPUT_SETTINGS = ["folder", "descriptor", "task"]
+
+
+def load_jobs(path):
+    """Reads a job file and merges each job over the shared defaults.
+
+    Return:
+        list: One settings dictionary per job.
+    """
+    with open(path, "r") as job_file:
+        spec = json.load(job_file)
+    if isinstance(spec, list):
+        spec = {"jobs": spec}
+    defaults = spec.get("defaults", {})
+    jobs = []
+    for job in spec.get("jobs", []):
+        settings = dict(defaults)
+        settings.update(job)
+        if not settings.get("scatter_objs"):
+            raise ValueError("Job {} has no scatter_objs.".format(len(jobs)))
+        if not settings.get("targets") and not settings.get("point_clouds"):
+            raise ValueError("Job {} has no targets.".format(len(jobs)))
+        jobs.append(settings)
+    return jobs
+
+
+def _initialize_worker():
+    """Starts Maya in standalone mode once per worker process."""
+    import maya.standalone
+    maya.standalone.initialize(name="python")
+
+
+def _open_scene(scene):
+    import maya.cmds as cmds
+    if scene:
+        cmds.file(scene, open=True, force=True)
+    else:
+        cmds.file(new=True, force=True)
+
+
+def configure_tool(tool, job):
+    """Applies a job's targets, scatter objects and modifiers to a
+    ScatterTool."""
+    tool.set_targets(job.get("targets", []))
+    tool.scatter_objs = list(job["scatter_objs"])
+    tool.obj_weights = [1.0] * len(tool.scatter_objs)
+    tool.apply_settings(job)
+    tool.cache_path = job.get("cache")
+    tool.profiling = bool(job.get("profile", False))
+    tool.workers = 1
+
+
+def run_job(job):
+    """Opens a job's scene, scatters and saves the result as a new
+    version.
+
+    Return:
+        dict: The scene, saved path, point count, timing and any error.
+    """
+    import scatter
+    import smartsave
+
+    start = timeit.default_timer()
+    result = {"scene": job.get("scene"), "path": None, "points": 0,
+              "error": None}
+    try:
+        _open_scene(job.get("scene"))
+        tool = scatter.ScatterTool()
+        configure_tool(tool, job)
+        try:
+            result["group"] = tool.scatter()
+        finally:
+            tool.close()
+        result["points"] = tool.last_points
+        if tool.last_profile is not None:
+            result["profile"] = tool.last_profile.as_dict()
+        scene_file = smartsave.SceneFile()
+        for name in OUTPUT_SETTINGS:
+            if job.get(name):
+                setattr(scene_file, "folder_path" if name == "folder"
+                        else name, job[name])
+        scene_file.save_increment()
+        result["path"] = str(scene_file.path)
+    except Exception as error:
+        log.exception("Scatter job failed for %s", job.get("scene"))
+        result["error"] = "{}: {}".format(type(error).__name__, error)
+    result["seconds"] = timeit.default_timer() - start
+    return result
+
+
+def run_jobs(jobs, workers=None):
+    """Runs every job, spreading them over a pool of standalone workers.
+
+    Yields:
+        dict: Each job's result as soon as it finishes.
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = max(1, min(workers, len(jobs)))
+    if workers == 1:
+        _initialize_worker()
+        for job in jobs:
+            yield run_job(job)
+        return
+    pool = multiprocessing.Pool(workers, initializer=_initialize_worker)
+    try:
+        for result in pool.imap_unordered(run_job, jobs):
+            yield result
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Scatter objects across many scenes headless.")
+    parser.add_argument("job_file", help="JSON job specification.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Worker processes, one per core by default.")
+    parser.add_argument("--report", help="Write job results here as JSON.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    jobs = load_jobs(args.job_file)
+    start = timeit.default_timer()
+    results = []
+    for result in run_jobs(jobs, args.workers):
+        results.append(result)
+        if result["error"]:
+            log.error("[%d/%d] %s failed: %s", len(results), len(jobs),
+                      result["scene"], result["error"])
+        else:
+            log.info("[%d/%d] %s -> %s (%d points, %.1fs)", len(results),
+                     len(jobs), result["scene"], result["path"],
+                     result["points"], result["seconds"])
+    elapsed = timeit.default_timer() - start
+    failed = len([result for result in results if result["error"]])
+    log.info("Finished %d jobs in %.1fs, %d failed.", len(results), elapsed,
+             failed)
+    if args.report:
+        with open(args.report, "w") as report_file:
+            json.dump({"seconds": elapsed, "jobs": results}, report_file,
+                      indent=2)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
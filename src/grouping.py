@@ -0,0 +1,159 @@
+"""Spatial grouping of scattered instances.
+
+A flat group of many thousands of instances makes the Outliner, selection
+and per-region edits slow, and gives no handle on part of a set. An Octree
+splits the scatter's bounds into nested cells, each holding at most
+max_children instances or up to eight child cells, so any region can be
+hidden, selected or culled through a single group. The bounds only need to
+be a first guess: the root cell grows to take in points outside it.
+"""
+import collections
+
+import numpy as np
+
+MAX_DEPTH = 10
+MAX_GROWTH = 64
+
+
+def point_bounds(positions):
+    """Returns the axis aligned box around a set of points.
+
+    Return:
+        tuple: The (3,) lower and upper corners, or None if there are no
+            points.
+    """
+    positions = np.asarray(positions).reshape(-1, 3)
+    if not len(positions):
+        return None
+    return positions.min(axis=0), positions.max(axis=0)
+
+
+class OctreeNode(object):
+    """A cube of space holding either items or eight child cells.
+
+    key lists the octant taken at each level from the root, so it is unique
+    within a tree and gives the depth of the cell.
+    """
+    def __init__(self, lower, upper, parent=None, key=""):
+        self.lower = lower
+        self.upper = upper
+        self.parent = parent
+        self.key = key
+        self.children = None
+        self.items = []
+        self.positions = np.empty((0, 3))
+        self.group = None
+
+    @property
+    def center(self):
+        return (self.lower + self.upper) / 2
+
+    def octants(self, positions):
+        """Returns the child octant, 0 to 7, containing each position."""
+        return np.dot(positions > self.center, [1, 2, 4])
+
+    def split(self):
+        center = self.center
+        self.children = []
+        for octant in range(8):
+            upper_half = np.array([octant & 1, octant & 2, octant & 4],
+                                  dtype=bool)
+            self.children.append(OctreeNode(
+                np.where(upper_half, center, self.lower),
+                np.where(upper_half, self.upper, center),
+                self, self.key + str(octant)))
+
+
+class Octree(object):
+    """Files items into leaf cells by position, splitting any leaf that
+    grows past max_children.
+
+    Items may arrive over several inserts, so a split can move items filed
+    by an earlier insert; insert reports those moves along with the new
+    items. Items must be hashable and unique.
+
+    When items fall outside the root cell, the root is doubled toward them
+    until it holds them, and the old root becomes one of the new root's
+    children.
+    """
+    def __init__(self, lower, upper, max_children=500, max_depth=MAX_DEPTH):
+        lower = np.asarray(lower, dtype=np.float64)
+        upper = np.asarray(upper, dtype=np.float64)
+        half = max((upper - lower).max() / 2, 1e-6)
+        center = (lower + upper) / 2
+        self.root = OctreeNode(center - half, center + half)
+        self.max_children = max(1, int(max_children))
+        self.max_depth = max_depth
+        self._leaves = {}
+
+    def insert(self, positions, items):
+        """Files items at the given positions into leaf cells.
+
+        The root grows first to take in positions outside it, up to
+        MAX_GROWTH times; anything still outside goes to the nearest cell.
+
+        Return:
+            OrderedDict: Leaf node to the items newly filed under it,
+                including items moved there from a split cell. These are
+                always the last items of the leaf's items list.
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+        self._grow(positions)
+        filed = collections.OrderedDict()
+        pending = [(self.root, positions, list(items))]
+        while pending:
+            node, positions, items = pending.pop()
+            if node.children is None:
+                if len(node.items) + len(items) <= self.max_children \
+                        or len(node.key) >= self.max_depth:
+                    node.items.extend(items)
+                    node.positions = np.concatenate(
+                        [node.positions, positions])
+                    filed.setdefault(node, []).extend(items)
+                    self._leaves.update((item, node) for item in items)
+                    continue
+                positions = np.concatenate([node.positions, positions])
+                items = node.items + items
+                node.items = []
+                node.positions = np.empty((0, 3))
+                node.split()
+            octants = node.octants(positions)
+            for octant in np.unique(octants):
+                indices = np.flatnonzero(octants == octant)
+                pending.append((node.children[octant], positions[indices],
+                                [items[idx] for idx in indices]))
+        return filed
+
+    def _grow(self, positions):
+        """Doubles the root toward positions outside it until it holds
+        them."""
+        if not len(positions):
+            return
+        lower, upper = positions.min(axis=0), positions.max(axis=0)
+        for _ in range(MAX_GROWTH):
+            old = self.root
+            below = lower < old.lower
+            if not below.any() and not (upper > old.upper).any():
+                return
+            size = old.upper - old.lower
+            root = OctreeNode(np.where(below, old.lower - size, old.lower),
+                              np.where(below, old.upper, old.upper + size))
+            root.split()
+            octant = int(np.dot(below, [1, 2, 4]))
+            root.children[octant] = old
+            old.parent = root
+            pending = [old]
+            while pending:
+                node = pending.pop()
+                node.key = str(octant) + node.key
+                pending.extend(node.children or [])
+            self.root = root
+
+    def remove(self, items):
+        """Takes items out of the cells they were filed in. Cells are never
+        merged back."""
+        for item in items:
+            leaf = self._leaves.pop(item)
+            idx = leaf.items.index(item)
+            del leaf.items[idx]
+            leaf.positions = np.delete(leaf.positions, idx, axis=0)
@@ -0,0 +1,149 @@
+"""Lightweight proxy prototypes and distance LOD for scattered instances.
+
+A proxied scatter instances swap groups instead of the scatter objects.
+Each object gets a near and a far swap group, and each group holds an
+instance of the real object and of a cheap proxy: a bounding box or a
+decimated copy. Instances share their prototype's children, so showing or
+hiding those children changes how every instance draws. Switching between
+full, proxy and distance LOD display flips a few visibility attributes and
+never touches the placements.
+"""
+import maya.cmds as cmds
+import numpy as np
+
+PROXY_TYPES = ["box", "reduced"]
+DISPLAY_MODES = ["full", "proxy", "lod"]
+
+IDENTITY = [1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0,
+            0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0]
+
+
+def make_proxy(obj, proxy_type="box", reduce_percent=90.0):
+    """Builds a proxy mesh in the object space of obj.
+
+    Args:
+        obj: The scatter object to stand in for.
+        proxy_type: "box" for its bounding box, or "reduced" for a copy
+            with reduce_percent of its polygons removed.
+
+    Return:
+        String: The proxy transform.
+    """
+    name = "{}_proxy".format(obj.split("|")[-1])
+    if proxy_type == "reduced":
+        proxy = cmds.duplicate(obj, name=name)[0]
+        cmds.polyReduce(proxy, percentage=reduce_percent,
+                        keepQuadsWeight=1.0)
+        cmds.delete(proxy, constructionHistory=True)
+    else:
+        bounds = np.array(cmds.xform(obj, query=True, boundingBox=True,
+                                     objectSpace=True)).reshape(2, 3)
+        size = np.maximum(bounds[1] - bounds[0], 1e-4)
+        proxy = cmds.polyCube(name=name, width=size[0], height=size[1],
+                              depth=size[2])[0]
+        cmds.xform(proxy, translation=((bounds[0] + bounds[1]) / 2).tolist())
+        cmds.makeIdentity(proxy, apply=True, translate=True)
+    cmds.xform(proxy, matrix=IDENTITY)
+    return proxy
+
+
+def camera_position(camera=None):
+    """Returns the world position of a camera, by default the one in the
+    focused viewport, falling back to persp.
+
+    Return:
+        ndarray: A (3,) world space position.
+    """
+    if camera is None:
+        camera = "persp"
+        panel = cmds.getPanel(withFocus=True)
+        if panel and cmds.getPanel(typeOf=panel) == "modelPanel":
+            camera = cmds.modelPanel(panel, query=True, camera=True)
+    return np.array(cmds.xform(camera, query=True, worldSpace=True,
+                               translation=True))
+
+
+class LodLibrary(object):
+    """Near and far swap groups for a list of scatter objects.
+
+    prototypes lists the near group of every object followed by the far
+    group of every object, so an instance's prototype index is its object
+    index, plus the object count when it is far from the camera.
+    """
+    def __init__(self, scatter_objs, proxy_type="box", reduce_percent=90.0,
+                 name="scatter_lod_grp"):
+        self.scatter_objs = list(scatter_objs)
+        self.proxy_type = proxy_type
+        self.reduce_percent = reduce_percent
+        self.name = name
+        self.root = None
+        self.near = []
+        self.far = []
+        self.display_mode = "proxy"
+
+    @property
+    def prototypes(self):
+        return self.near + self.far
+
+    def exists(self):
+        return bool(self.root) and cmds.objExists(self.root)
+
+    def build(self):
+        """Creates the hidden swap groups and proxies.
+
+        Return:
+            String: The hidden root group.
+        """
+        self.root = cmds.group(empty=True, name=self.name)
+        self.near = []
+        self.far = []
+        for obj in self.scatter_objs:
+            proxy = make_proxy(obj, self.proxy_type, self.reduce_percent)
+            short = obj.split("|")[-1]
+            for swaps, suffix in [(self.near, "_near"), (self.far, "_far")]:
+                real = cmds.instance(obj)[0]
+                cmds.xform(real, matrix=IDENTITY)
+                children = [real, proxy if suffix == "_near"
+                            else cmds.instance(proxy)[0]]
+                swap = cmds.group(children, name=short + suffix)
+                cmds.xform(swap, matrix=IDENTITY)
+                swaps.append(cmds.parent(swap, self.root)[0])
+        cmds.setAttr(self.root + ".visibility", False)
+        self.set_display_mode(self.display_mode)
+        return self.root
+
+    def set_display_mode(self, mode):
+        """Shows the real objects, the proxies, or real objects near the
+        camera and proxies far from it."""
+        if mode not in DISPLAY_MODES:
+            raise ValueError("Unknown display mode: {}".format(mode))
+        self.display_mode = mode
+        for group, far in [(group, False) for group in self.near] \
+                + [(group, True) for group in self.far]:
+            real, proxy = cmds.listRelatives(group, children=True,
+                                             fullPath=True)
+            show_real = mode == "full" or (mode == "lod" and not far)
+            cmds.setAttr(real + ".visibility", show_real)
+            cmds.setAttr(proxy + ".visibility", not show_real)
+
+    def assign(self, batches, camera, distance):
+        """Points each instance at the far group of its object when it lies
+        further than distance from camera.
+
+        Args:
+            camera: A (3,) world position, or None to keep every instance
+                on its near group.
+        """
+        count = len(self.scatter_objs)
+        for batch in batches:
+            batch = batch.copy()
+            if camera is not None:
+                far = np.linalg.norm(batch.matrices[:, 3, :3] - camera,
+                                     axis=1) > distance
+                batch.obj_indices = batch.obj_indices + far * count
+            yield batch
+
+    def delete(self):
+        if self.exists():
+            cmds.delete(self.root)
+        self.root = None
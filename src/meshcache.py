@@ -0,0 +1,88 @@
+"""Memory-bounded cache of mesh data for repeated scatters."""
+import collections
+import logging
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BUDGET = 512 * 1024 * 1024
+
+
+class MeshCache(object):
+    """Wraps a mesh data backend and keeps recently read meshes in memory.
+
+    Entries are keyed by the mesh identity plus the backend's change token,
+    so an edited or moved mesh is read again while an untouched one skips
+    extraction entirely. Derived tables stored on MeshData.derived count
+    toward the budget, and the least recently used meshes are evicted once
+    the budget is exceeded.
+    """
+    def __init__(self, backend, budget=DEFAULT_BUDGET):
+        self.backend = backend
+        self.budget = budget
+        self._entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def read(self, mesh):
+        """Returns the cached mesh data, reading it only when missing or
+        out of date.
+
+        Return:
+            MeshData: The mesh's points, normals and world matrix.
+        """
+        identity = self.backend.identity(mesh)
+        token = self.backend.change_token(mesh)
+        entry = self._entries.pop(identity, None)
+        if entry is None or entry.token != token:
+            entry = self.backend.read(mesh)
+            entry.token = token
+        self._entries[identity] = entry
+        self.evict()
+        return entry
+
+    def read_weights(self, mesh, map_name):
+        """Returns a per-vertex weight map, cached with the mesh it belongs
+        to so it is read again whenever the mesh changes.
+
+        Return:
+            ndarray: An (N,) array of weights between 0 and 1.
+        """
+        entry = self.read(mesh)
+        key = "weights:" + map_name
+        if key not in entry.derived:
+            entry.derived[key] = self.backend.read_weights(mesh, map_name)
+            self.evict()
+        return entry.derived[key]
+
+    def evict(self):
+        """Drops least recently used meshes until within budget, always
+        keeping the most recent one."""
+        total = self.nbytes
+        while total > self.budget and len(self._entries) > 1:
+            identity, entry = self._entries.popitem(last=False)
+            total -= entry.nbytes
+            log.debug("Evicted %s from mesh cache", entry.name)
+
+    def invalidate(self, mesh=None):
+        """Forgets one mesh, or every mesh if none is given."""
+        if mesh is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(self.backend.identity(mesh), None)
+
+    def identity(self, mesh):
+        return self.backend.identity(mesh)
+
+    def change_token(self, mesh):
+        return self.backend.change_token(mesh)
+
+    def release(self):
+        """Forgets every mesh and releases the backend's change tracking.
+        Tracking starts again with the next read."""
+        self._entries.clear()
+        self.backend.release()
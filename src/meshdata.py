@@ -0,0 +1,267 @@
+"""Bulk mesh data access for the scatter tool.
+
+A backend reads the points, vertex normals and world matrix of a whole mesh
+in one call and returns them as contiguous numpy arrays, so scattering costs
+one host round-trip per mesh rather than several per vertex.
+"""
+import collections
+import re
+
+import numpy as np
+
+try:
+    import maya.api.OpenMaya as om
+    import maya.cmds as cmds
+except ImportError:
+    om = cmds = None
+
+LUMINANCE = np.array([0.2126, 0.7152, 0.0722])
+
+_VTX_PATTERN = re.compile(r"^(?P<mesh>[^.]+)\.vtx\[(?P<start>\d+)"
+                          r"(?::(?P<end>\d+))?\]$")
+
+
+class MeshData(object):
+    """Object space geometry of a single mesh and its world matrix."""
+    def __init__(self, name, points, normals, world_matrix=None,
+                 triangles=None):
+        self.name = name
+        self.points = np.ascontiguousarray(points, dtype=np.float64)
+        self.normals = np.ascontiguousarray(normals, dtype=np.float64)
+        if triangles is None:
+            triangles = np.empty((0, 3))
+        self.triangles = np.ascontiguousarray(
+            triangles, dtype=np.int64).reshape(-1, 3)
+        if world_matrix is None:
+            world_matrix = np.identity(4)
+        self.world_matrix = np.asarray(
+            world_matrix, dtype=np.float64).reshape(4, 4)
+        self.derived = {}
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def nbytes(self):
+        """The memory held by the mesh arrays and any derived tables."""
+        total = (self.points.nbytes + self.normals.nbytes
+                 + self.triangles.nbytes + self.world_matrix.nbytes)
+        for value in self.derived.values():
+            total += getattr(value, "nbytes", 0)
+        return total
+
+    def world_points(self, indices=None):
+        """Returns points transformed by the mesh's world matrix.
+
+        Return:
+            ndarray: An (N, 3) array of world space positions.
+        """
+        points = self.points if indices is None else self.points[indices]
+        return self.to_world(points)
+
+    def to_world(self, points):
+        """Transforms object space points by the mesh's world matrix.
+
+        Return:
+            ndarray: An (N, 3) array of world space positions.
+        """
+        return (np.dot(points, self.world_matrix[:3, :3])
+                + self.world_matrix[3, :3])
+
+
+class OpenMayaMeshBackend(object):
+    """Reads mesh data through the Maya Python API 2.0.
+
+    Change tokens come from node dirty and world matrix callbacks that are
+    registered the first time a mesh is asked for one.
+    """
+    def __init__(self):
+        self._tokens = {}
+        self._callbacks = {}
+
+    @staticmethod
+    def _get_dag_path(mesh):
+        selection = om.MSelectionList()
+        selection.add(mesh)
+        dag_path = selection.getDagPath(0)
+        dag_path.extendToShape()
+        return dag_path
+
+    def read(self, mesh):
+        """Reads a mesh by transform or shape name.
+
+        Return:
+            MeshData: The mesh's points, normals and world matrix.
+        """
+        dag_path = self._get_dag_path(mesh)
+        fn_mesh = om.MFnMesh(dag_path)
+        points = np.array(fn_mesh.getPoints(om.MSpace.kObject))[:, :3]
+        normals = np.array(
+            fn_mesh.getVertexNormals(False, om.MSpace.kObject))
+        matrix = np.array(dag_path.inclusiveMatrix()).reshape(4, 4)
+        triangles = np.array(fn_mesh.getTriangles()[1])
+        return MeshData(mesh, points, normals, matrix, triangles)
+
+    def read_weights(self, mesh, map_name):
+        """Reads a per-vertex weight map from a colour set or from a
+        painted per-vertex double array attribute on the shape.
+
+        Colours are reduced to their luminance, and vertices left unpainted
+        in a colour set count as fully weighted.
+
+        Return:
+            ndarray: An (N,) array of weights between 0 and 1.
+        """
+        dag_path = self._get_dag_path(mesh)
+        fn_mesh = om.MFnMesh(dag_path)
+        if map_name in fn_mesh.getColorSetNames():
+            colors = np.array(fn_mesh.getVertexColors(map_name))
+            weights = np.dot(colors[:, :3], LUMINANCE)
+            weights[colors[:, 3] < 0.0] = 1.0
+        else:
+            attr = "{}.{}".format(dag_path.fullPathName(), map_name)
+            if not cmds.objExists(attr):
+                raise ValueError("{} has no colour set or weight map named "
+                                 "{}".format(mesh, map_name))
+            weights = np.array(cmds.getAttr(attr) or [], dtype=np.float64)
+        if len(weights) != fn_mesh.numVertices:
+            raise ValueError("Weight map {} on {} does not cover every "
+                             "vertex".format(map_name, mesh))
+        return np.clip(weights, 0.0, 1.0)
+
+    def identity(self, mesh):
+        """Returns the UUID of the mesh shape, which survives renames."""
+        shape = self._get_dag_path(mesh).node()
+        return om.MFnDependencyNode(shape).uuid().asString()
+
+    def change_token(self, mesh):
+        """Returns a counter that increases whenever the mesh's topology,
+        points or world matrix may have changed."""
+        key = self.identity(mesh)
+        if key not in self._callbacks:
+            dag_path = self._get_dag_path(mesh)
+            self._tokens[key] = 0
+            self._callbacks[key] = [
+                om.MNodeMessage.addNodeDirtyCallback(
+                    dag_path.node(), self._mark_dirty, key),
+                om.MDagMessage.addWorldMatrixModifiedCallback(
+                    dag_path, self._mark_moved, key)]
+        return self._tokens[key]
+
+    def _mark_dirty(self, node, key):
+        self._tokens[key] += 1
+
+    def _mark_moved(self, transform, modified, key):
+        self._tokens[key] += 1
+
+    def release(self):
+        """Removes every dirty tracking callback."""
+        for callback_ids in self._callbacks.values():
+            om.MMessage.removeCallbacks(callback_ids)
+        self._callbacks = {}
+        self._tokens = {}
+
+
+class InMemoryMeshBackend(object):
+    """Serves mesh data from memory, for running the scatter offline."""
+    def __init__(self):
+        self.meshes = {}
+        self.weight_maps = {}
+        self._tokens = {}
+
+    def add_mesh(self, name, points, normals, world_matrix=None,
+                 triangles=None):
+        self.meshes[name] = MeshData(name, points, normals, world_matrix,
+                                     triangles)
+        self._tokens[name] = self._tokens.get(name, -1) + 1
+        return self.meshes[name]
+
+    def add_weights(self, mesh, map_name, weights):
+        self.weight_maps[(mesh, map_name)] = np.clip(
+            np.asarray(weights, dtype=np.float64), 0.0, 1.0)
+        self._tokens[mesh] = self._tokens.get(mesh, -1) + 1
+
+    def read(self, mesh):
+        try:
+            return self.meshes[mesh]
+        except KeyError:
+            raise RuntimeError("No mesh data for {}".format(mesh))
+
+    def read_weights(self, mesh, map_name):
+        try:
+            return self.weight_maps[(mesh, map_name)]
+        except KeyError:
+            raise ValueError("{} has no weight map named {}".format(
+                mesh, map_name))
+
+    def identity(self, mesh):
+        return mesh
+
+    def change_token(self, mesh):
+        return self._tokens.get(mesh, 0)
+
+    def release(self):
+        """Tokens are bumped by add_mesh and add_weights, so there is no
+        tracking to remove."""
+
+
+def parse_vertex_name(vertex):
+    """Splits a vertex component name like pCube1.vtx[3:5].
+
+    Return:
+        tuple: The mesh name, and the first and last vertex index.
+    """
+    match = _VTX_PATTERN.match(vertex)
+    if not match:
+        raise ValueError("Not a vertex component: {}".format(vertex))
+    start = int(match.group("start"))
+    end = int(match.group("end") or start)
+    return match.group("mesh"), start, end
+
+
+def parse_vertex_selection(components):
+    """Converts unflattened vertex components into per-mesh index arrays.
+
+    Ranges like pCube1.vtx[0:99] are expanded straight into integer arrays,
+    so no per-vertex string is ever created and the work is linear in the
+    number of selected vertices.
+
+    Return:
+        OrderedDict: Sorted, unique vertex index arrays keyed by mesh name.
+    """
+    ranges = collections.OrderedDict()
+    for component in components:
+        mesh, start, end = parse_vertex_name(component)
+        ranges.setdefault(mesh, []).append(
+            np.arange(start, end + 1, dtype=np.int64))
+    indices = collections.OrderedDict()
+    for mesh, mesh_ranges in ranges.items():
+        indices[mesh] = np.unique(np.concatenate(mesh_ranges))
+    return indices
+
+
+def gather_meshes(backend, meshes, vertices=None):
+    """Reads each target mesh once, pairing it with its targeted vertices.
+
+    Args:
+        backend: A mesh data backend with a read(mesh) method.
+        meshes: Names of meshes whose every vertex is a target.
+        vertices: Vertex index arrays keyed by mesh name, for meshes that
+            are only partly targeted.
+
+    Return:
+        list: (MeshData, indices) pairs, where indices is an array of the
+            targeted vertex indices or None for the whole mesh.
+    """
+    targets = []
+    seen = set()
+    for mesh in meshes:
+        if mesh not in seen:
+            seen.add(mesh)
+            targets.append((backend.read(mesh), None))
+    for mesh, indices in (vertices or {}).items():
+        if mesh not in seen:
+            seen.add(mesh)
+            targets.append((backend.read(mesh),
+                            np.asarray(indices, dtype=np.int64)))
+    return targets
@@ -0,0 +1,181 @@
+"""Reproducible, optionally parallel placement generation.
+
+Every random draw in a scatter comes from its own RandomState stream,
+derived from the scatter seed, a stream id and, for placements, the chunk
+index. Chunk boundaries depend only on the chunk size, so a run split
+across any number of worker processes matches a single process run exactly.
+"""
+import itertools
+import multiprocessing
+import os
+import sys
+
+import numpy as np
+
+import scatter_kernel
+
+CHUNK_SIZE = 65536
+
+SURFACE_STREAM = 0
+SPACING_STREAM = 1
+DENSITY_STREAM = 2
+ORDER_STREAM = 3
+PLACEMENT_STREAM = 4
+PROJECTION_STREAM = 5
+
+CANCEL_POLL = 0.1
+
+
+def rng_stream(seed, stream, index=0):
+    """Creates the deterministic random stream for one stage or chunk.
+
+    Return:
+        RandomState: A numpy random generator.
+    """
+    return np.random.RandomState([int(seed) & 0xffffffff, stream, index])
+
+
+class PlacementParams(object):
+    """The random modifier settings applied to every placement.
+
+    The influences set how strongly a point's weight map value scales its
+    random scale and rotation: 0 ignores the map, 1 multiplies by it.
+    """
+    def __init__(self, rot_ranges, scale_range, align=True,
+                 scale_influence=0.0, rotation_influence=0.0):
+        self.rot_ranges = [list(rot_range) for rot_range in rot_ranges]
+        self.scale_range = list(scale_range)
+        self.align = align
+        self.scale_influence = scale_influence
+        self.rotation_influence = rotation_influence
+
+
+def place_chunk(job):
+    """Computes the instance matrices of one chunk from its own stream.
+
+    Args:
+        job: A (positions, normals, parent_matrices, base_scales, weights,
+            params, seed, chunk_idx, slots, slot_count) tuple, where
+            weights and slots may be None.
+
+    Return:
+        ndarray: An (N, 4, 4) array of world space instance matrices.
+    """
+    positions, normals, parent_matrices, base_scales, weights, params, \
+        seed, chunk_idx, slots, slot_count = job
+    scale_factors = rotation_factors = None
+    if weights is not None:
+        scale_factors = 1.0 + params.scale_influence * (weights - 1.0)
+        rotation_factors = 1.0 + params.rotation_influence * (weights - 1.0)
+    return scatter_kernel.instance_matrices(
+        positions, normals, parent_matrices, base_scales, params.rot_ranges,
+        params.scale_range, rng_stream(seed, PLACEMENT_STREAM, chunk_idx),
+        align=params.align, scale_factors=scale_factors,
+        rotation_factors=rotation_factors, slots=slots,
+        slot_count=slot_count)
+
+
+def _configure_executable():
+    """Points multiprocessing at mayapy when running inside Maya, since
+    spawned workers would otherwise launch another Maya GUI."""
+    executable = os.path.basename(sys.executable).lower()
+    if executable.startswith("maya") and not executable.startswith("mayapy"):
+        mayapy = os.path.join(os.path.dirname(sys.executable),
+                              "mayapy" + os.path.splitext(executable)[1])
+        if os.path.exists(mayapy):
+            multiprocessing.set_executable(mayapy)
+
+
+class WorkerPool(object):
+    """A process pool that outlives single runs.
+
+    The processes are started on first use, only as many as that run has
+    chunks to compute, and restarted with more if a later run has more
+    chunks, up to workers. Interactive tools keep one for their lifetime so
+    repeated scatters don't pay for starting processes each time.
+    """
+    def __init__(self, workers):
+        self.workers = workers
+        self._pool = None
+        self._size = 0
+
+    def map(self, jobs, cancelled=None):
+        """Runs place_chunk over a list of jobs in the pool.
+
+        Args:
+            cancelled: An optional function polled while the jobs run. Once
+                it returns True the processes are stopped mid-job.
+
+        Return:
+            list: The results, in job order, or None if cancelled.
+        """
+        size = min(self.workers, len(jobs))
+        if self._pool is None or self._size < size:
+            self.close()
+            _configure_executable()
+            self._pool = multiprocessing.Pool(size)
+            self._size = size
+        if cancelled is None:
+            return self._pool.map(place_chunk, jobs)
+        result = self._pool.map_async(place_chunk, jobs)
+        while not result.ready():
+            if cancelled():
+                self.close(terminate=True)
+                return None
+            result.wait(CANCEL_POLL)
+        return result.get()
+
+    def close(self, terminate=False):
+        """Stops the processes, waiting for running jobs unless terminate
+        is set; they are started again on the next map."""
+        if self._pool is not None:
+            if terminate:
+                self._pool.terminate()
+            else:
+                self._pool.close()
+            self._pool.join()
+            self._pool = None
+            self._size = 0
+
+
+def map_chunks(jobs, workers=1, pool=None, cancelled=None):
+    """Runs place_chunk over an iterable of jobs, yielding results in order.
+
+    With several workers, jobs are pulled one window of workers at a time,
+    so only that many chunks are ever held in memory. A WorkerPool given as
+    pool is used and left running; otherwise one is started for this call
+    only. If cancelled is given, it is checked before each job and while a
+    window runs, and the results stop as soon as it returns True.
+    """
+    if cancelled is None:
+        cancelled = lambda: False
+    if pool is not None:
+        workers = pool.workers
+    if workers <= 1:
+        for job in jobs:
+            if cancelled():
+                return
+            yield place_chunk(job)
+        return
+    jobs = iter(jobs)
+    window = list(itertools.islice(jobs, workers))
+    if len(window) < 2:
+        for job in window:
+            if cancelled():
+                return
+            yield place_chunk(job)
+        return
+    owned = pool is None
+    if owned:
+        pool = WorkerPool(workers)
+    try:
+        while window and not cancelled():
+            results = pool.map(window, cancelled)
+            if results is None:
+                return
+            for result in results:
+                yield result
+            window = list(itertools.islice(jobs, workers))
+    finally:
+        if owned:
+            pool.close()
@@ -0,0 +1,147 @@
+"""Binary cache files of scatter placements.
+
+A cache is an uncompressed NumPy .npz archive, readable with np.load from
+any Python with NumPy, holding:
+
+    matrices    (N, 4, 4) float32   World space instance matrices, Maya
+                                    row-vector layout with translation in
+                                    row 3.
+    prototype   (N,) int32          Index into prototypes for each point.
+    prototypes  (P,) unicode        The scatter object names.
+    meta        () unicode          JSON: format version, seed and the
+                                    scatter settings that produced it.
+
+Archive members are stored, not compressed, so PointCache maps the arrays
+straight from the file instead of reading them; opening a cache costs the
+same however many points it holds.
+"""
+import json
+import struct
+import zipfile
+
+import numpy as np
+
+import scatter_pipeline
+
+FORMAT_VERSION = 1
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+
+
+def _member_offsets(path):
+    """Finds where each stored member's .npy data begins in an archive.
+
+    Return:
+        dict: Member name, without .npy, to byte offset of its .npy header.
+    """
+    offsets = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as raw:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                continue
+            raw.seek(info.header_offset)
+            header = _LOCAL_HEADER.unpack(raw.read(_LOCAL_HEADER.size))
+            name_len, extra_len = header[-2:]
+            offsets[info.filename[:-len(".npy")]] = \
+                info.header_offset + _LOCAL_HEADER.size + name_len + extra_len
+    return offsets
+
+
+def _map_member(path, offset):
+    """Memory maps one stored .npy member of an archive.
+
+    Return:
+        memmap: A read-only view of the member's array. Scalars and empty
+            arrays are read into memory instead.
+    """
+    with open(path, "rb") as raw:
+        raw.seek(offset)
+        version = np.lib.format.read_magic(raw)
+        if version == (1, 0):
+            shape, fortran, dtype = np.lib.format.read_array_header_1_0(raw)
+        else:
+            shape, fortran, dtype = np.lib.format.read_array_header_2_0(raw)
+        if not shape or 0 in shape:
+            raw.seek(offset)
+            return np.lib.format.read_array(raw)
+        data_offset = raw.tell()
+    return np.memmap(path, dtype=dtype, mode="r", offset=data_offset,
+                     shape=shape, order="F" if fortran else "C")
+
+
+class CacheWriter(object):
+    """Collects placements from a stream of batches and writes a cache."""
+    def __init__(self, prototypes, seed, settings=None):
+        self.prototypes = list(prototypes)
+        self.seed = seed
+        self.settings = settings or {}
+        self._matrices = []
+        self._prototype = []
+
+    def record(self, batches):
+        """Passes batches through unchanged, keeping a compact copy of
+        their placements."""
+        for batch in batches:
+            self._matrices.append(batch.matrices.astype(np.float32))
+            self._prototype.append(batch.obj_indices.astype(np.int32))
+            yield batch
+
+    def save(self, path):
+        """Writes the recorded placements.
+
+        Return:
+            String: The path written.
+        """
+        matrices = np.concatenate(self._matrices) if self._matrices \
+            else np.empty((0, 4, 4), dtype=np.float32)
+        prototype = np.concatenate(self._prototype) if self._prototype \
+            else np.empty(0, dtype=np.int32)
+        meta = {"version": FORMAT_VERSION, "seed": self.seed,
+                "count": len(matrices), "settings": self.settings}
+        with open(path, "wb") as cache_file:
+            np.savez(cache_file, matrices=matrices, prototype=prototype,
+                     prototypes=np.array(self.prototypes, dtype=np.str_),
+                     meta=np.array(json.dumps(meta), dtype=np.str_))
+        return path
+
+
+class PointCache(object):
+    """A cache file opened for reading, with arrays mapped from disk."""
+    def __init__(self, path, mmap=True):
+        self.path = path
+        if mmap:
+            offsets = _member_offsets(path)
+            arrays = dict((name, _map_member(path, offset))
+                          for name, offset in offsets.items())
+        else:
+            with np.load(path) as archive:
+                arrays = dict((name, archive[name])
+                              for name in archive.files)
+        self.matrices = arrays["matrices"]
+        self.prototype = arrays["prototype"]
+        self.prototypes = [str(name) for name in arrays["prototypes"]]
+        self.meta = json.loads(str(arrays["meta"][()]))
+        if self.meta.get("version", 0) > FORMAT_VERSION:
+            raise ValueError("{} was written by a newer version of the "
+                             "scatter tool.".format(path))
+
+    def __len__(self):
+        return len(self.matrices)
+
+    @property
+    def seed(self):
+        return self.meta.get("seed")
+
+    @property
+    def settings(self):
+        return self.meta.get("settings", {})
+
+    def batches(self, batch_size=scatter_pipeline.BATCH_SIZE):
+        """Yields the cached placements as batches ready to emit."""
+        for batch_idx, start in enumerate(range(0, len(self), batch_size)):
+            matrices = self.matrices[start:start + batch_size]
+            yield scatter_pipeline.PointBatch(
+                batch_idx, matrices[:, 3, :3], matrices[:, 1, :3],
+                np.broadcast_to(np.identity(4), (len(matrices), 4, 4)),
+                obj_indices=self.prototype[start:start + batch_size],
+                matrices=matrices)
@@ -0,0 +1,267 @@
+"""Point files used as scatter targets without importing them as geometry.
+
+Supported formats, all holding world space points:
+
+    .ply                ASCII or binary PLY, reading the x, y, z and
+                        optional nx, ny, nz properties of its vertices.
+    .csv, .txt, .xyz    Delimited text, one point per line. A header line
+                        naming x, y, z, nx, ny, nz columns is optional;
+                        without one the first three columns are positions
+                        and the next three, if present, normals.
+    .bin, .raw, .f32    Raw little endian float32 records of x, y, z, nx,
+                        ny, nz.
+    .npy                An (N, 3) or (N, 6) array of the same layout.
+
+Binary files are memory mapped and text files are parsed a chunk of lines
+at a time, so a cloud of any size is streamed rather than loaded. Nothing
+is read up front: estimated_count gives the size of a text cloud from its
+file size. Points without normals face up the world y axis.
+"""
+import itertools
+import os
+
+import numpy as np
+
+POSITION_NAMES = ["x", "y", "z"]
+NORMAL_NAMES = ["nx", "ny", "nz"]
+RAW_EXTENSIONS = [".bin", ".raw", ".f32"]
+TEXT_EXTENSIONS = [".csv", ".txt", ".xyz"]
+CHUNK_SIZE = 65536
+SAMPLE_BYTES = 65536
+
+_PLY_TYPES = {"char": "i1", "int8": "i1", "uchar": "u1", "uint8": "u1",
+              "short": "i2", "int16": "i2", "ushort": "u2", "uint16": "u2",
+              "int": "i4", "int32": "i4", "uint": "u4", "uint32": "u4",
+              "float": "f4", "float32": "f4", "double": "f8",
+              "float64": "f8"}
+
+
+def open_cloud(path):
+    """Opens a point file according to its extension.
+
+    Return:
+        MappedCloud or TextCloud: The opened cloud.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".ply":
+        return _open_ply(path)
+    if extension == ".npy":
+        data = np.load(path, mmap_mode="r")
+        return MappedCloud(path, data.reshape(len(data), -1))
+    if extension in RAW_EXTENSIONS:
+        data = np.memmap(path, dtype="<f4", mode="r")
+        return MappedCloud(path, data.reshape(-1, 6))
+    if extension in TEXT_EXTENSIONS:
+        return _open_text(path)
+    raise ValueError("Unsupported point file: {}".format(path))
+
+
+def _default_normals(count):
+    normals = np.zeros((count, 3))
+    normals[:, 1] = 1.0
+    return normals
+
+
+class MappedCloud(object):
+    """A point file memory mapped as an (N, K) array, or a structured
+    array with named fields."""
+    def __init__(self, path, data, positions=None, normals=None):
+        self.path = path
+        self.data = data
+        if data.dtype.names:
+            positions = positions or POSITION_NAMES
+        else:
+            positions = positions or [0, 1, 2]
+            if normals is None and data.shape[1] >= 6:
+                normals = [3, 4, 5]
+        self.position_fields = positions
+        self.normal_fields = normals
+
+    def __len__(self):
+        return len(self.data)
+
+    def estimated_count(self):
+        return len(self)
+
+    def _columns(self, rows, fields):
+        if rows.dtype.names:
+            return np.stack([rows[name] for name in fields], axis=1) \
+                .astype(np.float64)
+        return np.asarray(rows[:, fields], dtype=np.float64)
+
+    def chunks(self, size=CHUNK_SIZE):
+        """Yields the points a chunk at a time, reading only that chunk
+        from disk.
+
+        Yields:
+            tuple: (N, 3) positions and (N, 3) normals.
+        """
+        for start in range(0, len(self), size):
+            rows = self.data[start:start + size]
+            normals = _default_normals(len(rows)) \
+                if self.normal_fields is None \
+                else self._columns(rows, self.normal_fields)
+            yield self._columns(rows, self.position_fields), normals
+
+
+class TextCloud(object):
+    """A delimited text point file, parsed a chunk of lines at a time.
+
+    count is the number of points when known, as for ASCII PLY files whose
+    vertices are followed by other elements. Without it, every line after
+    the header is a point.
+    """
+    def __init__(self, path, skip_lines=0, delimiter=None, positions=None,
+                 normals=None, count=None):
+        self.path = path
+        self.skip_lines = skip_lines
+        self.delimiter = delimiter
+        self.position_fields = positions or [0, 1, 2]
+        self.normal_fields = normals
+        self._count = count
+
+    def __len__(self):
+        """Counts the points, reading the whole file if their number isn't
+        known."""
+        if self._count is None:
+            with open(self.path, "rb") as text_file:
+                lines = sum(1 for line in text_file if line.strip())
+            self._count = lines - self.skip_lines
+        return self._count
+
+    def estimated_count(self):
+        """Estimates the number of points from the file size and the
+        length of the lines in its first few kilobytes, without reading the
+        rest of the file.
+
+        Return:
+            int: The exact count if known, otherwise the estimate.
+        """
+        if self._count is not None:
+            return self._count
+        size = os.path.getsize(self.path)
+        with open(self.path, "rb") as text_file:
+            sample = text_file.read(SAMPLE_BYTES)
+        if len(sample) == size:
+            return len(self)
+        lines = sample.splitlines()
+        header = sum(len(line) + 1 for line in lines[:self.skip_lines])
+        lines = lines[self.skip_lines:-1]
+        if not lines:
+            return 0
+        line_bytes = float(sum(len(line) + 1 for line in lines)) / len(lines)
+        return int(round((size - header) / line_bytes))
+
+    def chunks(self, size=CHUNK_SIZE):
+        """Yields the points a chunk at a time.
+
+        Yields:
+            tuple: (N, 3) positions and (N, 3) normals.
+        """
+        columns = list(self.position_fields) + list(self.normal_fields or [])
+        remaining = self._count
+        with open(self.path, "r") as text_file:
+            lines = (line for line in itertools.islice(
+                text_file, self.skip_lines, None) if line.strip())
+            while remaining is None or remaining > 0:
+                chunk = list(itertools.islice(
+                    lines, size if remaining is None else min(size,
+                                                              remaining)))
+                if not chunk:
+                    return
+                if remaining is not None:
+                    remaining -= len(chunk)
+                values = np.loadtxt(chunk, delimiter=self.delimiter,
+                                    usecols=columns, ndmin=2)
+                normals = _default_normals(len(values)) \
+                    if self.normal_fields is None else values[:, 3:6]
+                yield values[:, :3], normals
+
+
+def _fields(names, wanted):
+    """Returns the columns of the wanted names, or None if any is missing."""
+    if all(name in names for name in wanted):
+        return [names.index(name) for name in wanted]
+    return None
+
+
+def _open_text(path):
+    with open(path, "r") as text_file:
+        first = text_file.readline()
+    delimiter = "," if "," in first else None
+    tokens = [token.strip().lower() for token in first.split(delimiter)]
+    try:
+        [float(token) for token in tokens]
+    except ValueError:
+        positions = _fields(tokens, POSITION_NAMES)
+        if positions is None:
+            raise ValueError("{} has no x, y and z columns.".format(path))
+        return TextCloud(path, 1, delimiter, positions,
+                         _fields(tokens, NORMAL_NAMES))
+    return TextCloud(path, 0, delimiter, [0, 1, 2],
+                     [3, 4, 5] if len(tokens) >= 6 else None)
+
+
+def _read_ply_header(ply_file):
+    """Parses a PLY header up to end_header.
+
+    Return:
+        tuple: The format name and a list of (name, count, properties)
+            elements, each property a (name, type) pair with a type of
+            None for list properties.
+    """
+    if ply_file.readline().strip() != b"ply":
+        raise ValueError("Not a PLY file.")
+    file_format = None
+    elements = []
+    for line in iter(ply_file.readline, b""):
+        words = line.decode("ascii").split()
+        if not words or words[0] in ("comment", "obj_info"):
+            continue
+        if words[0] == "end_header":
+            return file_format, elements
+        if words[0] == "format":
+            file_format = words[1]
+        elif words[0] == "element":
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == "property":
+            prop_type = None if words[1] == "list" else _PLY_TYPES[words[1]]
+            elements[-1][2].append((words[-1], prop_type))
+    raise ValueError("PLY header has no end_header.")
+
+
+def _open_ply(path):
+    with open(path, "rb") as ply_file:
+        file_format, elements = _read_ply_header(ply_file)
+        offset = ply_file.tell()
+    names = [element[0] for element in elements]
+    if "vertex" not in names:
+        raise ValueError("{} has no vertex element.".format(path))
+    vertex_idx = names.index("vertex")
+    _, count, properties = elements[vertex_idx]
+    prop_names = [name for name, _ in properties]
+    if _fields(prop_names, POSITION_NAMES) is None:
+        raise ValueError("{} vertices have no x, y and z.".format(path))
+    normals = NORMAL_NAMES if _fields(prop_names, NORMAL_NAMES) else None
+    if file_format == "ascii":
+        skip = sum(element[1] for element in elements[:vertex_idx])
+        with open(path, "rb") as ply_file:
+            header_lines = ply_file.read(offset).count(b"\n")
+        return TextCloud(path, header_lines + skip, None,
+                         _fields(prop_names, POSITION_NAMES),
+                         _fields(prop_names, NORMAL_NAMES), count)
+    byte_order = "<" if file_format == "binary_little_endian" else ">"
+    for name, _, element_props in elements[:vertex_idx]:
+        if any(prop_type is None for _, prop_type in element_props):
+            raise ValueError("{} has list properties before its vertices."
+                             .format(path))
+    for _, element_count, element_props in elements[:vertex_idx]:
+        offset += element_count * sum(
+            int(prop_type[1]) for _, prop_type in element_props)
+    if any(prop_type is None for _, prop_type in properties):
+        raise ValueError("{} vertices have list properties.".format(path))
+    dtype = np.dtype([(name, byte_order + prop_type)
+                      for name, prop_type in properties])
+    data = np.memmap(path, dtype=dtype, mode="r", offset=offset,
+                     shape=(count,))
+    return MappedCloud(path, data, POSITION_NAMES, normals)
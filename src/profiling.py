@@ -0,0 +1,247 @@
+"""Lightweight timing and host command counting for scatter runs.
+
+A ScatterProfile wraps each streaming stage and counts every maya.cmds call,
+and every MFnMesh read through the API, made while it is active. The hooks
+add one clock read per batch and one extra Python call per host command, so
+a profiled run's timings stay close to an unprofiled one. Profiling is
+opt-in: ScatterTool only profiles when its profiling option is set.
+"""
+import collections
+import contextlib
+import json
+import os
+import threading
+import timeit
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+clock = timeit.default_timer
+
+
+COUNTED_CLASSES = ["MFnMesh"]
+
+
+def rss_bytes():
+    """Returns the current resident memory of the process, where the
+    platform reports it.
+
+    Return:
+        int: The resident memory in bytes, or None if unavailable.
+    """
+    if psutil is not None:
+        return psutil.Process(os.getpid()).memory_info().rss
+    if resource is not None and os.path.exists("/proc/self/statm"):
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize()
+    return None
+
+
+class CountingCommands(object):
+    """Forwards attribute access to a commands module, counting each call
+    by command name.
+
+    Classes are passed through untouched, since API objects are handed to
+    other API calls, except those named in classes: their instances are
+    wrapped in turn, counting method calls as "Class.method".
+    """
+    def __init__(self, commands, counts, prefix="", classes=()):
+        self._commands = commands
+        self._counts = counts
+        self._prefix = prefix
+        self._classes = classes
+        self._wrapped = {}
+
+    def __getattr__(self, name):
+        wrapped = self._wrapped.get(name)
+        if wrapped is not None:
+            return wrapped
+        command = getattr(self._commands, name)
+        if not callable(command) or (isinstance(command, type)
+                                     and name not in self._classes):
+            return command
+        counts = self._counts
+        key = self._prefix + name
+        if name in self._classes:
+            def wrapped(*args, **kwargs):
+                counts[key] += 1
+                return CountingCommands(command(*args, **kwargs), counts,
+                                        key + ".")
+        else:
+            def wrapped(*args, **kwargs):
+                counts[key] += 1
+                return command(*args, **kwargs)
+        self._wrapped[name] = wrapped
+        return wrapped
+
+
+class ScatterProfile(object):
+    """Records per-stage wall time, host command counts, memory and
+    throughput of one scatter run.
+
+    With trace_memory, the peak memory allocated by Python during the run
+    is traced, at some cost in speed. Otherwise only the process's
+    resident memory at the start and end of the run is recorded.
+
+    Stages are chained generators, so pulling a batch from one stage runs
+    the stages upstream of it. Timed regions therefore nest, and each
+    region's own time excludes the regions that ran inside it. Regions nest
+    per thread, so stages computed on a worker thread are timed apart from
+    the emit on the main thread.
+    """
+    def __init__(self, name="scatter", trace_memory=False):
+        self.name = name
+        self.trace_memory = trace_memory and tracemalloc is not None
+        self.stages = collections.OrderedDict()
+        self.commands = collections.Counter()
+        self.points = 0
+        self.total = 0.0
+        self.peak_memory = None
+        self.rss_start = None
+        self.rss_end = None
+        self._start = None
+        self._owns_trace = False
+        self._local = threading.local()
+
+    def start(self):
+        self._owns_trace = self.trace_memory and not tracemalloc.is_tracing()
+        if self._owns_trace:
+            tracemalloc.start()
+        elif self.trace_memory and hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        self.rss_start = rss_bytes()
+        self._start = clock()
+
+    def stop(self):
+        self.total = clock() - self._start
+        self.rss_end = rss_bytes()
+        if self.trace_memory:
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            if self._owns_trace:
+                tracemalloc.stop()
+
+    @property
+    def _nested(self):
+        """The calling thread's stack of time spent in nested regions."""
+        nested = getattr(self._local, "nested", None)
+        if nested is None:
+            nested = self._local.nested = []
+        return nested
+
+    def _enter(self):
+        self._nested.append(0.0)
+        return clock()
+
+    def _exit(self, name, start):
+        elapsed = clock() - start
+        nested = self._nested
+        self.stages[name] = self.stages.get(name, 0.0) + elapsed \
+            - nested.pop()
+        if nested:
+            nested[-1] += elapsed
+
+    def stage(self, batches, name):
+        """Times how long a stage spends producing each batch.
+
+        Return:
+            generator: The same batches, unchanged.
+        """
+        batches = iter(batches)
+        while True:
+            start = self._enter()
+            try:
+                batch = next(batches)
+            except StopIteration:
+                return
+            finally:
+                self._exit(name, start)
+            yield batch
+
+    def count_points(self, batches):
+        """Counts the points passing through to the output."""
+        for batch in batches:
+            self.points += len(batch)
+            yield batch
+
+    @contextlib.contextmanager
+    def timer(self, name):
+        """Times a block, excluding any stages it pulls batches from."""
+        start = self._enter()
+        try:
+            yield
+        finally:
+            self._exit(name, start)
+
+    @contextlib.contextmanager
+    def counting(self, *modules):
+        """Counts every call through each module's cmds attribute, and the
+        MFnMesh reads through its om attribute, for the duration of the
+        block. Modules without the attribute, or where it is None, are
+        skipped."""
+        originals = []
+        for module in modules:
+            for attr, classes in (("cmds", ()), ("om", COUNTED_CLASSES)):
+                commands = getattr(module, attr, None)
+                if commands is None:
+                    continue
+                originals.append((module, attr, commands))
+                setattr(module, attr, CountingCommands(
+                    commands, self.commands, classes=classes))
+        try:
+            yield
+        finally:
+            for module, attr, commands in reversed(originals):
+                setattr(module, attr, commands)
+
+    def as_dict(self):
+        return {"name": self.name,
+                "total_seconds": self.total,
+                "stages": self.stages,
+                "commands": dict(self.commands),
+                "points": self.points,
+                "points_per_second":
+                    self.points / self.total if self.total else None,
+                "peak_python_memory_bytes": self.peak_memory,
+                "rss_start_bytes": self.rss_start,
+                "rss_end_bytes": self.rss_end}
+
+    def summary(self):
+        """Formats the run as readable report lines.
+
+        Return:
+            list: One string per line.
+        """
+        lines = ["{}: {} points in {:.3f}s ({:.0f} points/sec)".format(
+            self.name, self.points, self.total,
+            self.points / self.total if self.total else 0.0)]
+        for name, seconds in self.stages.items():
+            lines.append("  {:<24} {:10.3f}s".format(name, seconds))
+        for name, count in self.commands.most_common():
+            lines.append("  {:<24} {:10d} calls".format(name, count))
+        if self.peak_memory is not None:
+            lines.append("  {:<24} {:10.1f} MB".format(
+                "peak Python memory", self.peak_memory / 1048576.0))
+        if self.rss_start is not None and self.rss_end is not None:
+            lines.append("  {:<24} {:10.1f} MB -> {:.1f} MB".format(
+                "resident memory", self.rss_start / 1048576.0,
+                self.rss_end / 1048576.0))
+        return lines
+
+    def save(self, path):
+        """Writes the report as JSON."""
+        with open(path, "w") as profile_file:
+            json.dump(self.as_dict(), profile_file, indent=2)
+        return path
@@ -0,0 +1,236 @@
+"""Batched ray casting against target meshes.
+
+A TriangleBVH sorts a mesh's triangles along a Morton curve and builds a
+balanced bounding volume hierarchy over fixed-size leaves of that order, all
+with array operations. Rays are traced in batches: every step tests all live
+(ray, node) pairs against their boxes at once, and leaves expand into
+vectorized ray-triangle tests, so the Python overhead grows with the tree
+depth rather than the ray count.
+"""
+import numpy as np
+
+import scatter_kernel
+
+LEAF_SIZE = 8
+_EPSILON = 1e-12
+
+
+def _morton_codes(points):
+    """Interleaves 10 bits of each coordinate, on a grid of cubic cells
+    spanning the points' largest extent so flat meshes keep compact leaves.
+
+    Return:
+        ndarray: An (N,) array of 30 bit Morton codes.
+    """
+    lower = points.min(axis=0)
+    extent = max((points.max(axis=0) - lower).max(), _EPSILON)
+    cells = np.clip(((points - lower) / extent * 1023).astype(np.int64),
+                    0, 1023)
+    codes = np.zeros(len(points), dtype=np.int64)
+    for bit in range(10):
+        for axis in range(3):
+            codes |= ((cells[:, axis] >> bit) & 1) << (3 * bit + axis)
+    return codes
+
+
+class TriangleBVH(object):
+    """A bounding volume hierarchy over the triangles of a mesh, in object
+    space.
+
+    Nodes are stored as an implicit binary heap: node n has children 2n + 1
+    and 2n + 2, and the last leaf_count nodes are the leaves, leaf i holding
+    triangles [i * LEAF_SIZE, (i + 1) * LEAF_SIZE) of the sorted order.
+    """
+    def __init__(self, mesh, indices=None):
+        self.mesh = mesh
+        triangles = mesh.triangles
+        if indices is not None:
+            selected = np.zeros(len(mesh), dtype=bool)
+            selected[indices] = True
+            triangles = triangles[selected[triangles].all(axis=1)]
+        corners = mesh.points[triangles]
+        order = np.argsort(_morton_codes(corners.mean(axis=1))
+                           if len(corners) else np.empty(0), kind="stable")
+        self.triangles = triangles[order]
+        self.corners = corners[order]
+        self.leaf_count = 1
+        while self.leaf_count * LEAF_SIZE < len(self.triangles):
+            self.leaf_count *= 2
+        self.lower, self.upper = self._build_bounds()
+        self.occupied = np.all(self.lower <= self.upper, axis=1)
+
+    @classmethod
+    def for_target(cls, mesh, indices=None):
+        """Returns the hierarchy for a target, reusing the one stored on the
+        mesh data when the whole mesh is targeted.
+
+        Return:
+            TriangleBVH: The hierarchy for the mesh.
+        """
+        if indices is not None:
+            return cls(mesh, indices)
+        bvh = mesh.derived.get("bvh")
+        if bvh is None:
+            bvh = mesh.derived["bvh"] = cls(mesh)
+        return bvh
+
+    @property
+    def nbytes(self):
+        return (self.triangles.nbytes + self.corners.nbytes
+                + self.lower.nbytes + self.upper.nbytes
+                + self.occupied.nbytes)
+
+    def _build_bounds(self):
+        """Computes the box of every node, leaves first.
+
+        Return:
+            tuple: (2 * leaf_count - 1, 3) lower and upper corners. Empty
+                leaves get inverted boxes that no ray can hit.
+        """
+        slots = self.leaf_count * LEAF_SIZE
+        lower = np.full((slots, 3), np.inf)
+        upper = np.full((slots, 3), -np.inf)
+        lower[:len(self.corners)] = self.corners.min(axis=1)
+        upper[:len(self.corners)] = self.corners.max(axis=1)
+        levels_lower = [lower.reshape(-1, LEAF_SIZE, 3).min(axis=1)]
+        levels_upper = [upper.reshape(-1, LEAF_SIZE, 3).max(axis=1)]
+        while len(levels_lower[0]) > 1:
+            levels_lower.insert(
+                0, levels_lower[0].reshape(-1, 2, 3).min(axis=1))
+            levels_upper.insert(
+                0, levels_upper[0].reshape(-1, 2, 3).max(axis=1))
+        return np.concatenate(levels_lower), np.concatenate(levels_upper)
+
+    def intersect(self, origins, directions, max_distances):
+        """Finds the nearest triangle hit by each ray.
+
+        Args:
+            origins: An (N, 3) array of object space ray origins.
+            directions: An (N, 3) array of object space ray directions.
+            max_distances: An (N,) array of the furthest hit to accept, in
+                units of each direction's length.
+
+        Return:
+            tuple: The (N,) hit distances, inf for misses, the (N,) indices
+                into triangles of the hit, and (N, 3) barycentrics.
+        """
+        count = len(origins)
+        best = np.array(max_distances, dtype=np.float64)
+        hit_tris = np.full(count, -1, dtype=np.int64)
+        bary = np.zeros((count, 3))
+        if not len(self.triangles) or not count:
+            return np.full(count, np.inf), hit_tris, bary
+        directions = np.asarray(directions, dtype=np.float64)
+        inverse = 1.0 / np.where(np.abs(directions) < _EPSILON, _EPSILON,
+                                 directions)
+        first_leaf = self.leaf_count - 1
+        rays = np.arange(count)
+        nodes = np.zeros(count, dtype=np.int64)
+        while len(rays):
+            with np.errstate(invalid="ignore"):
+                near = (self.lower[nodes] - origins[rays]) * inverse[rays]
+                far = (self.upper[nodes] - origins[rays]) * inverse[rays]
+                entry = np.minimum(near, far).max(axis=1)
+                exit_ = np.maximum(near, far).min(axis=1)
+            hit = (entry <= exit_) & (exit_ >= 0.0) \
+                & (entry <= best[rays]) & self.occupied[nodes]
+            rays, nodes = rays[hit], nodes[hit]
+            leaf = nodes >= first_leaf
+            if leaf.any():
+                self._intersect_leaves(origins, directions, rays[leaf],
+                                       nodes[leaf] - first_leaf, best,
+                                       hit_tris, bary)
+            rays, nodes = rays[~leaf], nodes[~leaf]
+            rays = np.repeat(rays, 2)
+            nodes = np.repeat(2 * nodes + 1, 2)
+            nodes[1::2] += 1
+        distances = np.where(hit_tris >= 0, best, np.inf)
+        return distances, hit_tris, bary
+
+    def _intersect_leaves(self, origins, directions, rays, leaves, best,
+                          hit_tris, bary):
+        """Runs Moller-Trumbore tests of rays against every triangle of
+        their leaves, keeping each ray's nearest hit."""
+        tris = (leaves[:, np.newaxis] * LEAF_SIZE
+                + np.arange(LEAF_SIZE)).ravel()
+        rays = np.repeat(rays, LEAF_SIZE)
+        valid = tris < len(self.triangles)
+        rays, tris = rays[valid], tris[valid]
+        corners = self.corners[tris]
+        edge_1 = corners[:, 1] - corners[:, 0]
+        edge_2 = corners[:, 2] - corners[:, 0]
+        pvec = np.cross(directions[rays], edge_2)
+        det = np.einsum("ni,ni->n", edge_1, pvec)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inv_det = 1.0 / det
+            tvec = origins[rays] - corners[:, 0]
+            u = np.einsum("ni,ni->n", tvec, pvec) * inv_det
+            qvec = np.cross(tvec, edge_1)
+            v = np.einsum("ni,ni->n", directions[rays], qvec) * inv_det
+            t = np.einsum("ni,ni->n", edge_2, qvec) * inv_det
+            hit = (np.abs(det) > _EPSILON) & (u >= 0.0) & (v >= 0.0) \
+                & (u + v <= 1.0) & (t >= 0.0) & (t <= best[rays])
+        if not hit.any():
+            return
+        rays, tris, u, v, t = rays[hit], tris[hit], u[hit], v[hit], t[hit]
+        order = np.lexsort((t, rays))
+        rays, tris, u, v, t = rays[order], tris[order], u[order], \
+            v[order], t[order]
+        first = np.concatenate(([True], rays[1:] != rays[:-1]))
+        rays, tris, u, v, t = rays[first], tris[first], u[first], \
+            v[first], t[first]
+        best[rays] = t
+        hit_tris[rays] = tris
+        bary[rays] = np.column_stack((1.0 - u - v, u, v))
+
+    def surface(self, hit_tris, bary, vertex_weights=None):
+        """Interpolates the mesh at ray hits.
+
+        Return:
+            tuple: Object space positions (N, 3), normalized object space
+                normals (N, 3) and the interpolated weights (N,), or None
+                without a weight map.
+        """
+        triangles = self.triangles[hit_tris]
+        points = np.einsum("nk,nki->ni", bary, self.mesh.points[triangles])
+        normals = np.einsum("nk,nki->ni", bary,
+                            self.mesh.normals[triangles])
+        weights = None
+        if vertex_weights is not None:
+            weights = np.einsum("nk,nk->n", bary, vertex_weights[triangles])
+        return points, scatter_kernel.normalize(normals), weights
+
+
+def cast(bvhs, origins, direction, max_distance):
+    """Casts rays along one world space direction onto several meshes,
+    keeping the nearest hit of each.
+
+    Args:
+        bvhs: TriangleBVH objects of the target meshes.
+        origins: An (N, 3) array of world space ray origins.
+        direction: A world space (3,) unit direction.
+        max_distance: An (N,) array of the furthest hit to accept.
+
+    Return:
+        tuple: The (N,) index into bvhs of each ray's hit, -1 for misses,
+            the (N,) triangle index and the (N, 3) barycentrics.
+    """
+    count = len(origins)
+    best = np.array(max_distance, dtype=np.float64)
+    meshes = np.full(count, -1, dtype=np.int64)
+    tris = np.zeros(count, dtype=np.int64)
+    bary = np.zeros((count, 3))
+    for mesh_idx, bvh in enumerate(bvhs):
+        world = bvh.mesh.world_matrix
+        inverse = np.linalg.inv(world[:3, :3])
+        local_origins = np.dot(origins - world[3, :3], inverse)
+        local_direction = np.dot(direction, inverse)
+        distances, hit_tris, hit_bary = bvh.intersect(
+            local_origins, np.broadcast_to(local_direction, (count, 3)),
+            best)
+        closer = distances < best
+        best[closer] = distances[closer]
+        meshes[closer] = mesh_idx
+        tris[closer] = hit_tris[closer]
+        bary[closer] = hit_bary[closer]
+    return meshes, tris, bary
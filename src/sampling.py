@@ -0,0 +1,253 @@
+"""Point sampling strategies for the scatter tool."""
+import numpy as np
+
+import scatter_kernel
+
+
+class SurfaceSampler(object):
+    """Draws area-weighted random points from the triangles of a mesh.
+
+    The cumulative triangle area table is built once, after which any number
+    of points can be drawn by binary search, independent of vertex count.
+    """
+    def __init__(self, mesh, indices=None):
+        self.mesh = mesh
+        triangles = mesh.triangles
+        if indices is not None:
+            selected = np.zeros(len(mesh), dtype=bool)
+            selected[indices] = True
+            triangles = triangles[selected[triangles].all(axis=1)]
+        self.triangles = triangles
+        corners = mesh.world_points()[triangles]
+        areas = 0.5 * np.linalg.norm(
+            np.cross(corners[:, 1] - corners[:, 0],
+                     corners[:, 2] - corners[:, 0]), axis=1)
+        self.cumulative_area = np.cumsum(areas)
+
+    @classmethod
+    def for_target(cls, mesh, indices=None):
+        """Returns the sampler for a target, reusing the one stored on the
+        mesh data when the whole mesh is targeted.
+
+        Return:
+            SurfaceSampler: The sampler for the mesh.
+        """
+        if indices is not None:
+            return cls(mesh, indices)
+        sampler = mesh.derived.get("surface_sampler")
+        if sampler is None:
+            sampler = mesh.derived["surface_sampler"] = cls(mesh)
+        return sampler
+
+    @property
+    def nbytes(self):
+        return self.cumulative_area.nbytes
+
+    @property
+    def area(self):
+        if not len(self.cumulative_area):
+            return 0.0
+        return float(self.cumulative_area[-1])
+
+    def _draw(self, count, rng):
+        """Picks area-weighted triangles and barycentric coordinates.
+
+        Return:
+            tuple: (N, 3) corner vertex indices and (N, 3) barycentrics.
+        """
+        picks = np.searchsorted(self.cumulative_area,
+                                rng.uniform(0.0, self.area, count),
+                                side="right")
+        picks = np.minimum(picks, len(self.triangles) - 1)
+        weights = rng.random_sample((count, 2))
+        flipped = weights.sum(axis=1) > 1.0
+        weights[flipped] = 1.0 - weights[flipped]
+        bary = np.column_stack((1.0 - weights.sum(axis=1), weights))
+        return self.triangles[picks], bary
+
+    def sample(self, count, rng, vertex_weights=None):
+        """Draws random points uniformly over the surface.
+
+        Args:
+            vertex_weights: An optional (V,) per-vertex weight map to
+                interpolate at each point.
+
+        Return:
+            tuple: World positions (N, 3), object space normals (N, 3) and
+                the interpolated weights (N,), or None without a map.
+        """
+        if count <= 0 or self.area <= 0.0:
+            return np.empty((0, 3)), np.empty((0, 3)), \
+                None if vertex_weights is None else np.empty(0)
+        corners, bary = self._draw(count, rng)
+        points = np.einsum("nk,nki->ni", bary, self.mesh.points[corners])
+        normals = np.einsum("nk,nki->ni", bary, self.mesh.normals[corners])
+        weights = None
+        if vertex_weights is not None:
+            weights = np.einsum("nk,nk->n", bary, vertex_weights[corners])
+        return (self.mesh.to_world(points),
+                scatter_kernel.normalize(normals), weights)
+
+
+class SpatialHashGrid(object):
+    """Uniform hash grid of points for constant time neighbour queries.
+
+    With a cell size equal to the query radius, every neighbour of a point
+    lies in the 27 cells surrounding it.
+    """
+    _OFFSETS = [(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1)
+                for z in (-1, 0, 1)]
+
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self._cells = {}
+
+    def cell_keys(self, points):
+        """Computes the integer cell coordinates of each point.
+
+        Return:
+            list: A list of (x, y, z) cell tuples.
+        """
+        cells = np.floor(np.asarray(points) / self.cell_size)
+        return [tuple(cell) for cell in cells.astype(np.int64).tolist()]
+
+    def insert(self, key, point):
+        self._cells.setdefault(key, []).append(point)
+
+    def has_neighbour(self, key, point, radius):
+        """Tests whether any stored point lies closer than radius."""
+        radius_sq = radius * radius
+        cells = self._cells
+        for offset in self._OFFSETS:
+            neighbours = cells.get((key[0] + offset[0], key[1] + offset[1],
+                                    key[2] + offset[2]))
+            if not neighbours:
+                continue
+            for other in neighbours:
+                dx = other[0] - point[0]
+                dy = other[1] - point[1]
+                dz = other[2] - point[2]
+                if dx * dx + dy * dy + dz * dz < radius_sq:
+                    return True
+        return False
+
+    def has_overlap(self, key, sphere):
+        """Tests whether a stored [x, y, z, radius] sphere intersects
+        sphere. The cell size must be at least twice the largest radius."""
+        cells = self._cells
+        for offset in self._OFFSETS:
+            neighbours = cells.get((key[0] + offset[0], key[1] + offset[1],
+                                    key[2] + offset[2]))
+            if not neighbours:
+                continue
+            for other in neighbours:
+                dx = other[0] - sphere[0]
+                dy = other[1] - sphere[1]
+                dz = other[2] - sphere[2]
+                reach = other[3] + sphere[3]
+                if dx * dx + dy * dy + dz * dz < reach * reach:
+                    return True
+        return False
+
+
+class PoissonDiskFilter(object):
+    """Incrementally thins candidate points to a minimum spacing.
+
+    Each batch of candidates is visited in random order and a point is kept
+    only if no previously kept point, from this or any earlier batch, lies
+    within min_distance. Every check is O(1), so the whole run takes
+    roughly linear time.
+    """
+    def __init__(self, min_distance):
+        self.min_distance = min_distance
+        self._grid = SpatialHashGrid(min_distance)
+
+    def filter(self, positions, rng):
+        """Thins one batch of candidates against everything kept so far.
+
+        Return:
+            ndarray: The indices of the kept points, in acceptance order.
+        """
+        if self.min_distance <= 0.0 or not len(positions):
+            return np.arange(len(positions))
+        order = rng.permutation(len(positions))
+        points = positions[order].tolist()
+        keys = self._grid.cell_keys(positions[order])
+        kept = []
+        for idx in range(len(points)):
+            if not self._grid.has_neighbour(keys[idx], points[idx],
+                                            self.min_distance):
+                self._grid.insert(keys[idx], points[idx])
+                kept.append(order[idx])
+        return np.array(kept, dtype=np.int64)
+
+
+class OverlapFilter(object):
+    """Drops instances whose bounding spheres intersect one already kept.
+
+    Points are visited in order and kept greedily against every kept point
+    of this and earlier batches, using a hash grid sized to the largest
+    possible sphere, so the whole run takes roughly linear time.
+    """
+    def __init__(self, max_radius):
+        self.max_radius = max_radius
+        self._grid = SpatialHashGrid(2.0 * max_radius)
+
+    def filter(self, positions, radii):
+        """Culls one batch of spheres against everything kept so far.
+
+        Return:
+            ndarray: The indices of the kept points, in order.
+        """
+        if self.max_radius <= 0.0 or not len(positions):
+            return np.arange(len(positions))
+        spheres = np.column_stack((positions, radii)).tolist()
+        keys = self._grid.cell_keys(positions)
+        kept = []
+        for idx in range(len(spheres)):
+            if not self._grid.has_overlap(keys[idx], spheres[idx]):
+                self._grid.insert(keys[idx], spheres[idx])
+                kept.append(idx)
+        return np.array(kept, dtype=np.int64)
+
+
+class AliasTable(object):
+    """Walker alias table for O(1) draws from a discrete distribution.
+
+    Building the table is linear in the number of weights; each draw then
+    costs one uniform integer and one uniform float, however many
+    categories there are.
+    """
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        if not len(weights) or weights.sum() <= 0.0:
+            weights = np.ones(max(len(weights), 1))
+        count = len(weights)
+        scaled = weights / weights.sum() * count
+        self.probabilities = np.ones(count)
+        self.aliases = np.arange(count)
+        small = [idx for idx in range(count) if scaled[idx] < 1.0]
+        large = [idx for idx in range(count) if scaled[idx] >= 1.0]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self.probabilities[less] = scaled[less]
+            self.aliases[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+
+    def __len__(self):
+        return len(self.probabilities)
+
+    def sample(self, count, rng):
+        """Draws count category indices.
+
+        Return:
+            ndarray: An (N,) array of indices into the weights.
+        """
+        picks = rng.randint(0, len(self.probabilities), size=count)
+        keep = rng.random_sample(count) < self.probabilities[picks]
+        return np.where(keep, picks, self.aliases[picks])
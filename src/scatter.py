@@ -1,16 +1,54 @@
+import contextlib
+import functools
+import itertools
 import logging
-import random
+import multiprocessing
+import os
+import sys
+import timeit
 
 from PySide2 import QtWidgets, QtCore
 from shiboken2 import wrapInstance
 from maya.OpenMayaUI import MQtUtil
-from maya.OpenMaya import MVector, MGlobal
+from maya.OpenMaya import MGlobal
 import maya.cmds as cmds
-import maya.mel as mel
-import math
+import numpy as np
+
+import grouping
+import lod
+import meshcache
+import meshdata
+import placement
+import pointcache
+import pointcloud
+import profiling
+import raycast
+import sampling
+import scatter_layers
+import scatter_pipeline
+import scatter_output
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 log = logging.getLogger(__name__)
 
+STAGES = ["source", "sample", "modify"]
+EDIT_CHUNK = 1000
+SETTINGS = ["scatter_density", "rot_range_x", "rot_range_y", "rot_range_z",
+            "scale_range", "obj_weights", "align", "sample_mode",
+            "point_count", "min_distance", "output_mode", "seed",
+            "density_map", "map_scale_influence", "map_rotation_influence",
+            "cull_overlaps", "use_proxies", "proxy_type", "display_mode",
+            "lod_distance", "group_size", "point_clouds", "projection_dir",
+            "projection_region", "export_layers", "layer_task"]
+PROJECTION_DIRECTIONS = [("Down (-Y)", [0.0, -1.0, 0.0]),
+                         ("Up (+Y)", [0.0, 1.0, 0.0]),
+                         ("-X", [-1.0, 0.0, 0.0]), ("+X", [1.0, 0.0, 0.0]),
+                         ("-Z", [0.0, 0.0, -1.0]), ("+Z", [0.0, 0.0, 1.0])]
+
 
 def maya_main_window():
     """Returns the open maya window.
@@ -22,11 +60,36 @@ def maya_main_window():
     return wrapInstance(long(main_window), QtWidgets.QWidget)
 
 
-def cross(a, b):
-    c = [a[1] * b[2] - a[2] * b[1],
-         a[2] * b[0] - a[0] * b[2],
-         a[0] * b[1] - a[1] * b[0]]
-    return c
+class ScatterThread(QtCore.QThread):
+    """Computes a scatter run's placements off the main thread, handing
+    finished batches over through a small bounded queue."""
+    def __init__(self, batches, max_pending=2, parent=None):
+        super(ScatterThread, self).__init__(parent)
+        self.batches = batches
+        self.queue = queue.Queue(max_pending)
+        self.computed = 0
+        self.error = None
+        self._cancelled = False
+
+    def run(self):
+        try:
+            for batch in self.batches:
+                while not self._cancelled:
+                    try:
+                        self.queue.put(batch, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if self._cancelled:
+                    self.batches.close()
+                    return
+                self.computed += len(batch)
+        except Exception as error:
+            log.exception("Scatter computation failed")
+            self.error = error
+
+    def cancel(self):
+        self._cancelled = True
 
 
 class ScatterUI(QtWidgets.QDialog):
@@ -73,15 +136,25 @@ class ScatterUI(QtWidgets.QDialog):
         self.target_le = QtWidgets.QLineEdit()
         self.target_le.setPlaceholderText("Objects to target")
         self._set_read_only_fields([self.obj_le, self.target_le])
-        self.obj_btn = QtWidgets.QPushButton(
-            "Get From Selection\n(Up to three objects)")
+        self.obj_btn = QtWidgets.QPushButton("Get From Selection")
         self.target_btn = QtWidgets.QPushButton("Get From Selection")
+        self.cloud_le = QtWidgets.QLineEdit()
+        self.cloud_le.setPlaceholderText("Point files to target")
+        self._set_read_only_fields([self.cloud_le])
+        self.cloud_btn = QtWidgets.QPushButton("Browse...")
+        self.cloud_clear_btn = QtWidgets.QPushButton("Clear")
+        cloud_lay = QtWidgets.QGridLayout()
+        cloud_lay.addWidget(self.cloud_le, 0, 0, 1, 2)
+        cloud_lay.addWidget(self.cloud_btn, 1, 0)
+        cloud_lay.addWidget(self.cloud_clear_btn, 1, 1)
+        cloud_lay.setAlignment(QtCore.Qt.AlignTop)
         layout = QtWidgets.QGridLayout()
         layout.addWidget(self.obj_le, 0, 0)
         layout.addWidget(self.target_le, 0, 2)
-        layout.addLayout(self._create_proportion_layout(), 2, 0)
+        layout.addWidget(self._create_weight_table(), 2, 0)
         layout.addWidget(self.obj_btn, 1, 0)
         layout.addWidget(self.target_btn, 1, 2)
+        layout.addLayout(cloud_lay, 2, 2)
         return layout
 
     @staticmethod
@@ -91,32 +164,18 @@ class ScatterUI(QtWidgets.QDialog):
             le.setMinimumHeight(30)
             le.setReadOnly(True)
 
-    def _create_proportion_layout(self):
-        self._create_proportion_controls()
-        layout = QtWidgets.QGridLayout()
-        layout.addWidget(self.obj_1_lbl, 0, 0)
-        layout.addWidget(self.obj_1_sbx, 0, 1)
-        layout.addWidget(self.obj_2_lbl, 1, 0)
-        layout.addWidget(self.obj_2_sbx, 1, 1)
-        layout.addWidget(self.obj_3_lbl, 2, 0)
-        layout.addWidget(self.obj_3_sbx, 2, 1)
-        return layout
-
-    def _create_proportion_controls(self):
-        self.obj_1_lbl = QtWidgets.QLabel("")
-        self.obj_2_lbl = QtWidgets.QLabel("")
-        self.obj_3_lbl = QtWidgets.QLabel("")
-        self.lbl_list = [self.obj_1_lbl, self.obj_2_lbl, self.obj_3_lbl]
-        self.obj_1_sbx = self._create_double_sbx("%", [0.0, 100.0], 1)
-        self.obj_1_sbx.setEnabled(False)
-        self.obj_1_value = self.obj_1_sbx.value()
-        self.obj_2_sbx = self._create_double_sbx("%", [0.0, 100.0], 1)
-        self.obj_2_sbx.setEnabled(False)
-        self.obj_2_value = self.obj_2_sbx.value()
-        self.obj_3_sbx = self._create_double_sbx("%", [0.0, 100.0], 1)
-        self.obj_3_sbx.setEnabled(False)
-        self.obj_3_value = self.obj_3_sbx.value()
-        self.obj_sbx_list = [self.obj_1_sbx, self.obj_2_sbx, self.obj_3_sbx]
+    def _create_weight_table(self):
+        self.weight_tbl = QtWidgets.QTableWidget(0, 3)
+        self.weight_tbl.setHorizontalHeaderLabels(
+            ["Object", "Weight", "Share"])
+        self.weight_tbl.horizontalHeader().setSectionResizeMode(
+            0, QtWidgets.QHeaderView.Stretch)
+        self.weight_tbl.verticalHeader().setVisible(False)
+        self.weight_tbl.setSelectionMode(
+            QtWidgets.QAbstractItemView.NoSelection)
+        self.weight_tbl.setMinimumHeight(120)
+        self.weight_sbx_list = []
+        return self.weight_tbl
 
     def _create_modifier_layout(self):
         layout = QtWidgets.QVBoxLayout()
@@ -221,11 +280,153 @@ class ScatterUI(QtWidgets.QDialog):
         self.orient_cbx.setChecked(True)
         self.orient_cbx.setMaximumWidth(80)
         self.orient_cbx.setMinimumHeight(30)
+        self.output_lbl = QtWidgets.QLabel("Output")
+        self._align_widgets([self.output_lbl])
+        self.output_cmb = QtWidgets.QComboBox()
+        self.output_cmb.addItem("Instances", "instances")
+        self.output_cmb.addItem("Instancer", "instancer")
+        self.output_cmb.setMinimumHeight(30)
+        self.overlap_lbl = QtWidgets.QLabel("Cull Overlaps")
+        self._align_widgets([self.overlap_lbl])
+        self.overlap_cbx = QtWidgets.QCheckBox()
+        self.overlap_cbx.setMaximumWidth(80)
+        self.overlap_cbx.setMinimumHeight(30)
+        self.group_size_lbl = QtWidgets.QLabel("Max per Group")
+        self._align_widgets([self.group_size_lbl])
+        self.group_size_sbx = QtWidgets.QSpinBox()
+        self.group_size_sbx.setRange(0, 100000)
+        self.group_size_sbx.setValue(500)
+        self.group_size_sbx.setSpecialValueText("No Grouping")
+        self.group_size_sbx.setMinimumHeight(30)
+        self.layer_lbl = QtWidgets.QLabel("Export Layer")
+        self._align_widgets([self.layer_lbl])
+        self.layer_cbx = QtWidgets.QCheckBox()
+        self.layer_cbx.setMaximumWidth(80)
+        self.layer_cbx.setMinimumHeight(30)
         layout = QtWidgets.QGridLayout()
         layout.addWidget(self.density_lbl, 0, 1)
         layout.addWidget(self.density_sbx, 0, 2)
         layout.addWidget(self.orient_lbl, 0, 4)
         layout.addWidget(self.orient_cbx, 0, 5)
+        layout.addWidget(self.output_lbl, 1, 1)
+        layout.addWidget(self.output_cmb, 1, 2)
+        layout.addWidget(self.overlap_lbl, 1, 4)
+        layout.addWidget(self.overlap_cbx, 1, 5)
+        layout.addWidget(self.group_size_lbl, 2, 1)
+        layout.addWidget(self.group_size_sbx, 2, 2)
+        layout.addWidget(self.layer_lbl, 2, 4)
+        layout.addWidget(self.layer_cbx, 2, 5)
+        layout.addLayout(self._create_sample_layout(), 3, 0, 1, 6)
+        layout.addLayout(self._create_map_layout(), 4, 0, 1, 6)
+        layout.addLayout(self._create_display_layout(), 5, 0, 1, 6)
+        return layout
+
+    def _create_map_layout(self):
+        self.map_lbl = QtWidgets.QLabel("Density Map")
+        self.map_scale_lbl = QtWidgets.QLabel("Map Scale")
+        self.map_rot_lbl = QtWidgets.QLabel("Map Rotation")
+        self._align_widgets([self.map_lbl, self.map_scale_lbl,
+                             self.map_rot_lbl])
+        self.map_le = QtWidgets.QLineEdit()
+        self.map_le.setPlaceholderText("Colour set or weight attribute")
+        self.map_le.setMinimumHeight(30)
+        self.map_scale_sbx = self._create_double_sbx("%", [0.0, 100.0], 1.0)
+        self.map_scale_sbx.setWrapping(False)
+        self.map_rot_sbx = self._create_double_sbx("%", [0.0, 100.0], 1.0)
+        self.map_rot_sbx.setWrapping(False)
+        layout = QtWidgets.QGridLayout()
+        layout.addWidget(self.map_lbl, 0, 1)
+        layout.addWidget(self.map_le, 0, 2, 1, 4)
+        layout.addWidget(self.map_scale_lbl, 1, 1)
+        layout.addWidget(self.map_scale_sbx, 1, 2)
+        layout.addWidget(self.map_rot_lbl, 1, 4)
+        layout.addWidget(self.map_rot_sbx, 1, 5)
+        return layout
+
+    def _create_sample_layout(self):
+        self.sample_lbl = QtWidgets.QLabel("Sample")
+        self.count_lbl = QtWidgets.QLabel("Point Count")
+        self._align_widgets([self.sample_lbl, self.count_lbl])
+        self.sample_cmb = QtWidgets.QComboBox()
+        self.sample_cmb.addItem("Vertices", "vertices")
+        self.sample_cmb.addItem("Surface", "surface")
+        self.sample_cmb.addItem("Projection", "projection")
+        self.sample_cmb.setMinimumHeight(30)
+        self.count_sbx = QtWidgets.QSpinBox()
+        self.count_sbx.setRange(1, 10000000)
+        self.count_sbx.setValue(1000)
+        self.count_sbx.setMaximumWidth(80)
+        self.count_sbx.setMinimumHeight(30)
+        self.count_sbx.setEnabled(False)
+        self.spacing_lbl = QtWidgets.QLabel("Min Spacing")
+        self._align_widgets([self.spacing_lbl])
+        self.spacing_sbx = self._create_double_sbx("", [0.0, 1000.0], 0.1)
+        self.spacing_sbx.setWrapping(False)
+        self.seed_lbl = QtWidgets.QLabel("Seed")
+        self._align_widgets([self.seed_lbl])
+        self.seed_sbx = QtWidgets.QSpinBox()
+        self.seed_sbx.setRange(0, 999999)
+        self.seed_sbx.setMaximumWidth(80)
+        self.seed_sbx.setMinimumHeight(30)
+        self.direction_lbl = QtWidgets.QLabel("Direction")
+        self.region_lbl = QtWidgets.QLabel("Region")
+        self._align_widgets([self.direction_lbl, self.region_lbl])
+        self.direction_cmb = QtWidgets.QComboBox()
+        for label, direction in PROJECTION_DIRECTIONS:
+            self.direction_cmb.addItem(label, direction)
+        self.direction_cmb.setMinimumHeight(30)
+        self.region_le = QtWidgets.QLineEdit()
+        self.region_le.setPlaceholderText("Target bounds")
+        self._set_read_only_fields([self.region_le])
+        self.region_btn = QtWidgets.QPushButton("Get From Selection")
+        self._update_sample_mode()
+        layout = QtWidgets.QGridLayout()
+        layout.addWidget(self.sample_lbl, 0, 1)
+        layout.addWidget(self.sample_cmb, 0, 2)
+        layout.addWidget(self.count_lbl, 0, 4)
+        layout.addWidget(self.count_sbx, 0, 5)
+        layout.addWidget(self.spacing_lbl, 1, 1)
+        layout.addWidget(self.spacing_sbx, 1, 2)
+        layout.addWidget(self.seed_lbl, 1, 4)
+        layout.addWidget(self.seed_sbx, 1, 5)
+        layout.addWidget(self.direction_lbl, 2, 1)
+        layout.addWidget(self.direction_cmb, 2, 2)
+        layout.addWidget(self.region_lbl, 3, 1)
+        layout.addWidget(self.region_le, 3, 2, 1, 3)
+        layout.addWidget(self.region_btn, 3, 5)
+        return layout
+
+    def _create_display_layout(self):
+        self.proxy_lbl = QtWidgets.QLabel("Use Proxies")
+        self.proxy_type_lbl = QtWidgets.QLabel("Proxy")
+        self.display_lbl = QtWidgets.QLabel("Display")
+        self.lod_lbl = QtWidgets.QLabel("LOD Distance")
+        self._align_widgets([self.proxy_lbl, self.proxy_type_lbl,
+                             self.display_lbl, self.lod_lbl])
+        self.proxy_cbx = QtWidgets.QCheckBox()
+        self.proxy_cbx.setMaximumWidth(80)
+        self.proxy_cbx.setMinimumHeight(30)
+        self.proxy_type_cmb = QtWidgets.QComboBox()
+        self.proxy_type_cmb.addItem("Bounding Box", "box")
+        self.proxy_type_cmb.addItem("Reduced", "reduced")
+        self.proxy_type_cmb.setMinimumHeight(30)
+        self.display_cmb = QtWidgets.QComboBox()
+        self.display_cmb.addItem("Proxies", "proxy")
+        self.display_cmb.addItem("Full", "full")
+        self.display_cmb.addItem("Distance LOD", "lod")
+        self.display_cmb.setMinimumHeight(30)
+        self.lod_sbx = self._create_double_sbx("", [0.0, 100000.0], 1.0)
+        self.lod_sbx.setWrapping(False)
+        self.lod_sbx.setValue(50.0)
+        layout = QtWidgets.QGridLayout()
+        layout.addWidget(self.proxy_lbl, 0, 1)
+        layout.addWidget(self.proxy_cbx, 0, 2)
+        layout.addWidget(self.proxy_type_lbl, 0, 4)
+        layout.addWidget(self.proxy_type_cmb, 0, 5)
+        layout.addWidget(self.display_lbl, 1, 1)
+        layout.addWidget(self.display_cmb, 1, 2)
+        layout.addWidget(self.lod_lbl, 1, 4)
+        layout.addWidget(self.lod_sbx, 1, 5)
         return layout
 
     def _create_button_ui(self):
@@ -234,58 +435,164 @@ class ScatterUI(QtWidgets.QDialog):
         self.scatter_btn.setEnabled(False)
         self.scatter_btn.setMaximumWidth(300)
         self.scatter_btn.setMaximumHeight(100)
-        layout = QtWidgets.QHBoxLayout()
-        layout.addWidget(self.scatter_btn)
+        self.preview_cbx = QtWidgets.QCheckBox("Live Preview")
+        self.preview_cbx.setMinimumHeight(30)
+        self.preview_timer = QtCore.QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(250)
+        self._pending_stage = None
+        self.update_btn = QtWidgets.QPushButton("Update")
+        self.update_btn.setEnabled(False)
+        self.update_btn.setMaximumHeight(100)
+        self.cancel_btn = QtWidgets.QPushButton("Cancel")
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.setMaximumHeight(100)
+        self.profile_cbx = QtWidgets.QCheckBox("Profile")
+        self.profile_cbx.setMinimumHeight(30)
+        self.progress_bar = QtWidgets.QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setTextVisible(False)
+        self.progress_lbl = QtWidgets.QLabel()
+        self.drain_timer = QtCore.QTimer(self)
+        self.drain_timer.setInterval(10)
+        self._run = None
+        self._scatter_thread = None
+        self._pending = None
+        self._stop_message = ""
+        self._pending_offset = 0
+        button_lay = QtWidgets.QHBoxLayout()
+        button_lay.addWidget(self.preview_cbx)
+        button_lay.addWidget(self.scatter_btn)
+        button_lay.addWidget(self.update_btn)
+        button_lay.addWidget(self.cancel_btn)
+        button_lay.addWidget(self.profile_cbx)
+        layout = QtWidgets.QVBoxLayout()
+        layout.addLayout(button_lay)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.progress_lbl)
         return layout
 
     def _create_connections(self):
         self.obj_btn.clicked.connect(self._select_obj)
         self.target_btn.clicked.connect(self._select_target)
+        self.cloud_btn.clicked.connect(self._browse_clouds)
+        self.cloud_clear_btn.clicked.connect(self._clear_clouds)
         self.scatter_btn.clicked.connect(self._scatter)
-        self.obj_1_sbx.editingFinished.connect(self._update_spinbox_1)
-        self.obj_2_sbx.editingFinished.connect(self._update_spinbox_2)
-        self.obj_3_sbx.editingFinished.connect(self._update_spinbox_3)
+        self.update_btn.clicked.connect(self._update_scatter)
+        self.cancel_btn.clicked.connect(self._cancel_scatter)
+        self.drain_timer.timeout.connect(self._drain_scatter)
+        self.sample_cmb.currentIndexChanged.connect(self._update_sample_mode)
+        self.region_btn.clicked.connect(self._select_region)
+        self.preview_cbx.toggled.connect(self._toggle_preview)
+        self.preview_timer.timeout.connect(self._update_preview)
+        self.display_cmb.currentIndexChanged.connect(self._update_display)
+        self.proxy_cbx.toggled.connect(self._update_layer_export)
+        self.layer_cbx.toggled.connect(self._update_layer_export)
+        self._create_preview_connections()
+
+    def _create_preview_connections(self):
+        stage_widgets = {
+            "source": [self.count_sbx, self.seed_sbx],
+            "sample": [self.density_sbx, self.spacing_sbx],
+            "modify": [self.x_neg_sbx, self.x_pos_sbx, self.y_neg_sbx,
+                       self.y_pos_sbx, self.z_neg_sbx, self.z_pos_sbx,
+                       self.scale_min_sbx, self.scale_max_sbx,
+                       self.map_scale_sbx, self.map_rot_sbx]}
+        for stage, widgets in stage_widgets.items():
+            for widget in widgets:
+                widget.valueChanged.connect(
+                    functools.partial(self._queue_preview, stage))
+        self.orient_cbx.toggled.connect(
+            functools.partial(self._queue_preview, "modify"))
+        self.overlap_cbx.toggled.connect(
+            functools.partial(self._queue_preview, "modify"))
+        self.sample_cmb.currentIndexChanged.connect(
+            functools.partial(self._queue_preview, "source"))
+        self.direction_cmb.currentIndexChanged.connect(
+            functools.partial(self._queue_preview, "source"))
+        self.map_le.editingFinished.connect(
+            functools.partial(self._queue_preview, "source"))
+        self.output_cmb.currentIndexChanged.connect(
+            functools.partial(self._queue_preview, None))
+
+    @QtCore.Slot()
+    def _update_display(self):
+        """Switches proxied scatters to the chosen display mode at once."""
+        self.scatter.lod_distance = self.lod_sbx.value()
+        self.scatter.set_display_mode(self.display_cmb.currentData())
+
+    @QtCore.Slot()
+    def _update_layer_export(self):
+        """Layers can't be exported with proxies, so checking either box
+        disables the other."""
+        self.layer_cbx.setEnabled(not self.proxy_cbx.isChecked())
+        self.proxy_cbx.setEnabled(not self.layer_cbx.isChecked())
+
+    @QtCore.Slot()
+    def _update_sample_mode(self):
+        mode = self.sample_cmb.currentData()
+        self.count_sbx.setEnabled(mode in ("surface", "projection"))
+        for widget in (self.direction_cmb, self.region_le, self.region_btn):
+            widget.setEnabled(mode == "projection")
+
+    @QtCore.Slot()
+    def _select_region(self):
+        """Uses the first selected object's bounding box as the projection
+        region, or the targets' bounds when nothing is selected."""
+        selection = cmds.ls(orderedSelection=True, transforms=True)
+        self.scatter.projection_region = selection[0] if selection else ""
+        self.region_le.setText(self.scatter.projection_region)
+        self._queue_preview("source")
 
     @QtCore.Slot()
     def _select_obj(self):
         self.scatter.set_scatter_obj()
-        if 0 < len(self.scatter.scatter_objs) < 4:
+        self._queue_preview("sample")
+        if self.scatter.scatter_objs:
             display_str = self._create_list_string(self.scatter.scatter_objs)
             self.obj_le.setText(display_str)
-            self._update_proportion_controls()
         else:
             self.obj_le.clear()
             MGlobal.displayError(
-                "Failed to get scatter object. Select up to three objects in "
+                "Failed to get scatter object. Select one or more objects in "
                 "Object Mode and press \"Get From Selection\"")
-            self._reset_proportion_controls()
+        self._update_weight_table()
         self._update_scatter_btn_state()
 
-    def _update_proportion_controls(self):
-        self._reset_proportion_controls()
-        total = 0
-        objects = len(self.scatter.scatter_objs)
-        for count in range(objects):
-            self.obj_sbx_list[count].setEnabled(True)
-            self.lbl_list[count].setText(self.scatter.scatter_objs[count])
-            if count is objects - 1:
-                self.obj_sbx_list[count].setValue(100 - total)
-            else:
-                val = int(100 / objects)
-                self.obj_sbx_list[count].setValue(val)
-                total += val
-        self._update_spinbox_value_stores()
+    def _update_weight_table(self):
+        self.weight_tbl.setRowCount(len(self.scatter.scatter_objs))
+        self.weight_sbx_list = []
+        for row, obj in enumerate(self.scatter.scatter_objs):
+            item = QtWidgets.QTableWidgetItem(obj)
+            item.setFlags(QtCore.Qt.ItemIsEnabled)
+            self.weight_tbl.setItem(row, 0, item)
+            sbx = self._create_double_sbx("", [0.0, 100.0], 0.1)
+            sbx.setWrapping(False)
+            sbx.setValue(1.0)
+            sbx.valueChanged.connect(self._update_weight_shares)
+            sbx.valueChanged.connect(
+                functools.partial(self._queue_preview, "sample"))
+            self.weight_tbl.setCellWidget(row, 1, sbx)
+            self.weight_sbx_list.append(sbx)
+        self._update_weight_shares()
 
-    def _reset_proportion_controls(self):
-        for count in range(len(self.obj_sbx_list)):
-            self.obj_sbx_list[count].setEnabled(False)
-            self.obj_sbx_list[count].setValue(0)
-            self.lbl_list[count].setText("")
+    @QtCore.Slot()
+    def _update_weight_shares(self):
+        weights = [sbx.value() for sbx in self.weight_sbx_list]
+        total = sum(weights)
+        for row, weight in enumerate(weights):
+            share = weight / total * 100 if total else 0.0
+            item = QtWidgets.QTableWidgetItem("{:.1f}%".format(share))
+            item.setFlags(QtCore.Qt.ItemIsEnabled)
+            self.weight_tbl.setItem(row, 2, item)
 
     @QtCore.Slot()
     def _select_target(self):
         self.scatter.set_scatter_targets()
-        full_targets = self.scatter.target_objs + self.scatter.target_verts
+        self._queue_preview("source")
+        full_targets = self.scatter.target_objs + [
+            "{} ({} verts)".format(mesh, len(indices))
+            for mesh, indices in self.scatter.target_verts.items()]
         if len(full_targets) > 0:
             display_str = self._create_list_string(full_targets)
             self.target_le.setText(display_str)
@@ -296,6 +603,25 @@ class ScatterUI(QtWidgets.QDialog):
                 "Object Mode and press \"Get From Selection\"")
         self._update_scatter_btn_state()
 
+    @QtCore.Slot()
+    def _browse_clouds(self):
+        paths, _ = QtWidgets.QFileDialog.getOpenFileNames(
+            self, "Point Files", "", "Point files (*.ply *.csv *.txt *.xyz "
+            "*.bin *.raw *.f32 *.npy)")
+        if paths:
+            self._set_clouds(paths)
+
+    @QtCore.Slot()
+    def _clear_clouds(self):
+        self._set_clouds([])
+
+    def _set_clouds(self, paths):
+        self.scatter.point_clouds = list(paths)
+        self._queue_preview("source")
+        self.cloud_le.setText(self._create_list_string(
+            [os.path.basename(path) for path in paths]))
+        self._update_scatter_btn_state()
+
     @staticmethod
     def _create_list_string(obj_list):
         target_str = ""
@@ -307,66 +633,268 @@ class ScatterUI(QtWidgets.QDialog):
 
     @QtCore.Slot()
     def _scatter(self):
-        """Tests for scatter objects and then applies scatter."""
-        if not cmds.objExists(self.scatter.scatter_objs[0]):
-            MGlobal.displayError("One or more specified scatter objects do  "
-                                 "not exist. Please reselect.")
-            self.obj_le.clear()
-            self._update_scatter_btn_state()
+        """Tests for scatter objects, then computes the scatter on a worker
+        thread while the scene is edited here in small chunks. The chunks
+        are written with undo suspended, and the finished scatter is
+        registered as a single undo step."""
+        if self._scatter_thread is not None \
+                or not self._validate_scatter_inputs():
+            return
+        self._set_scatter_properties_from_ui()
+        self.preview_cbx.setChecked(False)
+        profile = self.scatter.start_profile()
+        try:
+            with self.scatter.profiled(profile):
+                run = self.scatter.start_scatter()
+            with self._scene_step(run):
+                run.begin()
+        except Exception as error:
+            if profile is not None:
+                self.scatter.stop_profile(profile, report=False)
+            MGlobal.displayError("Scatter failed: {}".format(error))
+            return
+        self._run = run
+        self._pending = None
+        self._scatter_started = timeit.default_timer()
+        self._scatter_thread = ScatterThread(run.batches, parent=self)
+        self._set_scatter_running(True)
+        self._scatter_thread.start()
+        self.drain_timer.start()
+
+    @QtCore.Slot()
+    def _update_scatter(self):
+        """Updates the last scatter in place, so a density change only adds
+        or deletes the instances that differ, see
+        ScatterTool.update_scatter."""
+        if self._scatter_thread is not None \
+                or not self._validate_scatter_inputs():
+            return
+        self._set_scatter_properties_from_ui()
+        self.preview_cbx.setChecked(False)
+        try:
+            group = self.scatter.update_scatter()
+        except Exception as error:
+            MGlobal.displayError("Scatter update failed: {}".format(error))
+            return
+        MGlobal.displayInfo("Updated {}".format(group))
+
+    @QtCore.Slot()
+    def _drain_scatter(self):
+        """Writes computed placements into the scene for a few milliseconds
+        at a time, so Maya stays responsive. The scene is left alone on
+        ticks where nothing has been computed yet. If writing fails, the
+        run is stopped and what it wrote is removed."""
+        thread = self._scatter_thread
+        try:
+            if self._next_pending(thread):
+                deadline = timeit.default_timer() + 0.05
+                with self._scene_step(self._run):
+                    while timeit.default_timer() < deadline \
+                            and self._next_pending(thread):
+                        end = self._pending_offset + EDIT_CHUNK
+                        self._run.add(self._pending.take(
+                            slice(self._pending_offset, end)))
+                        self._pending_offset = end
+                        if end >= len(self._pending):
+                            self._pending = None
+        except Exception as error:
+            log.exception("Writing the scatter failed")
+            MGlobal.displayError("Scatter failed: {}".format(error))
+            self._stop_scatter("Failed")
             return
-        for target in self.scatter.target_objs + self.scatter.target_verts:
+        self._update_scatter_progress()
+        if thread.isFinished() and self._pending is None \
+                and thread.queue.empty():
+            self._finish_scatter()
+
+    def _next_pending(self, thread):
+        """Makes sure a computed batch is waiting to be written.
+
+        Return:
+            bool: False if the thread has none ready.
+        """
+        if self._pending is None:
+            try:
+                self._pending = thread.queue.get_nowait()
+            except queue.Empty:
+                return False
+            self._pending_offset = 0
+        return True
+
+    def _update_scatter_progress(self):
+        """Shows completion, points per second and time remaining.
+
+        Completion is the share of candidates computed, scaled by the share
+        of computed points already written to the scene.
+        """
+        elapsed = timeit.default_timer() - self._scatter_started
+        computed = self._scatter_thread.computed
+        written = float(self._run.points) / computed if computed else 0.0
+        fraction = self._run.progress * min(written, 1.0)
+        self.progress_bar.setValue(int(fraction * 1000))
+        rate = self._run.points / elapsed if elapsed else 0.0
+        eta = elapsed * (1.0 - fraction) / fraction if fraction else None
+        self.progress_lbl.setText("{} points, {:.0f} points/sec, {}".format(
+            self._run.points, rate,
+            "ETA {:.0f}s".format(eta) if eta is not None
+            else "estimating..."))
+
+    @contextlib.contextmanager
+    def _scene_step(self, run, undoable=False):
+        """Edits the scene for a run, profiled as its emit stage, and
+        restores the selection if the edits changed it. Only an undoable
+        step enters the undo queue, as one chunk; the rest run with undo
+        suspended."""
+        if undoable:
+            edit = scatter_output.undo_chunk("scatter")
+        else:
+            edit = scatter_output.undo_suspended()
+        with edit, scatter_output.preserved_selection():
+            with self.scatter.profiled(run.profile, "emit"):
+                yield
+
+    def _finish_scatter(self):
+        self.drain_timer.stop()
+        run, thread = self._run, self._scatter_thread
+        self._run = self._scatter_thread = None
+        self._set_scatter_running(False)
+        try:
+            if thread.error is not None:
+                with self._scene_step(run):
+                    run.cancel()
+                MGlobal.displayError("Scatter failed: {}".format(
+                    thread.error))
+                return
+            try:
+                with self._scene_step(run, undoable=True):
+                    group = run.finish()
+            except Exception as error:
+                MGlobal.displayError("Scatter failed: {}".format(error))
+                return
+        finally:
+            if run.profile is not None:
+                self.scatter.stop_profile(run.profile, report=False)
+        self.scatter.last_points = run.points
+        if run.profile is not None:
+            self.scatter.report_profile(run.profile)
+        elapsed = timeit.default_timer() - self._scatter_started
+        self.progress_lbl.setText("{} points in {:.1f}s".format(
+            run.points, elapsed))
+        MGlobal.displayInfo("Scattered {} points into {}".format(
+            run.points, group))
+
+    @QtCore.Slot()
+    def _cancel_scatter(self):
+        """Stops a running scatter and removes everything it created."""
+        self._stop_scatter("Cancelled")
+
+    def _stop_scatter(self, message):
+        """Stops the running scatter, removing what it wrote, and shows
+        message once it has stopped.
+
+        The worker thread is told to stop but not waited for, so Maya stays
+        responsive; scattering is enabled again once it has exited.
+        """
+        if self._run is None:
+            return
+        self.drain_timer.stop()
+        run, thread = self._run, self._scatter_thread
+        self._run = self._pending = None
+        thread.cancel()
+        try:
+            with self._scene_step(run):
+                run.cancel()
+        except Exception:
+            log.exception("Could not remove the stopped scatter")
+        finally:
+            if run.profile is not None:
+                self.scatter.stop_profile(run.profile, report=False)
+        self._stop_message = message
+        self.cancel_btn.setEnabled(False)
+        self.progress_bar.setValue(0)
+        self.progress_lbl.setText("Stopping...")
+        thread.finished.connect(self._scatter_stopped)
+        if thread.isFinished():
+            self._scatter_stopped()
+
+    @QtCore.Slot()
+    def _scatter_stopped(self):
+        """Re-enables scattering once a stopped run's thread exits."""
+        if self._scatter_thread is None:
+            return
+        self._scatter_thread = None
+        self._set_scatter_running(False)
+        self.progress_lbl.setText(self._stop_message)
+
+    def _set_scatter_running(self, running):
+        self.scatter_btn.setEnabled(not running)
+        self.update_btn.setEnabled(not running)
+        self.preview_cbx.setEnabled(not running)
+        self.cancel_btn.setEnabled(running)
+        if running:
+            self.progress_bar.setValue(0)
+
+    def _validate_scatter_inputs(self):
+        for obj in self.scatter.scatter_objs:
+            if not cmds.objExists(obj):
+                MGlobal.displayError("One or more specified scatter objects "
+                                     "do not exist. Please reselect.")
+                self.obj_le.clear()
+                self._update_scatter_btn_state()
+                return False
+        for target in self.scatter.target_objs + list(
+                self.scatter.target_verts):
             if not cmds.objExists(target):
                 MGlobal.displayError("One or more of the scatter targets does "
                                      "not exist. Please reselect.")
                 self.target_le.clear()
                 self._update_scatter_btn_state()
-                return
-        self._set_scatter_properties_from_ui()
-        self.scatter.scatter()
+                return False
+        for path in self.scatter.point_clouds:
+            if not os.path.isfile(path):
+                MGlobal.displayError("Point file {} does not exist. Please "
+                                     "browse again.".format(path))
+                self._clear_clouds()
+                return False
+        return True
 
-    @QtCore.Slot()
-    def _update_spinbox_1(self):
-        self._update_spinboxes(self.obj_1_sbx, self.obj_1_value,
-                               self._find_remaining_spinboxes(self.obj_1_sbx))
+    def _queue_preview(self, stage=None, *signal_args):
+        """Marks a stage as stale and restarts the preview debounce timer."""
+        if stage and (self._pending_stage is None
+                      or STAGES.index(stage)
+                      < STAGES.index(self._pending_stage)):
+            self._pending_stage = stage
+        if self.preview_cbx.isChecked():
+            self.preview_timer.start()
 
     @QtCore.Slot()
-    def _update_spinbox_2(self):
-        self._update_spinboxes(self.obj_2_sbx, self.obj_2_value,
-                               self._find_remaining_spinboxes(self.obj_2_sbx))
+    def _update_preview(self):
+        if not self.preview_cbx.isChecked() \
+                or not self.scatter_btn.isEnabled() \
+                or not self._validate_scatter_inputs():
+            return
+        self._set_scatter_properties_from_ui()
+        if self._pending_stage:
+            self.scatter.invalidate(self._pending_stage)
+            self._pending_stage = None
+        self.scatter.preview()
 
     @QtCore.Slot()
-    def _update_spinbox_3(self):
-        self._update_spinboxes(self.obj_3_sbx, self.obj_3_value,
-                               self._find_remaining_spinboxes(self.obj_3_sbx))
-
-    def _find_remaining_spinboxes(self, target_sbx):
-        active_sbxs = []
-        for sbx in self.obj_sbx_list:
-            if sbx.isEnabled() and sbx is not target_sbx:
-                active_sbxs.append(sbx)
-        return active_sbxs
-
-    def _update_spinboxes(self, changed_sbx, old_val, other_sbxs):
-        if changed_sbx.value() is not old_val:
-            remainder = 100 - changed_sbx.value()
-            old_remainder = 100 - old_val
-            if old_remainder is 0:
-                old_remainder = 0.01
-            count = changed_sbx.value()
-            for outer in range(len(other_sbxs)):
-                if outer is len(other_sbxs) - 1:
-                    other_sbxs[outer].setValue(100 - count)
-                else:
-                    proportion = float(remainder / old_remainder)
-                    new_val = int(other_sbxs[outer].value() * proportion)
-                    other_sbxs[outer].setValue(new_val)
-                    count += new_val
-        self._update_spinbox_value_stores()
+    def _toggle_preview(self):
+        if self.preview_cbx.isChecked():
+            self._queue_preview()
+        else:
+            self.preview_timer.stop()
+            self.scatter.clear_preview()
 
-    def _update_spinbox_value_stores(self):
-        self.obj_1_value = self.obj_1_sbx.value()
-        self.obj_2_value = self.obj_2_sbx.value()
-        self.obj_3_value = self.obj_3_sbx.value()
+    def closeEvent(self, event):
+        self._cancel_scatter()
+        if self._scatter_thread is not None:
+            self._scatter_thread.wait()
+            self._scatter_stopped()
+        self.preview_cbx.setChecked(False)
+        self.scatter.close()
+        super(ScatterUI, self).closeEvent(event)
 
     def _set_scatter_properties_from_ui(self):
         scatter_density = float(self.density_sbx.value()) / 100
@@ -379,30 +907,93 @@ class ScatterUI(QtWidgets.QDialog):
         self.scatter.rot_range_x = rot_range_x
         self.scatter.rot_range_y = rot_range_y
         self.scatter.rot_range_z = rot_range_z
-        self.scatter.obj_proportions[0] = self.obj_1_sbx.value()
-        self.scatter.obj_proportions[1] = self.obj_2_sbx.value()
-        self.scatter.obj_proportions[2] = self.obj_3_sbx.value()
+        self.scatter.obj_weights = [sbx.value()
+                                    for sbx in self.weight_sbx_list]
         self.scatter.align = self.orient_cbx.isChecked()
+        self.scatter.cull_overlaps = self.overlap_cbx.isChecked()
+        self.scatter.use_proxies = self.proxy_cbx.isChecked()
+        self.scatter.proxy_type = self.proxy_type_cmb.currentData()
+        self.scatter.display_mode = self.display_cmb.currentData()
+        self.scatter.lod_distance = self.lod_sbx.value()
+        self.scatter.output_mode = self.output_cmb.currentData()
+        self.scatter.group_size = self.group_size_sbx.value()
+        self.scatter.export_layers = self.layer_cbx.isChecked()
+        self.scatter.sample_mode = self.sample_cmb.currentData()
+        self.scatter.point_count = self.count_sbx.value()
+        self.scatter.projection_dir = list(self.direction_cmb.currentData())
+        self.scatter.min_distance = self.spacing_sbx.value()
+        self.scatter.seed = self.seed_sbx.value()
+        self.scatter.density_map = self.map_le.text().strip()
+        self.scatter.map_scale_influence = self.map_scale_sbx.value() / 100
+        self.scatter.map_rotation_influence = self.map_rot_sbx.value() / 100
+        self.scatter.profiling = self.profile_cbx.isChecked()
 
     def _update_scatter_btn_state(self):
-        if self.obj_le.text() and self.target_le.text():
-            self.scatter_btn.setEnabled(True)
-        else:
-            self.scatter_btn.setEnabled(False)
+        enabled = bool(self.obj_le.text() and (
+            self.target_le.text() or self.cloud_le.text()))
+        self.scatter_btn.setEnabled(enabled)
+        self.update_btn.setEnabled(enabled)
 
 
 class ScatterTool(object):
     def __init__(self):
         self.target_objs = []
-        self.target_verts = []
+        self.target_verts = {}
+        self.point_clouds = []
         self.scatter_objs = []
         self.scatter_density = 1.0
         self.rot_range_x = [0.0, 0.0]
         self.rot_range_y = [0.0, 0.0]
         self.rot_range_z = [0.0, 0.0]
         self.scale_range = [1.0, 1.0]
-        self.obj_proportions = [0.0, 0.0, 0.0]
+        self.obj_weights = []
         self.align = True
+        self.sample_mode = "vertices"
+        self.point_count = 1000
+        self.projection_dir = [0.0, -1.0, 0.0]
+        self.projection_region = ""
+        self.min_distance = 0.0
+        self.output_mode = "instances"
+        self.seed = 0
+        self.density_map = ""
+        self.map_scale_influence = 0.0
+        self.map_rotation_influence = 0.0
+        self.cull_overlaps = False
+        self.use_proxies = False
+        self.proxy_type = "box"
+        self.display_mode = "proxy"
+        self.lod_distance = 50.0
+        self.group_size = 500
+        self.export_layers = False
+        self.layer_task = scatter_layers.LAYER_TASK
+        self.lod_camera = None
+        self.lod_library = None
+        self._proxied_scatter = None
+        self._last_scatter = None
+        self._last_layer = None
+        self.workers = multiprocessing.cpu_count()
+        self._pool = None
+        self.profiling = False
+        self.trace_memory = False
+        self.profile_path = None
+        self.cache_path = None
+        self.last_points = 0
+        self.last_profile = None
+        self._profile = None
+        self.preview_node = None
+        self._preview_emitter = None
+        self._results = {}
+        self.mesh_backend = meshcache.MeshCache(
+            meshdata.OpenMayaMeshBackend())
+
+    def close(self):
+        """Releases the mesh change tracking and worker processes held by
+        the tool. The tool can still be used afterwards; both start again
+        when next needed."""
+        self.mesh_backend.release()
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
 
     def set_scatter_obj(self):
         selection = cmds.ls(sl=True, transforms=True)
@@ -410,172 +1001,691 @@ class ScatterTool(object):
             self.scatter_objs = selection
         else:
             self.scatter_objs = []
+        self.obj_weights = [1.0] * len(self.scatter_objs)
 
     def set_scatter_targets(self):
-        """Retrieves vertices from object after setting scatter target."""
+        """Retrieves target objects and per-mesh vertex index arrays from
+        the selection, keeping component ranges unflattened."""
+        self.set_targets(cmds.ls(orderedSelection=True))
+
+    def set_targets(self, items):
+        """Sets the targets from object and component names.
+
+        Args:
+            items: Mesh transforms and component names such as
+                "ground.vtx[0:99]" or "ground.f[4]".
+        """
         obj_targets = []
-        vert_targets = cmds.ls(orderedSelection=True, flatten=True)
-        cmds.filterExpand(vert_targets, selectionMask=31, expand=True)
-        for obj in vert_targets[:]:
-            if "vtx[" not in obj:
-                obj_targets.append(obj)
-                vert_targets.remove(obj)
+        components = []
+        for item in items:
+            if "." in item:
+                components.append(item)
+            else:
+                obj_targets.append(item)
+        vert_targets = []
+        if components:
+            vert_targets = cmds.polyListComponentConversion(
+                components, toVertex=True) or []
         self.target_objs = obj_targets
-        self.target_verts = vert_targets
+        self.target_verts = meshdata.parse_vertex_selection(vert_targets)
+
+    def invalidate(self, stage):
+        """Discards the cached result of a stage and every later stage."""
+        for later in STAGES[STAGES.index(stage):]:
+            self._results.pop(later, None)
 
     def scatter(self):
-        """Scatters the target object across vertices list.
+        """Streams the targets through every stage and scatters the
+        objects across them.
+
+        If cache_path is set, the placements are also written there as a
+        point cache. With use_proxies, the objects are instanced through
+        proxy swap groups shown according to display_mode. When profiling
+        is on, the run's stage times, host command counts, memory and
+        throughput are printed to the Script Editor, kept in last_profile
+        and, if profile_path is set, written there as JSON. trace_memory
+        adds the peak Python memory of the run, at some cost in speed.
 
         Return:
             String: The group name of the scattered objects.
         """
-        vertices = self.target_verts[:]
-        for obj in self.target_objs[:]:
-            vertices += cmds.ls(obj + ".vtx[*]", flatten=True)
-        if self.scatter_density < 1.0:
-            vertices = self._sample_vertices(vertices)
-        obj_counts = []
-        if 100 not in self.obj_proportions:
-            for idx in range(len(self.obj_proportions)):
-                count = int(self.obj_proportions[idx] / 100 * len(vertices))
-                obj_counts.append(count)
-            vertices = random.sample(vertices, len(vertices))
-        self._instance_scatter_objects(vertices, obj_counts)
-
-    def _instance_scatter_objects(self, verts, counts):
-        scattered = []
-        obj_idx = 0
-        instance_no = 1
-        scale = cmds.getAttr("{}.scale".format(self.scatter_objs[obj_idx]))[0]
-        for vert in verts:
-            if counts and instance_no > counts[obj_idx] \
-                    and obj_idx < len(self.scatter_objs) - 1:
-                obj_idx += 1
-                instance_no = 1
-                scale = cmds.getAttr(
-                    "{}.scale".format(self.scatter_objs[obj_idx]))[0]
-            instance = cmds.instance(self.scatter_objs[obj_idx])
-            self._apply_transforms(instance[0], vert, scale)
-            scattered.append(instance[0])
-            instance_no += 1
-        return cmds.group(scattered, name="scattered_grp")
-
-    def _sample_vertices(self, vert_list):
-        """Samples a percentage of vertices stored by the instance.
+        if not self.profiling:
+            return self._emit_scatter()
+        profile = self.start_profile()
+        try:
+            with self.profiled(profile):
+                group = self._emit_scatter()
+        finally:
+            self.stop_profile(profile, report=False)
+        self.report_profile(profile)
+        return group
+
+    def start_profile(self):
+        """Starts profiling a scatter run if profiling is on.
+
+        Return:
+            ScatterProfile: The started profile, or None.
+        """
+        if not self.profiling:
+            return None
+        profile = profiling.ScatterProfile(trace_memory=self.trace_memory)
+        profile.start()
+        return profile
+
+    @contextlib.contextmanager
+    def profiled(self, profile, stage=None):
+        """Counts the host calls made in the block into profile, timing
+        the block as stage if given. Runs spread over several event loop
+        iterations enter this once per iteration. Without a profile, the
+        block runs as is."""
+        if profile is None:
+            yield
+            return
+        previous, self._profile = self._profile, profile
+        try:
+            with profile.counting(*self._profiled_modules()):
+                if stage is None:
+                    yield
+                else:
+                    with profile.timer(stage):
+                        yield
+        finally:
+            self._profile = previous
+
+    def stop_profile(self, profile, report=True):
+        """Stops a profile and keeps it as last_profile, reporting it if
+        the run succeeded."""
+        profile.stop()
+        self.last_profile = profile
+        if report:
+            self.report_profile(profile)
+
+    def report_profile(self, profile):
+        """Prints a profile to the Script Editor and writes it to
+        profile_path if set."""
+        for line in profile.summary():
+            MGlobal.displayInfo(line)
+        if self.profile_path:
+            profile.save(self.profile_path)
+
+    @staticmethod
+    def _profiled_modules():
+        """Returns the scatter modules whose host calls a profile
+        counts."""
+        return [sys.modules[__name__], scatter_output, lod, meshdata,
+                scatter_layers]
+
+    def _emit_scatter(self):
+        run = self.start_scatter()
+        if self._profile is None:
+            group = run.run()
+        else:
+            with self._profile.timer("emit"):
+                group = run.run()
+        self.last_points = run.points
+        return group
+
+    def start_scatter(self):
+        """Prepares a scatter of the current settings without running it.
+
+        Every mesh and scene value is read here, so iterating the returned
+        run's batches never calls into Maya and may happen on a worker
+        thread, while its scene edits stay on the main thread.
+
+        Return:
+            ScatterRun: The prepared scatter.
+        """
+        if self.export_layers and self.use_proxies:
+            raise ValueError("Scatter layers can't be exported with proxies, "
+                             "since the proxy swap groups stay in the shot.")
+        targets = self._read_targets()
+        clouds = self._open_clouds()
+        run = ScatterRun(total=self._candidate_count(targets, clouds),
+                         profile=self._profile)
+        batches = self._transform_batches(
+            self._sample_batches(run.track(
+                self._source_batches(targets, clouds))),
+            cancelled=run.is_stopped)
+        if self._profile is not None:
+            batches = self._profile.count_points(batches)
+        if self.cache_path:
+            writer = pointcache.CacheWriter(self.scatter_objs, self.seed,
+                                            self.settings())
+            batches = writer.record(batches)
+            cache_path = self.cache_path
+            run.on_finish(lambda group: writer.save(cache_path))
+        if self.export_layers:
+            run.export = self._export_layer
+        return self._prepare_run(self.scatter_objs, batches, run=run,
+                                 bounds=self._target_bounds(targets)
+                                 if self._groups_spatially() else None)
+
+    def _prepare_run(self, prototypes, batches, name="scattered_grp",
+                     run=None, bounds=None):
+        """Sets up the emitter for placements of the given prototypes,
+        through the proxy swap groups when use_proxies is on.
+
+        Args:
+            bounds: The lower and upper corners enclosing every placement,
+                used to group instances spatially by group_size.
 
         Return:
-            List: A list of strings representing Maya vertex nodes.
+            ScatterRun: The prepared scatter.
         """
-        sample_size = int(len(vert_list) * self.scatter_density)
-        sampled = random.sample(vert_list, sample_size)
-        return sampled
-
-    def _apply_transforms(self, instance, vertex, scale):
-        """Tests modifier conditions and applies transformations to the
-        instanced object"""
-        pos = cmds.pointPosition(vertex, world=True)
-        cmds.select(instance, r=True)
-        cmds.move(pos[0], pos[1], pos[2], a=True)
-        if self.align is True:
-            matrix = self._align_to_normals(vertex, pos)
-            cmds.select(instance, r=True)
-            cmds.xform(ws=True, m=matrix)
-        if self.scale_range[0] < 1.0 or self.scale_range[1] > 1.0:
-            scale = self._random_scale(scale)
-        cmds.setAttr("{}.scale".format(instance), scale[0], scale[1], scale[2])
-        extra_rot = self._random_marginal_rotation()
-        cmds.rotate(extra_rot[0], extra_rot[1], extra_rot[2],
-                    instance, os=True, r=True)
-
-    def _align_to_normals(self, vertex, position):
-        """Angles an object based on the position and normals of a vertex.
+        if run is None:
+            run = ScatterRun()
+        if self.use_proxies:
+            library = self._lod_library(prototypes)
+            placements = []
+            batches = library.assign(self._record(batches, placements),
+                                     self._lod_camera(), self.lod_distance)
+            prototypes = library.prototypes
+            run.on_finish(functools.partial(self._set_proxied_scatter,
+                                            placements=placements))
+        run.emitter = scatter_output.OUTPUT_MODES[self.output_mode](
+            self.group_size, bounds)
+        run.prototypes = prototypes
+        run.batches = batches
+        run.name = name
+        run.on_finish(functools.partial(self._set_last_scatter, run=run))
+        return run
+
+    def _set_proxied_scatter(self, group, placements):
+        self._proxied_scatter = (group, placements)
+
+    def _set_last_scatter(self, group, run):
+        self._last_scatter = (group, run.emitter)
+        self._last_layer = None
+
+    def _export_layer(self, group, reference_node=None):
+        """Moves a finished scatter into its own layer file and references
+        it back in.
 
         Return:
-            List: A 16 item list representing a [4][4] transformation matrix.
+            String: The referenced group of the scattered objects.
         """
-        cmds.select(vertex, r=True)
-        vtx_normals = cmds.polyNormalPerVertex(q=True, xyz=True)
-        avg_normal = self.average_normals(vtx_normals)
-        avg_normal = MVector(
-            avg_normal[0], avg_normal[1], avg_normal[2]).normal()
-        parent_shape = cmds.listRelatives(vertex, parent=True)[0]
-        parent_transform = cmds.listRelatives(parent_shape, parent=True)[0]
-        parent_matrix = cmds.xform(parent_transform, q=True, m=True, ws=True)
-        world_normal = self.world_normal_from_local(avg_normal, parent_matrix)
-        transform_matrix = self.get_matrix_from_normal(
-            world_normal, position, parent_matrix)
-        return transform_matrix
-
-    def _random_marginal_rotation(self):
-        """Generates random rotation to apply on three axes.
+        layer_group, self._last_layer, _ = scatter_layers.export_layer(
+            group, self.layer_task, reference_node)
+        self._last_scatter = None
+        return layer_group
+
+    def update_scatter(self):
+        """Brings the last scatter in line with the current settings,
+        adding and deleting only the instances that changed. Every point
+        keeps its placement at any density, so raising the density only
+        adds instances and lowering it only deletes some, except with
+        cull_overlaps: a new instance can then cull one kept before, and a
+        deleted one can let another back in. Scatters that can't be
+        updated in place are scattered anew. With export_layers,
+        the last scatter's layer reference is pointed at the new version.
 
         Return:
-            List: A 3 item list representing xyz rotation values in degrees.
+            String: The group name of the scattered objects.
         """
-        offset_x = random.uniform(self.rot_range_x[0], self.rot_range_x[1])
-        offset_y = random.uniform(self.rot_range_y[0], self.rot_range_y[1])
-        offset_z = random.uniform(self.rot_range_z[0], self.rot_range_z[1])
-        return [offset_x, offset_y, offset_z]
-
-    def _random_scale(self, current_scale):
-        """Generates a random sc"""
-        new_scale = [1.0, 1.0, 1.0]
-        ran_scale = random.uniform(self.scale_range[0], self.scale_range[1])
-        for counter in range(len(current_scale)):
-            new_scale[counter] = current_scale[counter] * ran_scale
-        return new_scale
+        run = self.start_scatter()
+        if run.export is not None:
+            run.export = functools.partial(self._export_layer,
+                                           reference_node=self._last_layer)
+        if self._last_scatter is not None:
+            group, emitter = self._last_scatter
+            if run.sync(emitter, group):
+                return group
+        return run.run()
+
+    @staticmethod
+    def _record(batches, placements):
+        """Keeps what is needed to emit each batch again: its index, slots,
+        scatter object indices and float32 matrices, about a third of the
+        memory of the batch itself."""
+        for batch in batches:
+            placements.append((batch.index, batch.slots.astype(np.int32),
+                               batch.candidates,
+                               batch.obj_indices.astype(np.int32),
+                               batch.matrices.astype(np.float32)))
+            yield batch
 
     @staticmethod
-    def average_normals(normal_list):
-        """Calculates the average normal of a set of normal values given in
-        a successive list
+    def _replay(placements):
+        """Rebuilds batches ready to emit from recorded placements."""
+        for index, slots, candidates, obj_indices, matrices in placements:
+            matrices = matrices.astype(np.float64)
+            yield scatter_pipeline.PointBatch(
+                index, matrices[:, 3, :3], matrices[:, 1, :3],
+                np.broadcast_to(np.identity(4), (len(matrices), 4, 4)),
+                obj_indices=obj_indices, matrices=matrices, slots=slots,
+                candidates=candidates)
+
+    def _lod_library(self, prototypes):
+        """Returns proxy swap groups for the prototypes, building them when
+        missing or out of date."""
+        library = self.lod_library
+        if library is None or not library.exists() \
+                or library.scatter_objs != list(prototypes) \
+                or library.proxy_type != self.proxy_type:
+            library = lod.LodLibrary(prototypes, self.proxy_type)
+            library.display_mode = self.display_mode
+            with scatter_output.undo_chunk("scatter proxies"), \
+                    scatter_output.preserved_selection():
+                library.build()
+            self.lod_library = library
+        return library
+
+    def _lod_camera(self):
+        if self.display_mode != "lod":
+            return None
+        return lod.camera_position(self.lod_camera)
+
+    def set_display_mode(self, mode):
+        """Switches proxied scatters between full, proxy and distance LOD
+        display. Placements are never changed."""
+        self.display_mode = mode
+        if self.lod_library is None or not self.lod_library.exists():
+            return
+        with scatter_output.undo_suspended():
+            self.lod_library.set_display_mode(mode)
+        if mode == "lod":
+            self.refresh_lod()
+
+    def refresh_lod(self):
+        """Reassigns near and far prototypes of the last proxied scatter
+        from the current camera position, rebuilding it with the same
+        placements.
 
         Return:
-            List: A list of normal values x, y, and z"""
-        normal_xyz = []
-        for outer_count in range(3):
-            dir_sum = 0
-            dir_count = len(normal_list) // 3
-            for inner_count in range(dir_count):
-                coord_iterator = outer_count + (3 * inner_count)
-                dir_sum += normal_list[coord_iterator]
-            normal_xyz.append(dir_sum / dir_count)
-        return normal_xyz
+            String: The group name of the scattered objects.
+        """
+        if self._proxied_scatter is None:
+            return None
+        group, placements = self._proxied_scatter
+        if not cmds.objExists(group):
+            self._proxied_scatter = None
+            return None
+        bounds = None
+        if self._groups_spatially():
+            bounds = grouping.point_bounds(np.concatenate(
+                [matrices[:, 3, :3] for _, _, _, _, matrices in placements]
+                or [np.empty((0, 3))]))
+        run = self._prepare_run(self.lod_library.scatter_objs,
+                                self._replay(placements),
+                                name=group.split("|")[-1], bounds=bounds)
+        if self._last_scatter is not None \
+                and self._last_scatter[0] == group \
+                and run.sync(self._last_scatter[1], group):
+            return group
+        with scatter_output.undo_chunk("scatter lod"):
+            cmds.delete(group)
+            return run.run()
 
-    @staticmethod
-    def get_matrix_from_normal(normal_xyz, position, parent_mat):
-        """Converts averaged normal vectors to rotation eulers
+    def scatter_from_cache(self, path):
+        """Rebuilds a scatter from a point cache without recomputing any
+        placement. The cache's arrays are mapped from disk, not read.
+
+        Return:
+            String: The group name of the scattered objects.
+        """
+        cache = pointcache.PointCache(path)
+        missing = [obj for obj in cache.prototypes if not cmds.objExists(obj)]
+        if missing:
+            raise ValueError("Cached scatter objects are missing from the "
+                             "scene: {}".format(", ".join(missing)))
+        bounds = None
+        if self._groups_spatially():
+            bounds = grouping.point_bounds(cache.matrices[:, 3, :3])
+        return self._prepare_run(cache.prototypes, cache.batches(),
+                                 bounds=bounds).run()
+
+    def settings(self):
+        """Returns the scatter settings as plain values.
+
+        Return:
+            dict: Setting name to value for every name in SETTINGS.
+        """
+        return dict((name, getattr(self, name)) for name in SETTINGS)
+
+    def apply_settings(self, settings):
+        """Sets every known setting present in settings."""
+        for name in SETTINGS:
+            if name in settings:
+                setattr(self, name, settings[name])
+
+    def _stage(self, batches, name):
+        """Times a stage when a profiled scatter is running."""
+        if self._profile is None:
+            return batches
+        return self._profile.stage(batches, name)
+
+    def preview(self):
+        """Updates the preview scatter, re-running only the stages that
+        were invalidated since the last preview.
+
+        Return:
+            String: The group name of the preview objects.
+        """
+        self._run_stages()
+        batches = self._results["modify"]
+        emitter = scatter_output.OUTPUT_MODES[self.output_mode]()
+        with scatter_output.undo_suspended(), \
+                scatter_output.preserved_selection():
+            if (isinstance(self._preview_emitter, type(emitter))
+                    and self._preview_emitter.sync(
+                        self.scatter_objs, batches, self.preview_node)):
+                return self.preview_node
+            self.clear_preview()
+            self.preview_node = emitter.emit(
+                self.scatter_objs, batches, name="scatter_preview_grp")
+            self._preview_emitter = emitter
+        return self.preview_node
+
+    def clear_preview(self):
+        """Deletes the preview scatter, if any."""
+        if self.preview_node and cmds.objExists(self.preview_node):
+            with scatter_output.undo_suspended():
+                cmds.delete(self.preview_node)
+        self.preview_node = None
+
+    def _run_stages(self):
+        """Materializes each stale stage so the preview can reuse it."""
+        if "source" not in self._results:
+            self._results["source"] = list(self._source_batches(
+                self._read_targets(), self._open_clouds()))
+        if "sample" not in self._results:
+            self._results["sample"] = list(
+                self._sample_batches(iter(self._results["source"])))
+        if "modify" not in self._results:
+            self._results["modify"] = list(
+                self._transform_batches(iter(self._results["sample"]),
+                                        workers=1))
+
+    def _read_targets(self):
+        """Reads every target mesh, once.
 
         Return:
-            List: A list representing a [4][4] matrix
+            list: (MeshData, indices) pairs.
         """
-        local_y = parent_mat[4:7]
-        tangent_1 = cross(normal_xyz, local_y)
-        tangent_1 = MVector(tangent_1[0], tangent_1[1], tangent_1[2]).normal()
-        tangent_2 = cross(normal_xyz, tangent_1)
-        tangent_2 = MVector(tangent_2[0], tangent_2[1], tangent_2[2]).normal()
-        matrix = [tangent_2[0], tangent_2[1], tangent_2[2], 0.0,
-                  normal_xyz[0], normal_xyz[1], normal_xyz[2], 0.0,
-                  tangent_1[0], tangent_1[1], tangent_1[2], 0.0,
-                  position[0], position[1], position[2], 1.0]
-        return matrix
+        if self._profile is None:
+            return meshdata.gather_meshes(
+                self.mesh_backend, self.target_objs, self.target_verts)
+        with self._profile.timer("read_meshes"):
+            return meshdata.gather_meshes(
+                self.mesh_backend, self.target_objs, self.target_verts)
+
+    def _open_clouds(self):
+        """Opens every point cloud target without reading its points.
+
+        Return:
+            list: pointcloud clouds, in the order of point_clouds.
+        """
+        return [pointcloud.open_cloud(path) for path in self.point_clouds]
 
     @staticmethod
-    def world_normal_from_local(normal, parent_mat):
-        """Converts a normal vector to world space
+    def _target_bounds(targets):
+        """Returns the world space box enclosing every target mesh, or None
+        without any. Point clouds are left out so they are never read
+        ahead of the scatter; the octree grows to take in their points."""
+        if not targets:
+            return None
+        return grouping.point_bounds(np.concatenate(
+            [mesh.world_points() for mesh, indices in targets]))
+
+    def _groups_spatially(self):
+        """Whether the output groups instances into octree cells and so
+        makes use of scatter bounds."""
+        return self.output_mode == "instances" and self.group_size > 0
+
+    def _candidate_count(self, targets, clouds=()):
+        """Returns about how many candidate points the source stages will
+        yield. Text clouds are only estimated, so progress may finish early
+        or late."""
+        count = sum(cloud.estimated_count() for cloud in clouds)
+        if self.sample_mode in ("surface", "projection"):
+            return count + (self.point_count if targets else 0)
+        return count + sum(len(mesh) if indices is None else len(indices)
+                           for mesh, indices in targets)
+
+    def _source_batches(self, targets, clouds=()):
+        """Yields the candidate points of the target meshes, followed by
+        every point of the point clouds."""
+        batches = self._mesh_batches(targets)
+        if clouds:
+            batches = itertools.chain(batches, self._stage(
+                scatter_pipeline.cloud_source(clouds), "cloud_source"))
+        return batches
+
+    def _mesh_batches(self, targets):
+        """Yields candidate points from the target meshes according to the
+        sample mode."""
+        weight_maps = None
+        if self.density_map:
+            weight_maps = [
+                self.mesh_backend.read_weights(mesh.name, self.density_map)
+                for mesh, indices in targets]
+        if self.sample_mode == "surface":
+            samplers = [sampling.SurfaceSampler.for_target(mesh, indices)
+                        for mesh, indices in targets]
+            return self._stage(scatter_pipeline.surface_source(
+                samplers, self.point_count, self.seed,
+                weight_maps=weight_maps), "surface_source")
+        if self.sample_mode == "projection":
+            bvhs = [raycast.TriangleBVH.for_target(mesh, indices)
+                    for mesh, indices in targets]
+            return self._stage(scatter_pipeline.projection_source(
+                bvhs, self.point_count, self.seed,
+                self._projection_bounds(targets), self.projection_dir,
+                weight_maps=weight_maps), "projection_source")
+        return self._stage(scatter_pipeline.vertex_source(
+            targets, weight_maps=weight_maps), "vertex_source")
+
+    def _projection_bounds(self, targets):
+        """Returns the box rays are cast through: the world bounding box of
+        projection_region if set, else the targets' bounds padded slightly
+        so flat targets are still crossed.
 
         Return:
-            List: a list representing a normal vector
+            tuple: The (3,) lower and upper world space corners.
+        """
+        if self.projection_region:
+            bounds = np.array(cmds.xform(self.projection_region, query=True,
+                                         boundingBox=True, worldSpace=True))
+            return bounds[:3], bounds[3:]
+        bounds = self._target_bounds(targets)
+        if bounds is None:
+            return np.zeros(3), np.zeros(3)
+        lower, upper = bounds
+        padding = 1e-3 * (np.linalg.norm(upper - lower) + 1.0)
+        return lower - padding, upper + padding
+
+    def _sample_batches(self, batches):
+        """Thins the candidates by spacing and density and assigns a scatter
+        object to each kept point."""
+        batches = self._stage(scatter_pipeline.spacing_stage(
+            batches, self.min_distance, self.seed), "spacing")
+        batches = self._stage(scatter_pipeline.density_stage(
+            batches, self.scatter_density, self.seed), "density")
+        weights = self.obj_weights
+        if len(weights) != len(self.scatter_objs):
+            weights = [1.0] * len(self.scatter_objs)
+        return self._stage(scatter_pipeline.assign_stage(
+            batches, weights, self.seed), "assign")
+
+    def _transform_batches(self, batches, workers=None, cancelled=None):
+        """Computes the instance matrices of every batch, split across the
+        worker pool, and culls overlapping instances if enabled.
+
+        Args:
+            workers: Overrides the tool's worker count; one computes on
+                the calling process without the pool.
+            cancelled: An optional function that stops the computation
+                once it returns True.
+        """
+        base_scales = np.array(
+            [cmds.getAttr("{}.scale".format(obj))[0]
+             for obj in self.scatter_objs])
+        rot_ranges = [self.rot_range_x, self.rot_range_y, self.rot_range_z]
+        params = placement.PlacementParams(
+            rot_ranges, self.scale_range, self.align,
+            scale_influence=self.map_scale_influence,
+            rotation_influence=self.map_rotation_influence)
+        if workers is None:
+            workers = self.workers
+        batches = self._stage(scatter_pipeline.transform_stage(
+            batches, base_scales, params, self.seed, workers=workers,
+            pool=self._worker_pool() if workers > 1 else None,
+            cancelled=cancelled), "transform")
+        if not self.cull_overlaps:
+            return batches
+        radii = self._bounding_radii()
+        max_radius = (radii * np.abs(base_scales).max(axis=1)).max() \
+            * max(np.abs(self.scale_range))
+        return self._stage(scatter_pipeline.overlap_stage(
+            batches, radii, max_radius), "overlap")
+
+    def _worker_pool(self):
+        """Returns the tool's worker pool, replacing it if the worker count
+        changed."""
+        if self._pool is not None and self._pool.workers != self.workers:
+            self._pool.close()
+            self._pool = None
+        if self._pool is None:
+            self._pool = placement.WorkerPool(self.workers)
+        return self._pool
+
+    def _bounding_radii(self):
+        """Returns the radius around its pivot that encloses each scatter
+        object's object space bounding box.
+
+        Return:
+            ndarray: An (N,) array of radii, one per scatter object.
+        """
+        radii = []
+        for obj in self.scatter_objs:
+            bounds = np.array(cmds.xform(obj, query=True, boundingBox=True,
+                                         objectSpace=True)).reshape(2, 3)
+            radii.append(np.linalg.norm(np.abs(bounds).max(axis=0)))
+        return np.array(radii)
+
+
+class ScatterRun(object):
+    """A scatter split into computing placements and writing them.
+
+    Iterating batches computes placements without touching the scene, so it
+    may happen on a worker thread, and stop ends it early from any thread.
+    begin, add, finish and cancel edit the scene and must run on the main
+    thread. The scatter is built with undo suspended, and finish registers
+    its group as a single undo step that deletes it, so the undo queue
+    holds one entry however many points are placed and however many event
+    loop iterations the edits are spread over. An export function, if set,
+    is handed the finished group and returns the group that replaces it,
+    such as a referenced copy. Callers run finish in an undo chunk so the
+    export joins the same step. profile is the ScatterProfile the batches
+    report to, if the run is profiled.
+    """
+    def __init__(self, emitter=None, prototypes=None, batches=None,
+                 name="scattered_grp", total=0, profile=None):
+        self.emitter = emitter
+        self.prototypes = prototypes
+        self.batches = batches
+        self.name = name
+        self.total = total
+        self.profile = profile
+        self.done = 0
+        self.points = 0
+        self.export = None
+        self._stopped = False
+        self._finishers = []
+        self._edit = scatter_output.SceneEdit("scatter")
+
+    @property
+    def progress(self):
+        """The share of candidate points computed so far, from 0 to 1."""
+        if not self.total:
+            return 0.0
+        return min(float(self.done) / self.total, 1.0)
+
+    def track(self, batches):
+        """Counts candidate points as the source yields them, ending the
+        source once the run is stopped."""
+        for batch in batches:
+            if self._stopped:
+                return
+            self.done += len(batch)
+            yield batch
+
+    def stop(self):
+        """Makes the batches end as soon as the stages notice."""
+        self._stopped = True
+
+    def is_stopped(self):
+        return self._stopped
+
+    def on_finish(self, func):
+        """Calls func with the group name once the run finishes."""
+        self._finishers.append(func)
+
+    def begin(self):
+        with scatter_output.undo_suspended():
+            self.emitter.begin(self.prototypes, self.name)
+
+    def add(self, batch):
+        with scatter_output.undo_suspended():
+            self.emitter.add(batch)
+        self.points += len(batch)
+
+    def finish(self):
+        """Completes the scene edits and registers them as one undo step.
+
+        Return:
+            String: The group name of the scattered objects.
+        """
+        try:
+            with scatter_output.undo_suspended():
+                group = self.emitter.finish()
+            scatter_output.register_undo(group)
+        except Exception:
+            self.cancel()
+            raise
+        for func in self._finishers:
+            func(group)
+        if self.export is not None:
+            group = self.export(group)
+        return group
+
+    def cancel(self):
+        """Stops the run and removes everything it has added to the
+        scene."""
+        self.stop()
+        with scatter_output.undo_suspended():
+            self.emitter.discard()
+
+    def sync(self, emitter, group):
+        """Brings a scatter made by emitter in line with this run instead
+        of creating a new one.
+
+        Return:
+            bool: False if the scatter can't be updated in place, in which
+                case nothing is changed and the run can still be run.
+        """
+        if type(emitter) is not type(self.emitter):
+            return False
+        with self._edit:
+            if not emitter.sync(self.prototypes, self.batches, group):
+                return False
+        self.emitter = emitter
+        for func in self._finishers:
+            func(group)
+        return True
+
+    def run(self):
+        """Computes and writes every batch on the calling thread.
+
+        Return:
+            String: The group name of the scattered objects.
         """
-        normal_str = "{0}, {1}, {2}".format(normal[0], normal[1], normal[2])
-        mel_code_1 = "{" + normal_str + "}"
-        matrix_str = ("{0},{1},{2},{3},{4},{5},{6},{7},"
-                      "{8},{9},{10},{11},{12},{13},{14},{15}")
-        matrix_str = matrix_str.format(
-            parent_mat[0], parent_mat[1], parent_mat[2], parent_mat[3],
-            parent_mat[4], parent_mat[5], parent_mat[6], parent_mat[7],
-            parent_mat[8], parent_mat[9], parent_mat[10], parent_mat[11],
-            parent_mat[12], parent_mat[13], parent_mat[14], parent_mat[15])
-        mel_code_2 = "{" + matrix_str + "}"
-        evaluation = mel.eval("pointMatrixMult " + mel_code_1 + mel_code_2)
-        return evaluation
+        with self._edit:
+            self.begin()
+            try:
+                for batch in self.batches:
+                    self.add(batch)
+            except BaseException:
+                self.cancel()
+                raise
+            return self.finish()
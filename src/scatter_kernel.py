@@ -0,0 +1,241 @@
+"""Vectorized placement math used by the scatter tool.
+
+All matrices follow Maya's row-vector convention: a transform is a (4, 4)
+array whose first three rows are the x, y and z axes and whose last row is
+the translation, matching the 16 item lists returned by cmds.xform.
+"""
+import numpy as np
+
+
+def as_matrix_array(matrices, count):
+    """Broadcasts one or many Maya matrices to an (N, 4, 4) array.
+
+    Return:
+        ndarray: An (N, 4, 4) float64 array of matrices.
+    """
+    matrices = np.asarray(matrices, dtype=np.float64)
+    if matrices.shape == (16,):
+        matrices = matrices.reshape(4, 4)
+    if matrices.ndim == 2 and matrices.shape[1] == 16:
+        matrices = matrices.reshape(-1, 4, 4)
+    return np.broadcast_to(matrices, (count, 4, 4))
+
+
+def normalize(vectors):
+    """Normalizes each row of an (N, 3) array, leaving zero rows as zero.
+
+    Return:
+        ndarray: An (N, 3) array of unit vectors.
+    """
+    vectors = np.asarray(vectors, dtype=np.float64)
+    lengths = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return np.divide(vectors, lengths, out=np.zeros_like(vectors),
+                     where=lengths > 0.0)
+
+
+def world_normals_from_local(normals, parent_matrices):
+    """Converts object space normals to world space directions.
+
+    Only the upper 3x3 of each parent matrix is applied, so the parent's
+    translation never leaks into the normal.
+
+    Return:
+        ndarray: An (N, 3) array of normalized world space normals.
+    """
+    normals = np.asarray(normals, dtype=np.float64)
+    matrices = as_matrix_array(parent_matrices, len(normals))
+    return normalize(np.einsum("ni,nij->nj", normals, matrices[:, :3, :3]))
+
+
+def matrices_from_normals(normals, positions, parent_matrices):
+    """Builds orientation matrices whose y axis follows each normal.
+
+    The z axis is perpendicular to both the normal and the parent's y axis,
+    falling back to the parent's x axis where the two are parallel.
+
+    Return:
+        ndarray: An (N, 4, 4) array of matrices.
+    """
+    normals = normalize(normals)
+    count = len(normals)
+    parents = as_matrix_array(parent_matrices, count)
+    tangent_1 = np.cross(normals, parents[:, 1, :3])
+    degenerate = np.linalg.norm(tangent_1, axis=1) < 1e-8
+    if degenerate.any():
+        tangent_1[degenerate] = np.cross(normals[degenerate],
+                                         parents[degenerate, 0, :3])
+    tangent_1 = normalize(tangent_1)
+    tangent_2 = normalize(np.cross(normals, tangent_1))
+    matrices = np.zeros((count, 4, 4))
+    matrices[:, 0, :3] = tangent_2
+    matrices[:, 1, :3] = normals
+    matrices[:, 2, :3] = tangent_1
+    matrices[:, 3, :3] = positions
+    matrices[:, 3, 3] = 1.0
+    return matrices
+
+
+def translation_matrices(positions):
+    """Builds pure translation matrices.
+
+    Return:
+        ndarray: An (N, 4, 4) array of matrices.
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    matrices = np.zeros((len(positions), 4, 4))
+    matrices[:, [0, 1, 2, 3], [0, 1, 2, 3]] = 1.0
+    matrices[:, 3, :3] = positions
+    return matrices
+
+
+def rotation_matrices(rotations):
+    """Converts xyz euler rotations in degrees to rotation matrices.
+
+    The result matches Maya's default xyz rotate order.
+
+    Return:
+        ndarray: An (N, 3, 3) array of rotation matrices.
+    """
+    radians = np.radians(np.asarray(rotations, dtype=np.float64))
+    cos = np.cos(radians)
+    sin = np.sin(radians)
+    count = len(radians)
+    rot_x = np.zeros((count, 3, 3))
+    rot_x[:, 0, 0] = 1.0
+    rot_x[:, 1, 1] = cos[:, 0]
+    rot_x[:, 1, 2] = sin[:, 0]
+    rot_x[:, 2, 1] = -sin[:, 0]
+    rot_x[:, 2, 2] = cos[:, 0]
+    rot_y = np.zeros((count, 3, 3))
+    rot_y[:, 1, 1] = 1.0
+    rot_y[:, 0, 0] = cos[:, 1]
+    rot_y[:, 0, 2] = -sin[:, 1]
+    rot_y[:, 2, 0] = sin[:, 1]
+    rot_y[:, 2, 2] = cos[:, 1]
+    rot_z = np.zeros((count, 3, 3))
+    rot_z[:, 2, 2] = 1.0
+    rot_z[:, 0, 0] = cos[:, 2]
+    rot_z[:, 0, 1] = sin[:, 2]
+    rot_z[:, 1, 0] = -sin[:, 2]
+    rot_z[:, 1, 1] = cos[:, 2]
+    return np.matmul(np.matmul(rot_x, rot_y), rot_z)
+
+
+def random_rotations(count, rot_range_x, rot_range_y, rot_range_z, rng):
+    """Generates random xyz rotation offsets within the given ranges.
+
+    Return:
+        ndarray: An (N, 3) array of rotations in degrees.
+    """
+    low = [rot_range_x[0], rot_range_y[0], rot_range_z[0]]
+    high = [rot_range_x[1], rot_range_y[1], rot_range_z[1]]
+    return rng.uniform(low, high, size=(count, 3))
+
+
+def random_scales(count, scale_range, rng):
+    """Generates one random uniform scale factor per point.
+
+    Return:
+        ndarray: An (N,) array of scale factors.
+    """
+    return rng.uniform(scale_range[0], scale_range[1], size=count)
+
+
+def compose_matrices(positions, normals, parent_matrices, rotations, scales,
+                     align=True):
+    """Combines placement, orientation, rotation and scale per point.
+
+    Args:
+        positions: An (N, 3) array of world space positions.
+        normals: An (N, 3) array of object space normals.
+        parent_matrices: One (4, 4) matrix or an (N, 4, 4) array of world
+            matrices of the meshes the points belong to.
+        rotations: An (N, 3) array of extra xyz rotations in degrees,
+            applied in object space.
+        scales: An (N, 3) array of final xyz scale values.
+        align: Orients the y axis of each instance to its normal if True.
+
+    Return:
+        ndarray: An (N, 4, 4) array of world space instance matrices.
+    """
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    count = len(positions)
+    if align:
+        world_normals = world_normals_from_local(normals, parent_matrices)
+        placement = matrices_from_normals(world_normals, positions,
+                                          parent_matrices)
+    else:
+        placement = translation_matrices(positions)
+    local = rotation_matrices(rotations) * np.asarray(
+        scales, dtype=np.float64).reshape(count, 3)[:, :, np.newaxis]
+    matrices = placement.copy()
+    matrices[:, :3, :3] = np.matmul(local, placement[:, :3, :3])
+    return matrices
+
+
+def instance_matrices(positions, normals, parent_matrices, base_scales,
+                      rot_ranges, scale_range, rng, align=True,
+                      scale_factors=None, rotation_factors=None, slots=None,
+                      slot_count=None):
+    """Computes final instance matrices with random modifiers applied.
+
+    Args:
+        positions: An (N, 3) array of world space positions.
+        normals: An (N, 3) array of object space normals.
+        parent_matrices: One (4, 4) matrix or an (N, 4, 4) array.
+        base_scales: An (N, 3) array of the scatter objects' own scale.
+        rot_ranges: Three [min, max] rotation ranges for x, y and z.
+        scale_range: A [min, max] random scale range.
+        rng: A numpy RandomState drawing the random modifiers.
+        align: Orients each instance to its normal if True.
+        scale_factors: An optional (N,) multiplier of each random scale.
+        rotation_factors: An optional (N,) multiplier of each random
+            rotation.
+        slots: An optional (N,) index of each point among slot_count
+            candidates. Modifiers are then drawn for every candidate and
+            picked by slot, so they don't depend on which candidates were
+            kept.
+
+    Return:
+        ndarray: An (N, 4, 4) array of world space instance matrices.
+    """
+    count = len(positions)
+    draws = count if slots is None else slot_count
+    rotations = random_rotations(draws, rot_ranges[0], rot_ranges[1],
+                                 rot_ranges[2], rng)
+    random_scale = random_scales(draws, scale_range, rng)
+    if slots is not None:
+        rotations = rotations[slots]
+        random_scale = random_scale[slots]
+    if rotation_factors is not None:
+        rotations *= np.asarray(rotation_factors)[:, np.newaxis]
+    if scale_factors is not None:
+        random_scale *= scale_factors
+    scales = np.asarray(base_scales, dtype=np.float64).reshape(count, 3) \
+        * random_scale[:, np.newaxis]
+    return compose_matrices(positions, normals, parent_matrices, rotations,
+                            scales, align)
+
+
+def decompose_matrices(matrices):
+    """Splits matrices into xyz euler rotations and per-axis scale.
+
+    Assumes the upper 3x3 of each matrix is a rotation scaled along its rows,
+    as produced by compose_matrices.
+
+    Return:
+        tuple: (N, 3) rotations in degrees for Maya's xyz rotate order and
+            (N, 3) scale values.
+    """
+    matrices = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+    scales = np.linalg.norm(matrices[:, :3, :3], axis=2)
+    safe = np.where(scales > 0.0, scales, 1.0)
+    rot = matrices[:, :3, :3] / safe[:, :, np.newaxis]
+    sin_y = np.clip(-rot[:, 0, 2], -1.0, 1.0)
+    rot_y = np.arcsin(sin_y)
+    gimbal = np.abs(sin_y) > 1.0 - 1e-9
+    rot_x = np.where(gimbal, np.arctan2(-rot[:, 2, 1], rot[:, 1, 1]),
+                     np.arctan2(rot[:, 1, 2], rot[:, 2, 2]))
+    rot_z = np.where(gimbal, 0.0, np.arctan2(rot[:, 0, 1], rot[:, 0, 0]))
+    rotations = np.degrees(np.stack([rot_x, rot_y, rot_z], axis=1))
+    return rotations, scales
@@ -0,0 +1,101 @@
+"""Scatter layers: scatters moved out of the shot scene into their own
+scene files and referenced back in.
+
+A shot that holds its set dressing as references only stores the reference
+nodes, so saving and opening it stays fast however many instances the
+layers hold. Layer files follow the SceneFile convention,
+{descriptor}_{task}_v###, with the shot's descriptor and folder. The task is
+the layer task followed by the scatter group's name, so every layer keeps
+its own version sequence beside the shot's own versions, and updating a
+layer exports the next version of that layer alone.
+"""
+import logging
+import re
+
+import maya.cmds as cmds
+
+import scatter_output
+import smartsave
+
+log = logging.getLogger(__name__)
+
+LAYER_TASK = "scatter"
+
+_WORDS = re.compile(r"[A-Za-z0-9]+")
+
+
+def layer_file(task=LAYER_TASK):
+    """Returns the open scene's layer file. Its version is set when it is
+    exported.
+
+    Return:
+        SceneFile: The layer file, named after the open scene.
+    """
+    scene_file = smartsave.SceneFile()
+    scene_file.task = task
+    scene_file.folder_path.makedirs_p()
+    return scene_file
+
+
+def layer_task(group, task=LAYER_TASK):
+    """Returns the task of a new layer for group: task followed by the
+    group's short name, numbered if a layer of that name already exists.
+
+    SceneFile names can't hold underscores or a lowercase v in their
+    fields, so the group name is reduced to capitalized words of letters
+    and digits, with any v written as V.
+
+    Return:
+        String: The task of the new layer's files.
+    """
+    short_name = group.split("|")[-1].split(":")[-1]
+    name = task + "".join(word[:1].upper() + word[1:]
+                          for word in _WORDS.findall(short_name))
+    name = name.replace("v", "V")
+    candidate, number = name, 1
+    while layer_file(candidate).next_avail_ver() > 1:
+        number += 1
+        candidate = "{}{}".format(name, number)
+    return candidate
+
+
+def export_layer(group, task=LAYER_TASK, reference_node=None):
+    """Writes a scatter group to a new layer file version, deletes it from
+    the scene and references the file in its place.
+
+    Args:
+        group: The scatter group to move out of the scene.
+        task: The layer task that a new layer's name starts with, see
+            layer_task.
+        reference_node: The reference of an earlier version of the layer.
+            If it is still in the scene, the next version of its file is
+            exported and the reference is pointed at it rather than adding
+            a second reference.
+
+    Return:
+        tuple: The referenced group, the reference node and the path of
+            the layer file.
+    """
+    update = bool(reference_node) and cmds.objExists(reference_node)
+    if update:
+        scene_file = smartsave.SceneFile(cmds.referenceQuery(
+            reference_node, filename=True, withoutCopyNumber=True))
+    else:
+        scene_file = layer_file(layer_task(group, task))
+    with scatter_output.preserved_selection():
+        path = scene_file.export_increment(group)
+    cmds.delete(group)
+    if update:
+        nodes = cmds.file(path, loadReference=reference_node,
+                          returnNewNodes=True)
+    else:
+        nodes = cmds.file(path, reference=True, returnNewNodes=True,
+                          namespace="{}_{}".format(scene_file.descriptor,
+                                                   scene_file.task))
+        reference_node = cmds.referenceQuery(nodes[0], referenceNode=True)
+    short_name = group.split("|")[-1]
+    layer_group = next((node for node in nodes
+                        if node.split("|")[-1].split(":")[-1] == short_name),
+                       None)
+    log.info("Exported %s to %s", short_name, path)
+    return layer_group, reference_node, path
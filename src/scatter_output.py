@@ -0,0 +1,405 @@
+"""Ways of writing computed scatter placements into the Maya scene."""
+import contextlib
+import os
+
+import maya.cmds as cmds
+import numpy as np
+
+import grouping
+import scatter_kernel
+
+PLUGIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "scatter_plugin.py")
+
+
+@contextlib.contextmanager
+def undo_chunk(name):
+    """Groups every command run inside the block into one named undo step."""
+    cmds.undoInfo(openChunk=True, chunkName=name)
+    try:
+        yield
+    finally:
+        cmds.undoInfo(closeChunk=True)
+
+
+@contextlib.contextmanager
+def undo_suspended():
+    """Keeps the commands run inside the block out of the undo queue."""
+    enabled = cmds.undoInfo(query=True, state=True)
+    if enabled:
+        cmds.undoInfo(stateWithoutFlush=False)
+    try:
+        yield
+    finally:
+        if enabled:
+            cmds.undoInfo(stateWithoutFlush=True)
+
+
+def register_undo(nodes):
+    """Makes nodes created with undo suspended a single undo step, which
+    deletes them when undone and restores them when redone. Loads the
+    scatter plugin on first use.
+
+    Return:
+        list: The registered node names.
+    """
+    if not cmds.pluginInfo(PLUGIN_PATH, query=True, loaded=True):
+        cmds.loadPlugin(PLUGIN_PATH, quiet=True)
+    if not isinstance(nodes, (list, tuple)):
+        nodes = [nodes]
+    return cmds.scatterRegisterUndo(*nodes)
+
+
+class SceneEdit(object):
+    """An undo chunk that also restores the selection, split into open and
+    close calls so it can span several event loop iterations."""
+    def __init__(self, name):
+        self.name = name
+        self._selection = None
+
+    def open(self):
+        cmds.undoInfo(openChunk=True, chunkName=self.name)
+        self._selection = cmds.ls(orderedSelection=True, long=True)
+
+    def close(self):
+        try:
+            _restore_selection(self._selection)
+        finally:
+            cmds.undoInfo(closeChunk=True)
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+@contextlib.contextmanager
+def preserved_selection():
+    """Restores the user's selection once the block finishes."""
+    selection = cmds.ls(orderedSelection=True, long=True)
+    try:
+        yield
+    finally:
+        _restore_selection(selection)
+
+
+def _restore_selection(selection):
+    """Selects selection again, only if the block changed it, so an
+    unchanged selection adds nothing to the undo queue."""
+    if cmds.ls(orderedSelection=True, long=True) == selection:
+        return
+    if selection:
+        cmds.select(selection, replace=True)
+    else:
+        cmds.select(clear=True)
+
+
+class SceneBatch(object):
+    """Collects instance creation and transform writes for a single commit.
+
+    Nothing touches the scene until commit is called. The commit issues
+    one instance and one xform command per point, plus a single parent
+    call. A scatter run commits with undo suspended and registers its group
+    through register_undo, so the commands never reach the undo queue and
+    the whole scatter is undone in one step.
+    """
+    def __init__(self):
+        self._prototypes = []
+        self._matrices = []
+
+    def __len__(self):
+        return len(self._prototypes)
+
+    def add_instance(self, prototype, matrix):
+        self._prototypes.append(prototype)
+        self._matrices.append(matrix)
+
+    def commit(self, group=None):
+        """Creates the queued instances under an existing group, or at the
+        world root when group is None.
+
+        Return:
+            list: The names of the new instances.
+        """
+        nodes = [cmds.instance(prototype)[0]
+                 for prototype in self._prototypes]
+        for node, matrix in zip(nodes, self._matrices):
+            cmds.xform(node, ws=True, m=matrix)
+        if nodes and group is not None:
+            nodes = cmds.parent(nodes, group)
+        self._prototypes = []
+        self._matrices = []
+        return nodes
+
+
+class TransformEmitter(object):
+    """Creates one instanced transform per point.
+
+    Instances are keyed by point id, so sync can later bring the scatter in
+    line with new placements by touching only the points that changed.
+    With a group_size, instances are grouped into the cells of an octree
+    over bounds, each group holding at most group_size instances or up to
+    eight cell groups. The bounds may be None or leave points out, as the
+    octree grows to take them in. Without a group_size, every instance goes
+    under a single group.
+    """
+    def __init__(self, group_size=0, bounds=None):
+        self.group_size = group_size
+        self.bounds = bounds
+        self.group = None
+
+    def emit(self, prototypes, batches, name="scattered_grp"):
+        """Instances the prototypes at every placement.
+
+        Return:
+            String: The group name of the scattered objects.
+        """
+        self.begin(prototypes, name)
+        for batch in batches:
+            self.add(batch)
+        return self.finish()
+
+    def begin(self, prototypes, name="scattered_grp"):
+        """Starts an incremental emit; batches then arrive through add."""
+        self.prototypes = list(prototypes)
+        self.group = cmds.group(empty=True, name=name)
+        self.octree = None
+        self.nodes = {}
+        self._placed = []
+
+    def add(self, batch):
+        self._create(batch.ids, batch.obj_indices,
+                     batch.matrices.reshape(-1, 16))
+
+    def _create(self, ids, obj_indices, matrices):
+        """Instances the prototypes at the given points and records their
+        placements."""
+        if not len(ids):
+            return
+        scene_batch = SceneBatch()
+        for obj_idx, matrix in zip(obj_indices.tolist(), matrices.tolist()):
+            scene_batch.add_instance(self.prototypes[obj_idx], matrix)
+        ids = np.asarray(ids)
+        if self.group_size:
+            self._file(ids.tolist(), matrices[:, 12:15], scene_batch.commit())
+        else:
+            self.nodes.update(zip(ids.tolist(),
+                                  scene_batch.commit(self.group)))
+        self._placed.append((ids, np.asarray(obj_indices),
+                             matrices.astype(np.float32)))
+
+    def _file(self, ids, positions, nodes):
+        """Parents new instances under their octree cell groups, moving
+        any instances displaced by a cell split."""
+        if self.octree is None:
+            bounds = self.bounds or grouping.point_bounds(positions)
+            self.octree = grouping.Octree(bounds[0], bounds[1],
+                                          self.group_size)
+            self.octree.root.group = self.group
+        self.nodes.update(zip(ids, nodes))
+        root = self.octree.root
+        filed = self.octree.insert(positions, ids)
+        if self.octree.root is not root:
+            self._regroup(root, filed.get(root, ()))
+        for leaf, items in filed.items():
+            moved = cmds.parent([self.nodes[item] for item in items],
+                                self._cell_group(leaf))
+            self.nodes.update(zip(items, moved))
+
+    def _regroup(self, old_root, new_items):
+        """Moves what the scatter group held into a cell group of its own
+        after the octree grew a new root above it."""
+        self.octree.root.group = self.group
+        old_root.group = None
+        if old_root.children is not None:
+            cells = [child for child in old_root.children
+                     if child.group is not None]
+            if cells:
+                moved = cmds.parent([cell.group for cell in cells],
+                                    self._cell_group(old_root))
+                for cell, name in zip(cells, moved):
+                    cell.group = name
+            return
+        items = old_root.items[:len(old_root.items) - len(new_items)]
+        if items:
+            moved = cmds.parent([self.nodes[item] for item in items],
+                                self._cell_group(old_root))
+            self.nodes.update(zip(items, moved))
+
+    def _cell_group(self, node):
+        """Returns the group of an octree cell, creating it and any missing
+        ancestors."""
+        if node.group is None:
+            node.group = cmds.group(
+                empty=True, parent=self._cell_group(node.parent),
+                name="{}_cell_{}".format(self.group.split("|")[-1],
+                                         "_".join(node.key)))
+        return node.group
+
+    def finish(self):
+        return self.group
+
+    def discard(self):
+        """Deletes everything created since begin."""
+        if cmds.objExists(self.group):
+            cmds.delete(self.group)
+
+    def sync(self, prototypes, batches, group):
+        """Brings a scatter made by this emitter in line with new
+        placements.
+
+        Instances whose point is gone, or whose point moved or changed
+        object, are deleted. New points are instanced. Every other instance
+        keeps its node, and its matrix is only rewritten if it changed.
+
+        Return:
+            bool: False if group is not this emitter's scatter of the same
+                prototypes, in which case nothing is changed.
+        """
+        if group is None or group != self.group \
+                or list(prototypes) != self.prototypes \
+                or not cmds.objExists(group):
+            return False
+        old_ids, old_objs, old_matrices = self._placements()
+        new_ids, new_objs, new_matrices = self._placements(
+            [(batch.ids, batch.obj_indices, batch.matrices.reshape(-1, 16))
+             for batch in batches])
+        _, old_idx, new_idx = np.intersect1d(
+            old_ids, new_ids, assume_unique=True, return_indices=True)
+        new_single = new_matrices[new_idx].astype(np.float32)
+        same = (old_objs[old_idx] == new_objs[new_idx]) & np.all(
+            old_matrices[old_idx, 12:15] == new_single[:, 12:15], axis=1)
+        removed = np.ones(len(old_ids), dtype=bool)
+        removed[old_idx[same]] = False
+        self._delete(old_ids[removed].tolist())
+        changed = np.any(old_matrices[old_idx[same]] != new_single[same],
+                         axis=1)
+        for point_id, matrix in zip(
+                new_ids[new_idx[same][changed]].tolist(),
+                new_matrices[new_idx[same][changed]].tolist()):
+            cmds.xform(self.nodes[point_id], ws=True, m=matrix)
+        kept = new_idx[same]
+        added = np.ones(len(new_ids), dtype=bool)
+        added[kept] = False
+        self._placed = [(new_ids[kept], new_objs[kept],
+                         new_single[same])]
+        self._create(new_ids[added], new_objs[added], new_matrices[added])
+        return True
+
+    def _placements(self, placed=None):
+        """Joins recorded (ids, obj_indices, matrices) chunks.
+
+        Return:
+            tuple: The ids, object indices and flat (N, 16) matrices.
+        """
+        placed = self._placed if placed is None else placed
+        if not placed:
+            return (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64),
+                    np.empty((0, 16)))
+        return tuple(np.concatenate(arrays) for arrays in zip(*placed))
+
+    def _delete(self, ids):
+        if not ids:
+            return
+        cmds.delete([self.nodes.pop(point_id) for point_id in ids])
+        if self.octree is not None:
+            self.octree.remove(ids)
+
+
+class InstancerEmitter(object):
+    """Writes every placement into one particle instancer.
+
+    Per-point position, rotation, scale and object index live in arrays on a
+    single particle shape, so the node count stays constant no matter how
+    many points are scattered. Batches are reduced to compact float32 arrays
+    as they arrive, since the particle shape needs them all at once.
+    """
+    def __init__(self, group_size=0, bounds=None):
+        """The instancer is a single node whatever the point count, so
+        group_size and bounds are accepted for a common signature only."""
+
+    def emit(self, prototypes, batches, name="scattered_grp"):
+        """Builds a particle cloud and instancer driven by the placements.
+
+        Return:
+            String: The group name holding the particles and instancer.
+        """
+        self.begin(prototypes, name)
+        for batch in batches:
+            self.add(batch)
+        return self.finish()
+
+    def begin(self, prototypes, name="scattered_grp"):
+        """Starts an incremental emit; batches then arrive through add."""
+        self.prototypes = list(prototypes)
+        self.name = name
+        self._positions = []
+        self._rotations = []
+        self._scales = []
+        self._obj_indices = []
+
+    def add(self, batch):
+        rotations, scales = scatter_kernel.decompose_matrices(batch.matrices)
+        self._positions.append(batch.matrices[:, 3, :3].astype(np.float32))
+        self._rotations.append(rotations.astype(np.float32))
+        self._scales.append(scales.astype(np.float32))
+        self._obj_indices.append(batch.obj_indices.astype(np.float32))
+
+    def finish(self):
+        name = self.name
+        if not self._positions:
+            return cmds.group(empty=True, name=name)
+        particle, shape = cmds.particle(
+            position=[tuple(pos) for pos in
+                      np.concatenate(self._positions).tolist()],
+            name=name + "_pts")
+        cmds.setAttr(shape + ".isDynamic", False)
+        self._set_vector_array(shape, "rotationPP",
+                               np.concatenate(self._rotations))
+        self._set_vector_array(shape, "scalePP", np.concatenate(self._scales))
+        self._set_double_array(shape, "objectIndexPP",
+                               np.concatenate(self._obj_indices))
+        instancer = cmds.particleInstancer(
+            shape, addObject=True, object=list(self.prototypes),
+            name=name + "_instancer", cycle="None",
+            rotationUnits="Degrees", rotationOrder="XYZ",
+            position="worldPosition", rotation="rotationPP",
+            scale="scalePP", objectIndex="objectIndexPP")
+        return cmds.group(particle, instancer, name=name)
+
+    def discard(self):
+        """Drops the collected placements; nothing is in the scene until
+        finish."""
+        self._positions = []
+
+    def sync(self, prototypes, batches, group):
+        """Particle positions are only set on creation, so an instancer is
+        always rebuilt; this is cheap as its node count is constant.
+
+        Return:
+            bool: Always False.
+        """
+        return False
+
+    @staticmethod
+    def _set_vector_array(shape, attr, values):
+        for name in (attr, attr + "0"):
+            if not cmds.attributeQuery(name, node=shape, exists=True):
+                cmds.addAttr(shape, longName=name, dataType="vectorArray")
+            cmds.setAttr("{}.{}".format(shape, name), len(values),
+                         *[tuple(row) for row in values.tolist()],
+                         type="vectorArray")
+
+    @staticmethod
+    def _set_double_array(shape, attr, values):
+        for name in (attr, attr + "0"):
+            if not cmds.attributeQuery(name, node=shape, exists=True):
+                cmds.addAttr(shape, longName=name, dataType="doubleArray")
+            cmds.setAttr("{}.{}".format(shape, name), values.tolist(),
+                         type="doubleArray")
+
+
+OUTPUT_MODES = {"instances": TransformEmitter,
+                "instancer": InstancerEmitter}
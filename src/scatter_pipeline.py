@@ -0,0 +1,319 @@
+"""Streaming stages of a scatter run.
+
+A scatter is a chain of generators: source -> sample -> assign object ->
+compute transform -> emit. Each stage consumes and yields PointBatch
+objects of at most BATCH_SIZE points, so peak memory is bounded by the batch
+size rather than the total point count. Every random draw is keyed by the
+seed and the batch index, so a chain gives the same result whether it is
+streamed or materialized stage by stage.
+
+Each point also keeps its slot among the candidates its source batch
+started with. Per-point draws are made for every candidate and picked by
+slot, so a point's density threshold, scatter object and modifiers never
+depend on which other points survived. Raising the density therefore only
+adds points, and lowering it only removes some, every point keeping the
+placement it had. The one exception is overlap_stage: it culls greedily in
+stream order, so a point added by a higher density can cull a later point
+that was kept before, and a removed point can let one back in.
+"""
+import numpy as np
+
+import placement
+import raycast
+import sampling
+import scatter_kernel
+
+BATCH_SIZE = placement.CHUNK_SIZE
+ID_STRIDE = 1 << 32
+CLOUD_INDEX_BASE = 1 << 24
+
+
+class PointBatch(object):
+    """A fixed-size slice of scatter points moving through the stages.
+
+    slots holds each point's index among the batch's original candidates,
+    all of them by default.
+    """
+    def __init__(self, index, positions, normals, parent_matrices,
+                 obj_indices=None, matrices=None, weights=None, slots=None,
+                 candidates=None):
+        self.index = index
+        self.positions = positions
+        self.normals = normals
+        self.parent_matrices = parent_matrices
+        self.obj_indices = obj_indices
+        self.matrices = matrices
+        self.weights = weights
+        if slots is None:
+            slots = np.arange(len(positions))
+        self.slots = slots
+        self.candidates = len(positions) if candidates is None \
+            else candidates
+
+    def __len__(self):
+        return len(self.positions)
+
+    def copy(self):
+        """Returns a shallow copy, so later stages can attach results
+        without touching batches cached from earlier stages."""
+        return PointBatch(self.index, self.positions, self.normals,
+                          self.parent_matrices, self.obj_indices,
+                          self.matrices, self.weights, self.slots,
+                          self.candidates)
+
+    def take(self, indices):
+        """Returns the points at the given indices as a batch with the same
+        index."""
+        return PointBatch(
+            self.index, self.positions[indices], self.normals[indices],
+            self.parent_matrices[indices],
+            None if self.obj_indices is None else self.obj_indices[indices],
+            None if self.matrices is None else self.matrices[indices],
+            None if self.weights is None else self.weights[indices],
+            self.slots[indices], self.candidates)
+
+    @property
+    def ids(self):
+        """A stable id per point, unique within a scatter run."""
+        return self.index * ID_STRIDE + self.slots
+
+
+def vertex_source(targets, batch_size=BATCH_SIZE, weight_maps=None):
+    """Yields the targeted vertices of every mesh in batches.
+
+    Args:
+        targets: (MeshData, indices) pairs from meshdata.gather_meshes.
+        weight_maps: Optional per-vertex weight arrays, one per target.
+    """
+    if weight_maps is None:
+        weight_maps = [None] * len(targets)
+    batch_idx = 0
+    for (mesh, indices), vertex_weights in zip(targets, weight_maps):
+        count = len(mesh) if indices is None else len(indices)
+        for start in range(0, count, batch_size):
+            if indices is None:
+                chunk = np.arange(start, min(start + batch_size, count))
+            else:
+                chunk = indices[start:start + batch_size]
+            yield PointBatch(
+                batch_idx, mesh.world_points(chunk), mesh.normals[chunk],
+                np.broadcast_to(mesh.world_matrix, (len(chunk), 4, 4)),
+                weights=None if vertex_weights is None
+                else vertex_weights[chunk])
+            batch_idx += 1
+
+
+def surface_source(samplers, count, seed, batch_size=BATCH_SIZE,
+                   weight_maps=None):
+    """Yields count area-weighted surface points in batches.
+
+    Args:
+        samplers: sampling.SurfaceSampler objects, one per target.
+        count: The total number of points to draw.
+        seed: The scatter seed.
+        weight_maps: Optional per-vertex weight arrays, one per sampler,
+            interpolated at each point.
+    """
+    if weight_maps is None:
+        weight_maps = [None] * len(samplers)
+    areas = np.array([sampler.area for sampler in samplers])
+    if not len(areas) or areas.sum() <= 0.0:
+        return
+    rng = placement.rng_stream(seed, placement.SURFACE_STREAM)
+    mesh_counts = rng.multinomial(count, areas / areas.sum())
+    batch_idx = 0
+    for sampler, mesh_count, vertex_weights in zip(samplers, mesh_counts,
+                                                   weight_maps):
+        for start in range(0, mesh_count, batch_size):
+            size = min(batch_size, mesh_count - start)
+            rng = placement.rng_stream(seed, placement.SURFACE_STREAM,
+                                       batch_idx + 1)
+            positions, normals, weights = sampler.sample(size, rng,
+                                                         vertex_weights)
+            yield PointBatch(
+                batch_idx, positions, normals,
+                np.broadcast_to(sampler.mesh.world_matrix,
+                                (len(positions), 4, 4)), weights=weights)
+            batch_idx += 1
+
+
+def _box_exit(points, direction, lower, upper):
+    """Returns how far each point inside a box travels along direction
+    before leaving it."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distances = np.where(direction > 0.0, upper - points,
+                             lower - points) / direction
+    distances[:, direction == 0.0] = np.inf
+    return np.maximum(distances.min(axis=1), 0.0)
+
+
+def projection_source(bvhs, count, seed, bounds, direction,
+                      batch_size=BATCH_SIZE, weight_maps=None):
+    """Yields the points where rays cast along direction first hit the
+    targets.
+
+    Ray starts are drawn uniformly inside the bounds box. Each ray is traced
+    across the whole box, from where it enters to where it leaves, so it
+    lands on the first surface seen from the side it was cast from. Rays
+    that hit nothing are dropped.
+
+    Args:
+        bvhs: raycast.TriangleBVH objects, one per target mesh.
+        count: The number of rays to cast.
+        seed: The scatter seed.
+        bounds: The lower and upper world space corners of the region.
+        direction: The world space (3,) direction to cast along.
+        weight_maps: Optional per-vertex weight arrays, one per target,
+            interpolated at each hit.
+    """
+    direction = scatter_kernel.normalize(
+        np.asarray(direction, dtype=np.float64))
+    lower, upper = [np.asarray(corner, dtype=np.float64)
+                    for corner in bounds]
+    if weight_maps is None:
+        weight_maps = [None] * len(bvhs)
+    for batch_idx, start in enumerate(range(0, count, batch_size)):
+        size = min(batch_size, count - start)
+        rng = placement.rng_stream(seed, placement.PROJECTION_STREAM,
+                                   batch_idx + 1)
+        points = rng.uniform(lower, upper, (size, 3))
+        back = _box_exit(points, -direction, lower, upper)
+        origins = points - direction * back[:, np.newaxis]
+        meshes, tris, bary = raycast.cast(
+            bvhs, origins, direction,
+            back + _box_exit(points, direction, lower, upper))
+        positions = np.zeros((size, 3))
+        normals = np.zeros((size, 3))
+        parents = np.zeros((size, 4, 4))
+        weights = None
+        if any(weight_map is not None for weight_map in weight_maps):
+            weights = np.ones(size)
+        for mesh_idx, bvh in enumerate(bvhs):
+            hits = np.flatnonzero(meshes == mesh_idx)
+            if not len(hits):
+                continue
+            local, hit_normals, hit_weights = bvh.surface(
+                tris[hits], bary[hits], weight_maps[mesh_idx])
+            positions[hits] = bvh.mesh.to_world(local)
+            normals[hits] = hit_normals
+            parents[hits] = bvh.mesh.world_matrix
+            if hit_weights is not None:
+                weights[hits] = hit_weights
+        yield PointBatch(batch_idx, positions, normals, parents,
+                         weights=weights).take(np.flatnonzero(meshes >= 0))
+
+
+def cloud_source(clouds, batch_size=BATCH_SIZE,
+                 first_index=CLOUD_INDEX_BASE):
+    """Yields the points of every point cloud in batches, streamed from
+    disk.
+
+    Batch indices start at first_index, so a cloud's points keep their ids
+    and random draws whatever mesh targets are scattered alongside it.
+
+    Args:
+        clouds: Opened pointcloud clouds, in world space.
+    """
+    batch_idx = first_index
+    for cloud in clouds:
+        for positions, normals in cloud.chunks(batch_size):
+            yield PointBatch(
+                batch_idx, positions, normals,
+                np.broadcast_to(np.identity(4), (len(positions), 4, 4)))
+            batch_idx += 1
+
+
+def spacing_stage(batches, min_distance, seed):
+    """Drops points closer than min_distance to any point kept before.
+
+    Points with zero weight are dropped first: density_stage would discard
+    them anyway, and left in they would claim spacing slots and thin out
+    the points next to the edge of a weight map's mask.
+    """
+    if min_distance <= 0.0:
+        for batch in batches:
+            yield batch
+        return
+    spacing = sampling.PoissonDiskFilter(min_distance)
+    for batch in batches:
+        if batch.weights is not None:
+            batch = batch.take(np.flatnonzero(batch.weights > 0.0))
+        rng = placement.rng_stream(seed, placement.SPACING_STREAM,
+                                   batch.index)
+        yield batch.take(spacing.filter(batch.positions, rng))
+
+
+def density_stage(batches, density, seed):
+    """Keeps each point with a probability equal to density, scaled by the
+    point's weight when a weight map is applied. Points with zero weight
+    are always dropped."""
+    for batch in batches:
+        if density >= 1.0 and batch.weights is None:
+            yield batch
+            continue
+        keep = density
+        if batch.weights is not None:
+            keep = density * batch.weights
+        rng = placement.rng_stream(seed, placement.DENSITY_STREAM,
+                                   batch.index)
+        thresholds = rng.random_sample(batch.candidates)[batch.slots]
+        yield batch.take(np.flatnonzero(thresholds < keep))
+
+
+def assign_stage(batches, weights, seed):
+    """Picks a scatter object for each point in proportion to weights,
+    using an alias table built once for the whole run."""
+    table = sampling.AliasTable(weights)
+    for batch in batches:
+        rng = placement.rng_stream(seed, placement.ORDER_STREAM, batch.index)
+        batch = batch.copy()
+        batch.obj_indices = table.sample(batch.candidates, rng)[batch.slots]
+        yield batch
+
+
+def transform_stage(batches, base_scales, params, seed, workers=1,
+                    pool=None, cancelled=None):
+    """Computes the final instance matrix of every point, one window of
+    worker processes at a time, in pool if given. The stage ends early once
+    the optional cancelled function returns True."""
+    base_scales = np.asarray(base_scales, dtype=np.float64).reshape(-1, 3)
+    pending = []
+
+    def jobs():
+        for batch in batches:
+            if not len(batch):
+                continue
+            pending.append(batch)
+            yield (batch.positions, batch.normals,
+                   np.ascontiguousarray(batch.parent_matrices),
+                   base_scales[batch.obj_indices], batch.weights, params,
+                   seed, batch.index, batch.slots, batch.candidates)
+
+    for matrices in placement.map_chunks(jobs(), workers, pool, cancelled):
+        batch = pending.pop(0).copy()
+        batch.matrices = matrices
+        yield batch
+
+
+def overlap_stage(batches, radii, max_radius):
+    """Drops placed instances whose bounding spheres overlap one kept
+    earlier.
+
+    Which instance of an overlapping pair survives depends on stream order,
+    not on density, so changing the density can cull points that were kept
+    before as well as add new ones.
+
+    Args:
+        radii: The bounding radius of each scatter object before scaling.
+        max_radius: An upper bound on any scaled radius.
+    """
+    if max_radius <= 0.0:
+        for batch in batches:
+            yield batch
+        return
+    radii = np.asarray(radii, dtype=np.float64)
+    overlap = sampling.OverlapFilter(max_radius)
+    for batch in batches:
+        scales = np.linalg.norm(batch.matrices[:, :3, :3], axis=2).max(axis=1)
+        yield batch.take(overlap.filter(batch.matrices[:, 3, :3],
+                                        radii[batch.obj_indices] * scales))
@@ -0,0 +1,59 @@
+"""Maya command plugin that makes a whole scatter a single undo step.
+
+A scatter's nodes are created with undo suspended, so none of the per
+instance commands reach the undo queue. scatterRegisterUndo is then run once
+on the scatter's group: undoing it deletes the group and everything under it
+through one MDagModifier, and redoing it restores them. The undo queue holds
+one entry per scatter whatever its point count.
+
+Loaded by scatter_output.register_undo with cmds.loadPlugin on this file.
+"""
+import maya.api.OpenMaya as om
+
+COMMAND_NAME = "scatterRegisterUndo"
+
+
+def maya_useNewAPI():
+    """Tells Maya the plugin uses the Python API 2.0."""
+
+
+class RegisterUndoCommand(om.MPxCommand):
+    """Records nodes that already exist as created by this command."""
+    def __init__(self):
+        om.MPxCommand.__init__(self)
+        self._modifier = None
+
+    @staticmethod
+    def creator():
+        return RegisterUndoCommand()
+
+    def doIt(self, args):
+        """Queues the deletion of every node named in args; nothing is
+        changed until the command is undone."""
+        selection = om.MSelectionList()
+        for idx in range(len(args)):
+            selection.add(args.asString(idx))
+        self._modifier = om.MDagModifier()
+        names = []
+        for idx in range(selection.length()):
+            self._modifier.deleteNode(selection.getDependNode(idx))
+            names.append(selection.getSelectionStrings(idx)[0])
+        self.setResult(names)
+
+    def undoIt(self):
+        self._modifier.doIt()
+
+    def redoIt(self):
+        self._modifier.undoIt()
+
+    def isUndoable(self):
+        return True
+
+
+def initializePlugin(plugin):
+    om.MFnPlugin(plugin, "sfa_scripts", "1.0").registerCommand(
+        COMMAND_NAME, RegisterUndoCommand.creator)
+
+
+def uninitializePlugin(plugin):
+    om.MFnPlugin(plugin).deregisterCommand(COMMAND_NAME)
@@ -297,6 +297,24 @@ class SceneFile(object):
             self.folder_path.makedirs_p()
             return pmc.system.saveAs(self.path)
 
+    def export(self, nodes):
+        """Exports nodes to the scene file, leaving the open scene and its
+        name unchanged.
+
+        Return:
+            Path: the path to the exported file if successful
+        """
+        cmds.select(nodes, replace=True)
+        file_type = "mayaBinary" if self.ext == ".mb" else "mayaAscii"
+        try:
+            return pmc.system.exportSelected(self.path, type=file_type,
+                                             force=True)
+        except RuntimeError as error:
+            log.warning("Missing directories in path. Creating directories...")
+            self.folder_path.makedirs_p()
+            return pmc.system.exportSelected(self.path, type=file_type,
+                                             force=True)
+
     def next_avail_ver(self, search_desc=None,
                        search_task=None, search_ext=None, search_path=None):
         """Returns the next available version number using provided
@@ -320,8 +338,8 @@ class SceneFile(object):
         if not matching_scene_files:
             return 1
         matching_scene_files.sort()
-        version_match = re.search(r'[0-9]{3}', matching_scene_files[-1])
-        latest_version = int(version_match.group())
+        version_match = re.search(r'_v([0-9]+)', matching_scene_files[-1].name)
+        latest_version = int(version_match.group(1))
         return latest_version + 1
 
     def save_increment(self):
@@ -335,3 +353,12 @@ class SceneFile(object):
         """
         self.ver = self.next_avail_ver()
         self.save()
+
+    def export_increment(self, nodes):
+        """Exports nodes as the next available version of the scene file
+
+        Return:
+            Path: the path to the exported file if successful
+        """
+        self.ver = self.next_avail_ver()
+        return self.export(nodes)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+HERE = os.path.dirname(__file__)
+sys.path.insert(0, os.path.join(HERE, os.pardir, "benchmarks", "standin"))
+sys.path.insert(0, os.path.join(HERE, os.pardir, "src"))
@@ -0,0 +1,59 @@
+import numpy as np
+
+import grouping
+
+
+def _leaves(node):
+    if node.children is None:
+        return [node]
+    return [leaf for child in node.children for leaf in _leaves(child)]
+
+
+def _inside(node, positions):
+    return ((positions >= node.lower - 1e-9)
+            & (positions <= node.upper + 1e-9)).all()
+
+
+def test_insert_files_every_item_in_its_cell():
+    rng = np.random.RandomState(1)
+    positions = rng.uniform(0.0, 10.0, (2000, 3))
+    tree = grouping.Octree([0.0] * 3, [10.0] * 3, max_children=50)
+    filed = tree.insert(positions[:1200], list(range(1200)))
+    filed.update(tree.insert(positions[1200:], list(range(1200, 2000))))
+    leaves = _leaves(tree.root)
+    assert sorted(item for leaf in leaves for item in leaf.items) \
+        == list(range(2000))
+    for leaf in leaves:
+        assert len(leaf.items) <= 50
+        assert _inside(leaf, leaf.positions)
+        np.testing.assert_array_equal(leaf.positions,
+                                      positions[leaf.items])
+    for leaf, items in filed.items():
+        if leaf.children is None:
+            assert leaf.items[-len(items):] == items
+
+
+def test_root_grows_around_outside_points():
+    tree = grouping.Octree([0.0] * 3, [1.0] * 3, max_children=4)
+    tree.insert(np.random.RandomState(2).uniform(0.0, 1.0, (10, 3)),
+                list(range(10)))
+    outside = np.array([[-30.0, 5.0, 2.0], [40.0, -8.0, 90.0]])
+    tree.insert(outside, ["far", "farther"])
+    assert _inside(tree.root, outside)
+    leaves = _leaves(tree.root)
+    assert sum(len(leaf.items) for leaf in leaves) == 12
+    keys = [leaf.key for leaf in leaves]
+    assert len(set(keys)) == len(keys)
+
+
+def test_remove_takes_items_and_positions_out():
+    rng = np.random.RandomState(4)
+    positions = rng.uniform(0.0, 1.0, (300, 3))
+    tree = grouping.Octree([0.0] * 3, [1.0] * 3, max_children=20)
+    tree.insert(positions, list(range(300)))
+    tree.remove(range(0, 300, 3))
+    kept = [item for leaf in _leaves(tree.root) for item in leaf.items]
+    assert sorted(kept) == [item for item in range(300) if item % 3]
+    for leaf in _leaves(tree.root):
+        np.testing.assert_array_equal(leaf.positions,
+                                      positions[leaf.items])
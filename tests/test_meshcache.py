@@ -0,0 +1,75 @@
+import numpy as np
+
+import meshcache
+import meshdata
+
+
+class CountingBackend(meshdata.InMemoryMeshBackend):
+    def __init__(self):
+        super(CountingBackend, self).__init__()
+        self.reads = []
+
+    def read(self, mesh):
+        self.reads.append(mesh)
+        return meshdata.MeshData(
+            mesh, self.meshes[mesh].points, self.meshes[mesh].normals)
+
+
+def _backend(*names):
+    backend = CountingBackend()
+    for name in names:
+        backend.add_mesh(name, np.zeros((100, 3)), np.zeros((100, 3)))
+    return backend
+
+
+def test_unchanged_meshes_are_read_once():
+    backend = _backend("ground")
+    cache = meshcache.MeshCache(backend)
+    first = cache.read("ground")
+    assert cache.read("ground") is first
+    assert backend.reads == ["ground"]
+
+
+def test_changed_mesh_is_read_again():
+    backend = _backend("ground")
+    cache = meshcache.MeshCache(backend)
+    cache.read("ground")
+    backend.add_mesh("ground", np.ones((100, 3)), np.zeros((100, 3)))
+    np.testing.assert_array_equal(cache.read("ground").points, 1.0)
+    assert backend.reads == ["ground", "ground"]
+
+
+def test_least_recently_used_mesh_is_evicted():
+    backend = _backend("a", "b", "c")
+    mesh_bytes = 2 * 100 * 3 * 8 + 16 * 8
+    cache = meshcache.MeshCache(backend, budget=2 * mesh_bytes)
+    cache.read("a")
+    cache.read("b")
+    cache.read("a")
+    cache.read("c")
+    assert len(cache) == 2
+    cache.read("a")
+    cache.read("b")
+    assert backend.reads == ["a", "b", "c", "b"]
+
+
+def test_derived_tables_count_toward_the_budget():
+    backend = _backend("a", "b")
+    cache = meshcache.MeshCache(backend, budget=10000)
+    cache.read("a").derived["table"] = np.zeros(2000)
+    cache.read("b")
+    assert len(cache) == 1
+    cache.read("b")
+    cache.read("a")
+    assert backend.reads == ["a", "b", "a"]
+
+
+def test_release_and_invalidate_forget_meshes():
+    backend = _backend("a", "b")
+    cache = meshcache.MeshCache(backend)
+    cache.read("a")
+    cache.read("b")
+    cache.invalidate("a")
+    assert len(cache) == 1
+    cache.release()
+    assert len(cache) == 0
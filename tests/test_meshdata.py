@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+import meshdata
+
+
+def _backend():
+    backend = meshdata.InMemoryMeshBackend()
+    world_matrix = np.identity(4)
+    world_matrix[:3, :3] *= 2.0
+    world_matrix[3, :3] = [1.0, 2.0, 3.0]
+    backend.add_mesh("ground", np.arange(12.0).reshape(4, 3),
+                     np.tile([0.0, 1.0, 0.0], (4, 1)), world_matrix)
+    backend.add_mesh("rock", np.ones((3, 3)), np.ones((3, 3)))
+    return backend
+
+
+def test_gather_reads_each_mesh_once():
+    backend = _backend()
+    reads = []
+    read = backend.read
+    backend.read = lambda mesh: reads.append(mesh) or read(mesh)
+    targets = meshdata.gather_meshes(
+        backend, ["ground", "ground"],
+        {"ground": [0, 1], "rock": [2, 0]})
+    assert reads == ["ground", "rock"]
+    assert targets[0][1] is None
+    np.testing.assert_array_equal(targets[1][1], [2, 0])
+
+
+def test_world_points_apply_the_world_matrix():
+    mesh = _backend().read("ground")
+    np.testing.assert_allclose(mesh.world_points([1, 3]),
+                               [[7.0, 10.0, 13.0], [19.0, 22.0, 25.0]])
+    assert mesh.points.flags["C_CONTIGUOUS"]
+    assert mesh.points.dtype == np.float64
+
+
+def test_missing_mesh_and_weight_map_raise():
+    backend = _backend()
+    with pytest.raises(RuntimeError):
+        backend.read("cloud")
+    with pytest.raises(ValueError):
+        backend.read_weights("ground", "mask")
+
+
+def test_edits_change_the_token():
+    backend = _backend()
+    token = backend.change_token("ground")
+    backend.add_weights("ground", "mask", [0.5, 2.0, -1.0, 0.0])
+    assert backend.change_token("ground") != token
+    np.testing.assert_array_equal(backend.read_weights("ground", "mask"),
+                                  [0.5, 1.0, 0.0, 0.0])
+
+
+def test_vertex_ranges_expand_to_sorted_unique_indices():
+    indices = meshdata.parse_vertex_selection(
+        ["ground.vtx[5:7]", "rock.vtx[2]", "ground.vtx[0]",
+         "ground.vtx[6:9]"])
+    assert list(indices) == ["ground", "rock"]
+    np.testing.assert_array_equal(indices["ground"], [0, 5, 6, 7, 8, 9])
+    np.testing.assert_array_equal(indices["rock"], [2])
+    assert indices["ground"].dtype == np.int64
+
+
+def test_vertex_names_parse_namespaces_and_single_indices():
+    assert meshdata.parse_vertex_name("set:ground.vtx[12]") \
+        == ("set:ground", 12, 12)
+    assert meshdata.parse_vertex_name("ground.vtx[0:99]") \
+        == ("ground", 0, 99)
+
+
+def test_non_vertex_components_are_rejected():
+    for component in ("ground.f[3]", "ground", "ground.vtx[a]"):
+        with pytest.raises(ValueError):
+            meshdata.parse_vertex_name(component)
@@ -0,0 +1,50 @@
+import numpy as np
+
+import placement
+
+
+def _jobs(count, size=300, seed=21):
+    rng = np.random.RandomState(0)
+    params = placement.PlacementParams(
+        [[-10.0, 10.0], [0.0, 360.0], [0.0, 0.0]], [0.5, 2.0],
+        scale_influence=0.5)
+    jobs = []
+    for chunk_idx in range(count):
+        slots = np.sort(rng.choice(size * 2, size, replace=False))
+        jobs.append((rng.uniform(-5.0, 5.0, (size, 3)),
+                     rng.normal(size=(size, 3)),
+                     np.broadcast_to(np.identity(4), (size, 4, 4)),
+                     np.ones((size, 3)), rng.random_sample(size), params,
+                     seed, chunk_idx, slots, size * 2))
+    return jobs
+
+
+def test_parallel_placements_match_serial():
+    jobs = _jobs(5)
+    serial = list(placement.map_chunks(jobs, workers=1))
+    parallel = list(placement.map_chunks(jobs, workers=3))
+    assert len(parallel) == 5
+    for expected, result in zip(serial, parallel):
+        np.testing.assert_array_equal(result, expected)
+
+
+def test_worker_pool_is_reused_across_runs():
+    jobs = _jobs(4)
+    serial = list(placement.map_chunks(jobs))
+    pool = placement.WorkerPool(2)
+    try:
+        for _ in range(2):
+            results = list(placement.map_chunks(iter(jobs), pool=pool))
+            for expected, result in zip(serial, results):
+                np.testing.assert_array_equal(result, expected)
+        processes = pool._pool
+        list(placement.map_chunks(jobs, pool=pool))
+        assert pool._pool is processes
+    finally:
+        pool.close()
+
+
+def test_cancelled_run_stops_early():
+    results = list(placement.map_chunks(_jobs(4), workers=1,
+                                        cancelled=lambda: True))
+    assert results == []
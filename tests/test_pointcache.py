@@ -0,0 +1,36 @@
+import numpy as np
+
+import pointcache
+import scatter_pipeline
+
+
+def _batches(rng, sizes):
+    for index, size in enumerate(sizes):
+        matrices = rng.normal(size=(size, 4, 4))
+        yield scatter_pipeline.PointBatch(
+            index, matrices[:, 3, :3], matrices[:, 1, :3],
+            np.broadcast_to(np.identity(4), (size, 4, 4)),
+            obj_indices=rng.randint(0, 2, size), matrices=matrices)
+
+
+def test_cache_round_trip(tmp_path):
+    sent = list(_batches(np.random.RandomState(8), [100, 37]))
+    writer = pointcache.CacheWriter(["rock", "bush"], 12, {"density": 0.5})
+    assert list(writer.record(sent)) == sent
+    path = writer.save(str(tmp_path / "scatter.npz"))
+    matrices = np.concatenate([batch.matrices for batch in sent])
+    obj_indices = np.concatenate([batch.obj_indices for batch in sent])
+    for mmap in (True, False):
+        cache = pointcache.PointCache(path, mmap=mmap)
+        assert len(cache) == 137
+        assert cache.prototypes == ["rock", "bush"]
+        assert cache.seed == 12
+        assert cache.settings == {"density": 0.5}
+        np.testing.assert_array_equal(cache.matrices,
+                                      matrices.astype(np.float32))
+        np.testing.assert_array_equal(cache.prototype, obj_indices)
+        read = list(cache.batches(batch_size=64))
+        assert [len(batch) for batch in read] == [64, 64, 9]
+        np.testing.assert_array_equal(
+            np.concatenate([batch.matrices for batch in read]),
+            cache.matrices)
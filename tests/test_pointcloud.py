@@ -0,0 +1,152 @@
+import numpy as np
+import pytest
+
+import pointcloud
+
+
+def _points(count, seed=1):
+    rng = np.random.RandomState(seed)
+    normals = rng.normal(size=(count, 3))
+    normals /= np.linalg.norm(normals, axis=1)[:, np.newaxis]
+    return rng.uniform(-10.0, 10.0, (count, 3)), normals
+
+
+def _read(cloud, size=pointcloud.CHUNK_SIZE):
+    chunks = list(cloud.chunks(size))
+    return ([len(positions) for positions, _ in chunks],
+            np.concatenate([positions for positions, _ in chunks]),
+            np.concatenate([normals for _, normals in chunks]))
+
+
+def _line(row, delimiter=" "):
+    return delimiter.join("{:.17g}".format(value) for value in row)
+
+
+def _header(file_format, vertex_props, count):
+    return "\n".join(
+        ["ply", "format {} 1.0".format(file_format),
+         "comment made by hand", "element camera 2", "property float fov",
+         "property uchar id", "element vertex {}".format(count)]
+        + ["property {} {}".format(prop_type, name)
+           for name, prop_type in vertex_props]
+        + ["element face 1", "property list uchar int vertex_indices",
+           "end_header"]) + "\n"
+
+
+def test_binary_ply_skips_elements_before_vertices(tmp_path):
+    positions, normals = _points(10)
+    props = [("x", "float"), ("y", "float"), ("z", "float"),
+             ("red", "uchar"), ("nx", "double"), ("ny", "double"),
+             ("nz", "double")]
+    dtype = np.dtype([("x", "<f4"), ("y", "<f4"), ("z", "<f4"),
+                      ("red", "u1"), ("nx", "<f8"), ("ny", "<f8"),
+                      ("nz", "<f8")])
+    vertices = np.zeros(10, dtype=dtype)
+    for idx, name in enumerate(pointcloud.POSITION_NAMES):
+        vertices[name] = positions[:, idx]
+    for idx, name in enumerate(pointcloud.NORMAL_NAMES):
+        vertices[name] = normals[:, idx]
+    cameras = np.array([(1.5, 7), (2.5, 9)],
+                       dtype=[("fov", "<f4"), ("id", "u1")])
+    path = tmp_path / "cloud.ply"
+    path.write_bytes(
+        _header("binary_little_endian", props, 10).encode("ascii")
+        + cameras.tobytes() + vertices.tobytes() + b"\x03\0\0\0\0")
+    cloud = pointcloud.open_cloud(str(path))
+    assert cloud.estimated_count() == 10
+    sizes, read_positions, read_normals = _read(cloud, 4)
+    assert sizes == [4, 4, 2]
+    np.testing.assert_allclose(read_positions,
+                               positions.astype(np.float32))
+    np.testing.assert_allclose(read_normals, normals)
+
+
+def test_big_endian_ply_without_normals_faces_up(tmp_path):
+    positions = _points(5)[0]
+    props = [("x", "double"), ("y", "double"), ("z", "double")]
+    path = tmp_path / "cloud.ply"
+    path.write_bytes(
+        _header("binary_big_endian", props, 5).encode("ascii")
+        + np.zeros(2, dtype=[("fov", ">f4"), ("id", "u1")]).tobytes()
+        + positions.astype(">f8").tobytes())
+    _, read_positions, read_normals = _read(pointcloud.open_cloud(str(path)))
+    np.testing.assert_array_equal(read_positions, positions)
+    np.testing.assert_array_equal(read_normals, [[0.0, 1.0, 0.0]] * 5)
+
+
+def test_ascii_ply_reads_only_its_vertices(tmp_path):
+    positions, normals = _points(7)
+    props = [("nx", "float"), ("ny", "float"), ("nz", "float"),
+             ("x", "float"), ("y", "float"), ("z", "float")]
+    lines = ["60.0 1", "45.0 2"]
+    lines += [_line(row) for row in np.hstack((normals, positions))]
+    lines.append("3 0 1 2")
+    path = tmp_path / "cloud.ply"
+    path.write_text(_header("ascii", props, 7) + "\n".join(lines) + "\n")
+    cloud = pointcloud.open_cloud(str(path))
+    assert len(cloud) == cloud.estimated_count() == 7
+    sizes, read_positions, read_normals = _read(cloud, 3)
+    assert sizes == [3, 3, 1]
+    np.testing.assert_allclose(read_positions, positions)
+    np.testing.assert_allclose(read_normals, normals)
+
+
+def test_csv_header_picks_named_columns(tmp_path):
+    positions, normals = _points(10)
+    rows = np.hstack((np.arange(10)[:, np.newaxis], normals, positions))
+    path = tmp_path / "cloud.csv"
+    path.write_text("id, NX, ny, nz, x, y, z\n" + "\n\n".join(
+        _line(row, ",") for row in rows) + "\n")
+    cloud = pointcloud.open_cloud(str(path))
+    assert len(cloud) == 10
+    sizes, read_positions, read_normals = _read(cloud, 4)
+    assert sizes == [4, 4, 2]
+    np.testing.assert_allclose(read_positions, positions)
+    np.testing.assert_allclose(read_normals, normals)
+
+
+def test_headerless_text_uses_first_columns(tmp_path):
+    positions = _points(6)[0]
+    path = tmp_path / "cloud.xyz"
+    path.write_text("\n".join(_line(row) for row in positions) + "\n")
+    _, read_positions, read_normals = _read(pointcloud.open_cloud(str(path)))
+    np.testing.assert_allclose(read_positions, positions)
+    np.testing.assert_array_equal(read_normals, [[0.0, 1.0, 0.0]] * 6)
+
+
+def test_text_header_without_positions_is_rejected(tmp_path):
+    path = tmp_path / "cloud.csv"
+    path.write_text("a,b,c\n1,2,3\n")
+    with pytest.raises(ValueError):
+        pointcloud.open_cloud(str(path))
+    with pytest.raises(ValueError):
+        pointcloud.open_cloud(str(tmp_path / "cloud.obj"))
+
+
+def test_estimated_count_reads_only_a_sample(tmp_path):
+    positions = _points(20000)[0]
+    path = tmp_path / "cloud.txt"
+    path.write_text("x y z\n" + "\n".join(
+        "{:.4f} {:.4f} {:.4f}".format(*row) for row in positions) + "\n")
+    cloud = pointcloud.open_cloud(str(path))
+    assert path.stat().st_size > pointcloud.SAMPLE_BYTES
+    assert abs(cloud.estimated_count() - 20000) < 200
+    assert len(cloud) == 20000
+
+
+@pytest.mark.parametrize("extension", [".npy", ".f32"])
+def test_binary_arrays_are_mapped(tmp_path, extension):
+    positions, normals = _points(9)
+    data = np.hstack((positions, normals)).astype(np.float32)
+    path = tmp_path / ("cloud" + extension)
+    if extension == ".npy":
+        np.save(str(path), data)
+    else:
+        path.write_bytes(data.astype("<f4").tobytes())
+    cloud = pointcloud.open_cloud(str(path))
+    assert isinstance(cloud, pointcloud.MappedCloud)
+    assert len(cloud) == cloud.estimated_count() == 9
+    sizes, read_positions, read_normals = _read(cloud, 5)
+    assert sizes == [5, 4]
+    np.testing.assert_array_equal(read_positions, data[:, :3])
+    np.testing.assert_array_equal(read_normals, data[:, 3:])
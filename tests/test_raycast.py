@@ -0,0 +1,112 @@
+import numpy as np
+
+import meshdata
+import raycast
+
+
+def _soup(count, seed, world_matrix=None):
+    """A mesh of count random triangles inside a 10 unit cube."""
+    rng = np.random.RandomState(seed)
+    centers = rng.uniform(-5.0, 5.0, (count, 1, 3))
+    points = (centers + rng.uniform(-1.0, 1.0, (count, 3, 3))).reshape(-1, 3)
+    return meshdata.MeshData("soup", points, rng.normal(size=points.shape),
+                             world_matrix,
+                             np.arange(len(points)).reshape(-1, 3))
+
+
+def _brute_force(corners, origins, directions, max_distances):
+    """Solves origin + t * direction = p0 + u * e1 + v * e2 for every ray
+    and triangle pair.
+
+    Return:
+        tuple: The nearest hit distance of each ray, inf for misses, and
+            the index into corners of the hit triangle.
+    """
+    edge_1 = corners[:, 1] - corners[:, 0]
+    edge_2 = corners[:, 2] - corners[:, 0]
+    rays = len(origins)
+    systems = np.empty((rays, len(corners), 3, 3))
+    systems[..., 0] = -directions[:, np.newaxis]
+    systems[..., 1] = edge_1
+    systems[..., 2] = edge_2
+    offsets = origins[:, np.newaxis] - corners[np.newaxis, :, 0]
+    solvable = np.abs(np.linalg.det(systems)) > 1e-9
+    solved = np.full((rays, len(corners), 3), -1.0)
+    solved[solvable] = np.linalg.solve(
+        systems[solvable], offsets[solvable][..., np.newaxis])[..., 0]
+    t, u, v = solved[..., 0], solved[..., 1], solved[..., 2]
+    hit = solvable & (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) \
+        & (t >= 0.0) & (t <= np.asarray(max_distances)[:, np.newaxis])
+    distances = np.where(hit, t, np.inf)
+    return distances.min(axis=1), distances.argmin(axis=1)
+
+
+def _rays(count, seed):
+    rng = np.random.RandomState(seed)
+    origins = rng.uniform(-8.0, 8.0, (count, 3))
+    directions = rng.uniform(-4.0, 4.0, (count, 3)) - origins
+    return origins, directions / np.linalg.norm(directions, axis=1)[:, None]
+
+
+def test_bvh_matches_brute_force():
+    mesh = _soup(300, 1)
+    bvh = raycast.TriangleBVH(mesh)
+    origins, directions = _rays(400, 2)
+    limits = np.full(400, 20.0)
+    limits[::4] = 2.0
+    distances, tris, bary = bvh.intersect(origins, directions, limits)
+    expected, expected_tris = _brute_force(
+        mesh.points[mesh.triangles], origins, directions, limits)
+    assert 100 < np.isfinite(expected).sum() < 400
+    np.testing.assert_allclose(distances, expected, rtol=1e-9)
+    hits = np.isfinite(expected)
+    np.testing.assert_array_equal(bvh.triangles[tris[hits]],
+                                  mesh.triangles[expected_tris[hits]])
+    points = np.einsum("nk,nki->ni", bary[hits],
+                       bvh.corners[tris[hits]])
+    np.testing.assert_allclose(
+        points, origins[hits] + directions[hits] * distances[hits, None],
+        atol=1e-9)
+
+
+def test_bvh_only_hits_targeted_triangles():
+    mesh = _soup(100, 3)
+    bvh = raycast.TriangleBVH(mesh, indices=np.arange(0, 150))
+    assert len(bvh.triangles) == 50
+    origins, directions = _rays(300, 4)
+    distances, tris, _ = bvh.intersect(origins, directions,
+                                       np.full(300, 20.0))
+    expected = _brute_force(mesh.points[mesh.triangles[:50]], origins,
+                            directions, np.full(300, 20.0))[0]
+    np.testing.assert_allclose(distances, expected, rtol=1e-9)
+    assert (bvh.triangles[tris[np.isfinite(distances)]] < 150).all()
+
+
+def test_cast_keeps_nearest_mesh_in_world_space():
+    world_matrix = np.diag([2.0, 0.5, 1.0, 1.0])
+    world_matrix[3, :3] = [1.0, -2.0, 3.0]
+    meshes = [_soup(150, 5), _soup(150, 6, world_matrix)]
+    bvhs = [raycast.TriangleBVH(mesh) for mesh in meshes]
+    rng = np.random.RandomState(7)
+    origins = rng.uniform(-8.0, 8.0, (500, 3))
+    origins[:, 1] = 20.0
+    direction = np.array([0.0, -1.0, 0.0])
+    hit_meshes, tris, bary = raycast.cast(bvhs, origins, direction,
+                                          np.full(500, 40.0))
+    world_corners = [mesh.to_world(mesh.points[mesh.triangles].reshape(
+        -1, 3)).reshape(-1, 3, 3) for mesh in meshes]
+    nearest = np.array([
+        _brute_force(corners, origins, np.tile(direction, (500, 1)),
+                     np.full(500, 40.0))[0] for corners in world_corners])
+    expected = np.where(np.isfinite(nearest).any(axis=0),
+                        nearest.argmin(axis=0), -1)
+    assert set(expected) == {-1, 0, 1}
+    np.testing.assert_array_equal(hit_meshes, expected)
+    for mesh_idx, bvh in enumerate(bvhs):
+        hits = hit_meshes == mesh_idx
+        points = meshes[mesh_idx].to_world(np.einsum(
+            "nk,nki->ni", bary[hits], bvh.corners[tris[hits]]))
+        np.testing.assert_allclose(points[:, [0, 2]],
+                                   origins[hits][:, [0, 2]], atol=1e-9)
+        np.testing.assert_allclose(
+            points[:, 1], 20.0 - nearest[mesh_idx, hits], atol=1e-9)
@@ -0,0 +1,118 @@
+import numpy as np
+
+import meshdata
+import sampling
+
+
+def _two_triangles(world_matrix=None):
+    """A unit triangle at x < 1 and a triangle three times its area at
+    x > 2, in the xz plane."""
+    points = [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 0.0, 1.0],
+              [2.0, 0.0, 0.0], [5.0, 0.0, 0.0], [2.0, 0.0, 2.0]]
+    return meshdata.MeshData("tris", points, np.tile([0.0, 1.0, 0.0], (6, 1)),
+                             world_matrix, [[0, 1, 2], [3, 4, 5]])
+
+
+def test_surface_points_follow_triangle_area():
+    sampler = sampling.SurfaceSampler(_two_triangles())
+    assert sampler.area == 0.5 + 3.0
+    positions, normals, weights = sampler.sample(
+        60000, np.random.RandomState(1))
+    share = (positions[:, 0] > 1.5).mean()
+    assert abs(share - 3.0 / 3.5) < 0.01
+    np.testing.assert_allclose(positions[:, 1], 0.0)
+    np.testing.assert_allclose(normals, [[0.0, 1.0, 0.0]] * 60000)
+    assert weights is None
+
+
+def test_surface_area_is_measured_in_world_space():
+    world_matrix = np.diag([2.0, 1.0, 1.0, 1.0])
+    sampler = sampling.SurfaceSampler(_two_triangles(world_matrix))
+    assert sampler.area == 7.0
+    positions = sampler.sample(1000, np.random.RandomState(2))[0]
+    assert positions[:, 0].max() <= 10.0
+    assert (positions[:, 0] > 3.0).mean() > 0.8
+
+
+def test_surface_weights_interpolate_vertex_weights():
+    sampler = sampling.SurfaceSampler(_two_triangles(), indices=[3, 4, 5])
+    assert sampler.area == 3.0
+    vertex_weights = np.array([0.0, 0.0, 0.0, 0.0, 1.0, 0.0])
+    positions, _, weights = sampler.sample(
+        500, np.random.RandomState(3), vertex_weights)
+    np.testing.assert_allclose(weights, (positions[:, 0] - 2.0) / 3.0,
+                               atol=1e-9)
+
+
+def _distances(a, b):
+    return np.linalg.norm(a[:, np.newaxis] - b[np.newaxis], axis=2)
+
+
+def test_poisson_keeps_min_distance_across_batches():
+    rng = np.random.RandomState(4)
+    batches = [rng.uniform(0.0, 10.0, (800, 3)) for _ in range(2)]
+    spacing = sampling.PoissonDiskFilter(1.0)
+    kept = [batch[spacing.filter(batch, rng)] for batch in batches]
+    points = np.concatenate(kept)
+    distances = _distances(points, points)
+    np.fill_diagonal(distances, np.inf)
+    assert distances.min() >= 1.0
+    candidates = np.concatenate(batches)
+    assert (_distances(candidates, points).min(axis=1) < 1.0 + 1e-12).all()
+
+
+def test_poisson_without_spacing_keeps_every_point():
+    positions = np.zeros((5, 3))
+    kept = sampling.PoissonDiskFilter(0.0).filter(
+        positions, np.random.RandomState(0))
+    np.testing.assert_array_equal(kept, np.arange(5))
+
+
+def test_overlap_culls_against_kept_spheres_only():
+    rng = np.random.RandomState(9)
+    batches = [(rng.uniform(0.0, 8.0, (600, 3)),
+                rng.uniform(0.1, 0.5, 600)) for _ in range(2)]
+    overlap = sampling.OverlapFilter(0.5)
+    kept = [overlap.filter(positions, radii)
+            for positions, radii in batches]
+    points = np.concatenate([batch[0][idx]
+                             for batch, idx in zip(batches, kept)])
+    radii = np.concatenate([batch[1][idx]
+                            for batch, idx in zip(batches, kept)])
+    reach = radii[:, np.newaxis] + radii[np.newaxis]
+    distances = _distances(points, points)
+    np.fill_diagonal(distances, np.inf)
+    assert (distances >= reach).all()
+    culled = np.setdiff1d(np.arange(600), kept[1])
+    positions, sizes = batches[1]
+    assert (_distances(positions[culled], points)
+            < sizes[culled, np.newaxis] + radii[np.newaxis]).any(
+                axis=1).all()
+
+
+def test_overlap_keeps_earlier_sphere():
+    positions = np.array([[0.0, 0.0, 0.0], [0.5, 0.0, 0.0],
+                          [2.0, 0.0, 0.0]])
+    kept = sampling.OverlapFilter(1.0).filter(positions, [1.0, 0.1, 1.0])
+    np.testing.assert_array_equal(kept, [0, 2])
+
+
+def test_overlap_without_radius_keeps_every_point():
+    kept = sampling.OverlapFilter(0.0).filter(np.zeros((4, 3)), np.ones(4))
+    np.testing.assert_array_equal(kept, np.arange(4))
+
+
+def test_alias_table_matches_weights():
+    weights = np.array([5.0, 1.0, 0.0, 3.0, 1.0])
+    table = sampling.AliasTable(weights)
+    picks = table.sample(200000, np.random.RandomState(11))
+    shares = np.bincount(picks, minlength=len(weights)) / float(len(picks))
+    np.testing.assert_allclose(shares, weights / weights.sum(), atol=0.005)
+    assert not (picks == 2).any()
+
+
+def test_alias_table_falls_back_to_uniform():
+    table = sampling.AliasTable([0.0, 0.0, 0.0])
+    picks = table.sample(30000, np.random.RandomState(2))
+    shares = np.bincount(picks, minlength=3) / float(len(picks))
+    np.testing.assert_allclose(shares, [1.0 / 3] * 3, atol=0.01)
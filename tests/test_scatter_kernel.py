@@ -0,0 +1,70 @@
+import math
+
+import numpy as np
+
+import scatter_kernel
+
+
+def _baseline_cross(a, b):
+    return [a[1] * b[2] - a[2] * b[1],
+            a[2] * b[0] - a[0] * b[2],
+            a[0] * b[1] - a[1] * b[0]]
+
+
+def _baseline_normal(vector):
+    length = math.sqrt(sum(value * value for value in vector))
+    return [value / length for value in vector]
+
+
+def _baseline_matrix(normal, position, parent_mat):
+    """The per-vertex orientation math the tool used before the kernel:
+    the normal taken to world space by the parent's rotation, then
+    ScatterTool.get_matrix_from_normal."""
+    normal = _baseline_normal(normal)
+    world = [sum(normal[row] * parent_mat[row * 4 + col]
+                 for row in range(3)) for col in range(3)]
+    world = _baseline_normal(world)
+    tangent_1 = _baseline_normal(_baseline_cross(world, parent_mat[4:7]))
+    tangent_2 = _baseline_normal(_baseline_cross(world, tangent_1))
+    return [tangent_2[0], tangent_2[1], tangent_2[2], 0.0,
+            world[0], world[1], world[2], 0.0,
+            tangent_1[0], tangent_1[1], tangent_1[2], 0.0,
+            position[0], position[1], position[2], 1.0]
+
+
+def _parent_matrix(rng):
+    """A random rotation with a translation, as a 16 item list."""
+    axes, _ = np.linalg.qr(rng.normal(size=(3, 3)))
+    matrix = np.identity(4)
+    matrix[:3, :3] = axes
+    matrix[3, :3] = rng.uniform(-10.0, 10.0, 3)
+    return matrix.ravel().tolist()
+
+
+def test_orientation_matches_baseline():
+    rng = np.random.RandomState(7)
+    normals = rng.normal(size=(50, 3))
+    positions = rng.uniform(-5.0, 5.0, (50, 3))
+    parents = [_parent_matrix(rng) for _ in range(50)]
+    world_normals = scatter_kernel.world_normals_from_local(normals, parents)
+    matrices = scatter_kernel.matrices_from_normals(world_normals, positions,
+                                                    parents)
+    for idx in range(50):
+        expected = _baseline_matrix(normals[idx], positions[idx],
+                                    parents[idx])
+        np.testing.assert_allclose(matrices[idx].ravel(), expected,
+                                   atol=1e-9)
+
+
+def test_unmodified_instances_keep_orientation():
+    rng = np.random.RandomState(3)
+    normals = rng.normal(size=(20, 3))
+    positions = rng.uniform(-5.0, 5.0, (20, 3))
+    parent = _parent_matrix(rng)
+    matrices = scatter_kernel.instance_matrices(
+        positions, normals, parent, np.ones((20, 3)),
+        [[0.0, 0.0]] * 3, [1.0, 1.0], rng)
+    for idx in range(20):
+        expected = _baseline_matrix(normals[idx], positions[idx], parent)
+        np.testing.assert_allclose(matrices[idx].ravel(), expected,
+                                   atol=1e-9)
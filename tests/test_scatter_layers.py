@@ -0,0 +1,48 @@
+import os
+
+import maya.cmds as cmds
+import maya.standalone
+import pytest
+from maya import _scene
+
+import scatter_layers
+
+
+@pytest.fixture
+def workspace(tmp_path):
+    maya.standalone.initialize()
+    _scene.SCENE.workspace = str(tmp_path)
+    cmds.polyCube(name="rock")
+    yield tmp_path / "scenes"
+    maya.standalone.uninitialize()
+
+
+def _scatter():
+    group = cmds.group(empty=True, name="scattered_grp")
+    cmds.parent(cmds.instance("rock"), group)
+    return group
+
+
+def test_layer_task_keeps_file_name_fields(workspace):
+    assert scatter_layers.layer_task("|set:grove_trees_01") \
+        == "scatterGroVeTrees01"
+    assert scatter_layers.layer_task("tree_grp", "trees") == "treesTreeGrp"
+
+
+def test_each_layer_has_its_own_versions(workspace):
+    _, first, first_path = scatter_layers.export_layer(_scatter())
+    _, second, second_path = scatter_layers.export_layer(_scatter())
+    assert os.path.basename(first_path) == "main_scatterScatteredGrp_v001.ma"
+    assert os.path.basename(second_path) \
+        == "main_scatterScatteredGrp2_v001.ma"
+    assert first != second
+
+    group, reference, path = scatter_layers.export_layer(
+        _scatter(), reference_node=first)
+    assert reference == first
+    assert os.path.basename(path) == "main_scatterScatteredGrp_v002.ma"
+    assert cmds.referenceQuery(group, referenceNode=True) == first
+    assert sorted(os.listdir(str(workspace))) == [
+        "main_scatterScatteredGrp2_v001.ma",
+        "main_scatterScatteredGrp_v001.ma",
+        "main_scatterScatteredGrp_v002.ma"]
@@ -0,0 +1,80 @@
+import maya.cmds as cmds
+import maya.standalone
+import numpy as np
+import pytest
+
+import scatter_output
+import scatter_pipeline
+
+
+@pytest.fixture
+def prototypes():
+    maya.standalone.initialize()
+    yield [cmds.polyCube(name="rock")[0], cmds.polyCube(name="tree")[0]]
+    maya.standalone.uninitialize()
+
+
+def _batch(slots, obj_indices, offsets=None, candidates=10):
+    """Points of batch 3 at x equal to their slot, shifted by offsets."""
+    slots = np.asarray(slots)
+    matrices = np.tile(np.eye(4), (len(slots), 1, 1))
+    matrices[:, 3, 0] = slots
+    if offsets is not None:
+        matrices[:, 3, 2] = offsets
+    count = len(slots)
+    return scatter_pipeline.PointBatch(
+        3, matrices[:, 3, :3], np.zeros((count, 3)),
+        np.tile(np.eye(4), (count, 1, 1)), np.asarray(obj_indices),
+        matrices, slots=slots, candidates=candidates)
+
+
+def _instances(emitter):
+    return {point_id % scatter_pipeline.ID_STRIDE: node
+            for point_id, node in emitter.nodes.items()}
+
+
+def _descendants(node):
+    children = cmds.listRelatives(node) or []
+    return children + [item for child in children
+                       for item in _descendants(child)]
+
+
+@pytest.mark.parametrize("group_size", [0, 2])
+def test_sync_touches_only_changed_points(prototypes, group_size):
+    emitter = scatter_output.TransformEmitter(group_size)
+    group = emitter.emit(prototypes, [_batch(range(6), [0] * 6)])
+    before = _instances(emitter)
+
+    spun = np.eye(4)
+    spun[:2, :2] = [[0.0, 1.0], [-1.0, 0.0]]
+    batch = _batch(range(3, 10), [0, 1, 0, 0, 0, 0, 0],
+                   [0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0])
+    batch.matrices[0, :3, :3] = spun[:3, :3]
+    assert emitter.sync(prototypes, [batch], group)
+
+    after = _instances(emitter)
+    assert sorted(after) == list(range(3, 10))
+    for slot in range(3):
+        assert not cmds.objExists(before[slot])
+    assert after[3] == before[3]
+    for slot in (4, 5):
+        assert not cmds.objExists(before[slot])
+        assert after[slot] != before[slot]
+    np.testing.assert_allclose(
+        np.reshape(cmds.xform(after[3], q=True, m=True), (4, 4)),
+        batch.matrices[0])
+    assert cmds.xform(after[5], q=True, t=True) == [5.0, 0.0, 1.0]
+    assert cmds.xform(after[9], q=True, t=True) == [9.0, 0.0, 0.0]
+    instances = [node for node in _descendants(group)
+                 if node.startswith(("rock", "tree"))]
+    assert sorted(instances) == sorted(after.values())
+
+
+def test_sync_refuses_another_scatter(prototypes):
+    emitter = scatter_output.TransformEmitter()
+    group = emitter.emit(prototypes, [_batch(range(4), [0] * 4)])
+    batch = _batch(range(2), [0, 0])
+    assert not emitter.sync(prototypes[::-1], [batch], group)
+    assert not emitter.sync(prototypes, [batch], "other_grp")
+    cmds.delete(group)
+    assert not emitter.sync(prototypes, [batch], group)
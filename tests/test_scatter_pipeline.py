@@ -0,0 +1,98 @@
+import numpy as np
+
+import meshdata
+import placement
+import scatter_pipeline
+
+
+def _plane_batches(count, weight_of, seed, batches=2):
+    """Random points on a 10 x 10 square in the xz plane, weighted by the
+    weight_of function of their positions."""
+    rng = np.random.RandomState(seed)
+    result = []
+    for index in range(batches):
+        positions = np.zeros((count, 3))
+        positions[:, [0, 2]] = rng.uniform(0.0, 10.0, (count, 2))
+        result.append(scatter_pipeline.PointBatch(
+            index, positions, np.tile([0.0, 1.0, 0.0], (count, 1)),
+            np.tile(np.eye(4), (count, 1, 1)),
+            weights=weight_of(positions)))
+    return result
+
+
+def _band_count(positions, low, high):
+    return np.count_nonzero((positions[:, 0] >= low)
+                            & (positions[:, 0] < high))
+
+
+def test_density_follows_weight_map():
+    batches = _plane_batches(
+        20000, lambda positions: positions[:, 0] / 10.0, 5)
+    kept = np.concatenate([
+        batch.positions for batch in
+        scatter_pipeline.density_stage(batches, 0.5, 6)])
+    for low in (0.0, 4.0, 8.0):
+        expected = 40000 * 0.2 * 0.5 * (low + 1.0) / 10.0
+        assert abs(_band_count(kept, low, low + 2.0) / expected - 1.0) \
+            < 0.1
+
+
+def test_spacing_ignores_points_outside_the_mask():
+    def half_mask(positions):
+        return (positions[:, 0] >= 5.0).astype(np.float64)
+
+    batches = _plane_batches(10000, half_mask, 7)
+    kept = list(scatter_pipeline.density_stage(
+        scatter_pipeline.spacing_stage(batches, 0.2, 8), 1.0, 8))
+    masked = [batch.take(np.flatnonzero(batch.weights > 0.0))
+              for batch in batches]
+    alone = list(scatter_pipeline.spacing_stage(masked, 0.2, 8))
+    for batch, expected in zip(kept, alone):
+        np.testing.assert_array_equal(batch.ids, expected.ids)
+    positions = np.concatenate([batch.positions for batch in kept])
+    assert positions[:, 0].min() >= 5.0
+    assert _band_count(positions, 5.0, 5.2) \
+        >= _band_count(positions, 7.0, 7.2)
+
+
+def _targets():
+    rng = np.random.RandomState(5)
+    backend = meshdata.InMemoryMeshBackend()
+    world_matrix = np.identity(4)
+    world_matrix[3, :3] = [1.0, 2.0, 3.0]
+    backend.add_mesh("ground", rng.uniform(-50.0, 50.0, (3000, 3)),
+                     rng.normal(size=(3000, 3)), world_matrix)
+    backend.add_mesh("rock", rng.uniform(-5.0, 5.0, (800, 3)),
+                     rng.normal(size=(800, 3)))
+    return meshdata.gather_meshes(backend, ["ground"],
+                                  {"rock": np.arange(0, 800, 2)})
+
+
+def _scatter(density, seed=9):
+    batches = scatter_pipeline.vertex_source(_targets(), batch_size=256)
+    batches = scatter_pipeline.density_stage(batches, density, seed)
+    batches = scatter_pipeline.assign_stage(batches, [2.0, 1.0], seed)
+    params = placement.PlacementParams(
+        [[0.0, 30.0], [0.0, 360.0], [0.0, 0.0]], [0.5, 1.5])
+    batches = scatter_pipeline.transform_stage(batches, np.ones((2, 3)),
+                                               params, seed)
+    placed = {}
+    for batch in batches:
+        for point_id, obj_idx, matrix in zip(batch.ids, batch.obj_indices,
+                                             batch.matrices):
+            placed[point_id] = (obj_idx, matrix)
+    return placed
+
+
+def test_density_only_adds_points():
+    sparse = _scatter(0.3)
+    dense = _scatter(0.6)
+    assert 0 < len(sparse) < len(dense)
+    assert set(sparse) <= set(dense)
+    for point_id, (obj_idx, matrix) in sparse.items():
+        assert dense[point_id][0] == obj_idx
+        np.testing.assert_array_equal(dense[point_id][1], matrix)
+
+
+def test_full_density_keeps_every_target():
+    assert len(_scatter(1.0)) == 3000 + 400